@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""运行基准测试
+
+    python -m DrawPicture.benchmarks [-o 结果.json] [--baseline 基线.json] [--threshold 0.2] [--quick]
+                                     [--replay 录制.dpinput ...]
+
+结果以 JSON 输出；指定基线时逐项比较中位数时间，有测试项变慢超过阈值时以状态码 1 退出。
+"""
+
+import argparse
+import json
+import os
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m DrawPicture.benchmarks", description="DrawPicture 基准测试")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件路径，默认输出到标准输出")
+    parser.add_argument("--baseline", help="用于比较的基线结果 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="中位数时间相对基线变慢超过该比例时视为退化（默认 0.2）")
+    parser.add_argument("--quick", action="store_true", help="使用较小的文档快速运行")
+    parser.add_argument("-k", "--filter", help="只运行名称包含该字符串的测试项")
+    parser.add_argument("--replay", action="append", default=[], metavar="FILE",
+                        help="同时回放输入录制文件作为测试项（可指定多次）")
+    args = parser.parse_args(argv)
+
+    # 无显示环境下也能创建画布
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    from DrawPicture.benchmarks import suite
+
+    def progress(name, result):
+        print(f"{name:32s} {result['median'] * 1000:10.3f} ms  (最小 {result['min'] * 1000:.3f} ms)",
+              file=sys.stderr)
+
+    results = suite.run(quick=args.quick, pattern=args.filter, progress=progress, replays=args.replay)
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('quick') != results['meta']['quick']:
+        print("警告: 基线与本次运行的规模（--quick）不同，比较结果没有意义", file=sys.stderr)
+    rows = suite.compare(results, baseline, args.threshold)
+    print(f"\n与基线 {args.baseline} 比较（阈值 {args.threshold:.0%}）:", file=sys.stderr)
+    for name, base, current, ratio, regressed in rows:
+        mark = "退化" if regressed else ""
+        print(f"{name:32s} {base * 1000:10.3f} -> {current * 1000:10.3f} ms  {ratio:6.2f}x  {mark}",
+              file=sys.stderr)
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} 项退化: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""合成文档生成器
+
+按固定随机种子生成基准测试用的文档，相同参数总是得到相同的文档。
+"""
+
+import math
+
+from PyQt5.QtCore import QPointF, QRectF
+from PyQt5.QtGui import QColor
+import numpy as np
+
+from DrawPicture.models import shapes as S
+from DrawPicture.models.document import Document
+
+# 图形分布的场景区域边长
+SCENE_SIZE = 4000
+
+
+def _random_color(rng):
+    return QColor(*(int(v) for v in rng.integers(0, 256, 3)))
+
+
+def _group(rng, x, y):
+    group = S.ShapeGroup()
+    group.add(S.Rectangle(QRectF(x, y, 60, 40)))
+    group.add(S.Circle(QPointF(x + 30, y + 20), 15))
+    return group
+
+
+def _freehand(rng, x, y, points=64):
+    shape = S.Freehand()
+    steps = rng.normal(0, 3, (points, 2)).cumsum(axis=0)
+    for dx, dy in steps:
+        shape.add_point(QPointF(x + dx, y + dy))
+    return shape
+
+
+def _pen_path(rng, x, y):
+    shape = S.PenPath()
+    for dx, dy in rng.uniform(-60, 60, (5, 2)):
+        shape.add_point(QPointF(x + dx, y + dy))
+    return shape
+
+
+# 图形类型名称 -> 在 (x, y) 附近创建一个该类型图形的函数 factory(rng, x, y)
+# 分形的复平面区域取得很小，单个图形的绘制时间与其他图形处于同一量级
+SHAPE_FACTORIES = {
+    'Line': lambda rng, x, y: S.Line(QPointF(x, y), QPointF(x + rng.uniform(-80, 80), y + rng.uniform(-80, 80))),
+    'Rectangle': lambda rng, x, y: S.Rectangle(QRectF(x, y, rng.uniform(10, 120), rng.uniform(10, 120)),
+                                               fill_color=_random_color(rng)),
+    'Circle': lambda rng, x, y: S.Circle(QPointF(x, y), rng.uniform(5, 60)),
+    'ArchimedeanSpiral': lambda rng, x, y: S.ArchimedeanSpiral(QPointF(x, y), 0.25, rng.uniform(0.5, 2), 4),
+    'SineCurve': lambda rng, x, y: S.SineCurve(QPointF(x, y), rng.uniform(10, 40), 0.05, rng.uniform(100, 300)),
+    'Freehand': _freehand,
+    'ShapeGroup': _group,
+    'MandelbrotSet': lambda rng, x, y: S.MandelbrotSet(QRectF(-0.75, 0.1, 0.1, 0.1), max_iter=30),
+    'JuliaSet': lambda rng, x, y: S.JuliaSet(QRectF(-0.05, -0.05, 0.1, 0.1), max_iter=30),
+    'SuperEllipse': lambda rng, x, y: S.SuperEllipse(QPointF(x, y), rng.uniform(20, 80), rng.uniform(20, 80)),
+    'ParametricCurve': lambda rng, x, y: S.ParametricCurve(QPointF(x, y), rng.uniform(20, 80),
+                                                           str(rng.choice(["rose", "heart", "butterfly"]))),
+    'Gear': lambda rng, x, y: S.Gear(QPointF(x, y), rng.uniform(20, 80)),
+    'Leaf': lambda rng, x, y: S.Leaf(QPointF(x, y), rng.uniform(20, 80), rng.uniform(0, 360)),
+    'Cloud': lambda rng, x, y: S.Cloud(QPointF(x, y), rng.uniform(60, 200), rng.uniform(30, 100)),
+    'PenPath': _pen_path,
+}
+
+# 分形逐像素计算，不放入一般的图形混合文档
+FRACTAL_TYPES = ('MandelbrotSet', 'JuliaSet')
+
+
+def _build(shapes, layers=None):
+    """把图形一次性加入新文档（不记录撤销），返回文档"""
+    document = Document()
+    for name in layers or []:
+        document.add_layer(name)
+    document.shapes.extend(shapes)
+    document.transforms.rebuild(document.shapes)
+    return document
+
+
+def mixed_document(count_per_type=50, seed=0, types=None):
+    """每种图形各 count_per_type 个，随机分布在场景区域中
+
+    参数:
+        types: 图形类型名称列表，默认为除分形外的所有类型
+    """
+    rng = np.random.default_rng(seed)
+    types = types or [name for name in SHAPE_FACTORIES if name not in FRACTAL_TYPES]
+    shapes = []
+    for name in types:
+        factory = SHAPE_FACTORIES[name]
+        for x, y in rng.uniform(0, SCENE_SIZE, (count_per_type, 2)):
+            shape = factory(rng, x, y)
+            shape.rotation = float(rng.uniform(0, 360))
+            shapes.append(shape)
+    # 打乱绘制顺序，避免同类图形连续排列
+    order = rng.permutation(len(shapes))
+    return _build([shapes[i] for i in order])
+
+
+def freehand_document(strokes=20, points=5000, seed=0):
+    """包含 strokes 条各有 points 个点的长自由绘制笔画"""
+    rng = np.random.default_rng(seed)
+    shapes = [_freehand(rng, x, y, points) for x, y in rng.uniform(0, SCENE_SIZE, (strokes, 2))]
+    return _build(shapes)
+
+
+def layered_document(layers=50, shapes_per_layer=20, seed=0):
+    """包含 layers 个图层，每个图层 shapes_per_layer 个基本图形"""
+    rng = np.random.default_rng(seed)
+    names = [f"图层{i + 1}" for i in range(layers)]
+    basic = ('Line', 'Rectangle', 'Circle')
+    shapes = []
+    for name in names:
+        for x, y in rng.uniform(0, SCENE_SIZE, (shapes_per_layer, 2)):
+            shape = SHAPE_FACTORIES[basic[int(rng.integers(len(basic)))]](rng, x, y)
+            shape.layer = name
+            shapes.append(shape)
+    return _build(shapes, names)
+
+
+def fractal_document(count=4, seed=0):
+    """包含 count 个分形图形，按网格排列"""
+    rng = np.random.default_rng(seed)
+    columns = max(1, int(math.ceil(math.sqrt(count))))
+    shapes = []
+    for i in range(count):
+        shape = SHAPE_FACTORIES[FRACTAL_TYPES[i % len(FRACTAL_TYPES)]](rng, 0, 0)
+        shape.position = QPointF((i % columns) * 40, (i // columns) * 40)
+        shapes.append(shape)
+    return _build(shapes)
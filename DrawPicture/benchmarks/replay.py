@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""回放录制的输入事件
+
+    python -m DrawPicture.benchmarks.replay 录制.dpinput [--realtime] [--no-paint] [--repeat 5] [-o 结果.json]
+
+从录制开始时的文档出发，把录制的事件依次交给画布和工具处理（与窗口事件经过相同的处理方法），
+记录每个鼠标、按键事件和文档命令的延迟：处理事件的时间，默认还包括之后处理事件循环中重绘的时间。
+默认尽快回放；--realtime 按录制的时间间隔回放，延迟从事件的预定时间算起，包括前面事件积压的等待。
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import Qt, QEvent, QPoint, QPointF
+from PyQt5.QtGui import QColor, QKeyEvent
+from PyQt5.QtWidgets import QApplication
+import numpy as np
+
+from DrawPicture.diagnostics import input_record
+from DrawPicture.diagnostics.input_record import InputRecording
+from DrawPicture.models import tools
+from DrawPicture.models.document import Document
+
+# 报告的延迟百分位
+PERCENTILES = (50, 90, 99)
+
+
+def _tool_class(name):
+    cls = getattr(tools, name, None)
+    if not (isinstance(cls, type) and issubclass(cls, tools.DrawingTool)):
+        raise ValueError(f"录制中的工具不存在: {name}")
+    return cls
+
+
+def summarize(latencies):
+    """统计延迟
+
+    参数:
+        latencies: [(事件类型名称, 延迟秒数)]
+
+    返回:
+        {'all': 统计, 'by_kind': {事件类型名称: 统计}}，统计为 count、mean、max 和各百分位（秒）
+    """
+    def stats(values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return {'count': 0}
+        result = {'count': len(values), 'mean': float(values.mean()), 'max': float(values.max())}
+        for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+            result[f'p{p}'] = float(value)
+        return result
+
+    by_kind = {}
+    for kind, latency in latencies:
+        by_kind.setdefault(kind, []).append(latency)
+    return {
+        'all': stats([latency for _, latency in latencies]),
+        'by_kind': {kind: stats(values) for kind, values in by_kind.items()},
+    }
+
+
+class Replayer:
+    """在无界面环境下回放输入录制"""
+
+    def __init__(self, recording, paint=True):
+        """
+        参数:
+            recording: InputRecording 或录制文件路径
+            paint: 每个事件后处理事件循环，把重绘时间计入延迟
+        """
+        if not isinstance(recording, InputRecording):
+            recording = InputRecording.load(recording)
+        self.recording = recording
+        self.paint = paint
+        self.document = None
+        self.canvas = None
+        self.color_tool = None
+        self.tools = {}
+        self.latencies = []  # 最近一次回放的 [(事件类型名称, 延迟秒数)]
+
+    def reset(self):
+        """恢复录制开始时的文档、画布大小和样式，创建新的画布和工具"""
+        from DrawPicture.views.canvas import Canvas
+
+        meta = self.recording.meta
+        self.document = Document()
+        if self.recording.document_data:
+            # 快照与旧格式的绘图文件相同，借助文档的加载方法恢复
+            fd, path = tempfile.mkstemp(suffix=".draw")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(self.recording.document_data)
+                self.document.load(path)
+            finally:
+                os.remove(path)
+
+        if self.canvas is not None:
+            self.canvas.close()
+            self.canvas.deleteLater()
+        self.canvas = Canvas(self.document)
+        self.canvas.resize(*meta.get('size', (1280, 800)))
+        grid_visible, grid_size = meta.get('grid', (self.canvas.grid_visible, self.canvas.grid_size))
+        self.canvas.grid_visible = grid_visible
+        self.canvas.grid_size = grid_size
+        self.canvas.show()
+
+        self.color_tool = tools.ColorTool()
+        style = meta.get('style')
+        if style:
+            self.color_tool.line_color = QColor.fromRgba(style['line_color'])
+            self.color_tool.fill_color = QColor.fromRgba(style['fill_color'])
+            self.color_tool.line_width = style['line_width']
+            self.color_tool.line_style = Qt.PenStyle(style['line_style'])
+        self.tools = {}
+        QApplication.processEvents()
+
+    def _tool(self, name):
+        """每种工具在一次回放中只创建一个，与主窗口相同"""
+        tool = self.tools.get(name)
+        if tool is None:
+            tool = _tool_class(name)(self.document)
+            tool.set_color_tool(self.color_tool)
+            if hasattr(tool, 'set_canvas'):
+                tool.set_canvas(self.canvas)
+            self.tools[name] = tool
+        return tool
+
+    def _apply(self, kind, fields):
+        canvas = self.canvas
+        if kind in input_record.QT_MOUSE_EVENT_TYPES:
+            button, buttons, modifiers, x, y, timestamp = fields
+            canvas.send_scene_mouse(input_record.QT_MOUSE_EVENT_TYPES[kind], QPointF(x, y), Qt.MouseButton(button),
+                                    Qt.MouseButtons(buttons), Qt.KeyboardModifiers(modifiers), timestamp)
+        elif kind == input_record.KEY_PRESS:
+            key, modifiers = fields
+            canvas.keyPressEvent(QKeyEvent(QEvent.KeyPress, key, Qt.KeyboardModifiers(modifiers)))
+        elif kind == input_record.COMMAND:
+            getattr(self.document, fields[0])()
+        elif kind == input_record.TOOL:
+            canvas.set_tool(self._tool(fields[0]))
+        elif kind == input_record.VIEW:
+            zoom, pan_x, pan_y = fields
+            if zoom != canvas.zoom_factor:
+                canvas.zoom_factor = zoom
+                canvas.zoom_changed.emit(zoom)
+            canvas.pan_offset = QPoint(pan_x, pan_y)
+            canvas.update()
+
+    def run(self, realtime=False):
+        """回放一次所有事件（需要先调用 reset()）
+
+        返回:
+            [(事件类型名称, 延迟秒数)]，只包含鼠标、按键事件和文档命令
+        """
+        app = QApplication.instance()
+        latencies = []
+        clock = time.perf_counter
+        start = clock()
+        for kind, seconds, *fields in self.recording.events:
+            if realtime:
+                scheduled = start + seconds
+                # 等待期间照常处理计时器（空闲时恢复高质量、预取瓦片等）
+                while clock() < scheduled:
+                    app.processEvents()
+                    time.sleep(min(max(scheduled - clock(), 0), 0.001))
+            else:
+                scheduled = clock()
+            if kind in input_record.QT_MOUSE_EVENT_TYPES:
+                # 时间戳（毫秒）与录制时的间隔一致
+                fields.append(int(seconds * 1000))
+            self._apply(kind, fields)
+            if self.paint:
+                app.processEvents()
+            if kind not in (input_record.TOOL, input_record.VIEW):
+                latencies.append((input_record.EVENT_NAMES[kind], clock() - scheduled))
+        self.latencies = latencies
+        return latencies
+
+    def replay(self, realtime=False):
+        """从录制开始时的状态回放一次，返回延迟统计、总时间和结束时的图形数"""
+        self.reset()
+        start = time.perf_counter()
+        latencies = self.run(realtime)
+        result = summarize(latencies)
+        result['total'] = time.perf_counter() - start
+        result['shapes'] = len(self.document.shapes)
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m DrawPicture.benchmarks.replay", description="回放输入录制")
+    parser.add_argument("recording", help="输入录制文件")
+    parser.add_argument("--realtime", action="store_true", help="按录制的时间间隔回放（默认尽快回放）")
+    parser.add_argument("--no-paint", action="store_true", help="不把重绘时间计入延迟")
+    parser.add_argument("--repeat", type=int, default=1, help="回放次数，每次从录制开始时的文档出发")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件路径，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    replayer = Replayer(args.recording, paint=not args.no_paint)
+    recording = replayer.recording
+    print(f"{len(recording.events)} 个事件，录制时长 {recording.duration:.1f} 秒，"
+          f"工具: {', '.join(recording.meta.get('tools', []))}", file=sys.stderr)
+    runs = []
+    for _ in range(max(args.repeat, 1)):
+        result = replayer.replay(args.realtime)
+        runs.append(result)
+        print(f"总时间 {result['total'] * 1000:.1f} ms，结束时 {result['shapes']} 个图形", file=sys.stderr)
+        for kind, stats in sorted(result['by_kind'].items()):
+            print(f"  {kind:20s} {stats['count']:6d}  " +
+                  "  ".join(f"p{p} {stats[f'p{p}'] * 1000:8.3f} ms" for p in PERCENTILES) +
+                  f"  最大 {stats['max'] * 1000:8.3f} ms", file=sys.stderr)
+
+    text = json.dumps({
+        'recording': os.path.basename(args.recording),
+        'meta': recording.meta,
+        'realtime': args.realtime,
+        'paint': not args.no_paint,
+        'runs': runs,
+    }, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""基准测试项
+
+每个测试项由未计时的准备函数和计时的运行函数组成，运行前先预热一次，
+之后重复 repeat 次，记录每次运行时间的中位数、最小值和平均值（秒）。
+画布相关的测试需要 QApplication，无显示环境下使用 offscreen 平台。
+"""
+
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+
+from PyQt5.QtCore import QPoint, QPointF, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt5.QtWidgets import QApplication
+import numpy as np
+
+from DrawPicture.benchmarks import generators
+from DrawPicture.benchmarks.replay import Replayer, summarize
+from DrawPicture.models import rendering
+from DrawPicture.models.document import Document
+from DrawPicture.models.export import export_document
+
+# 结果文件格式版本
+RESULT_VERSION = 1
+
+# 画布测试的窗口大小
+CANVAS_SIZE = (1280, 800)
+
+
+class Case:
+    """一个基准测试项"""
+
+    def __init__(self, name, run, setup=None, repeat=5, params=None, details=None):
+        """
+        参数:
+            run: 计时的函数
+            setup: 每次运行前调用的准备函数（不计时）
+            params: 记录到结果中的参数
+            details: 运行结束后调用，返回合并到结果中的其他统计
+        """
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.repeat = repeat
+        self.params = params or {}
+        self.details = details
+
+    def measure(self):
+        """运行测试项，返回结果字典"""
+        times = []
+        for i in range(self.repeat + 1):
+            if self.setup is not None:
+                self.setup()
+            start = time.perf_counter()
+            self.run()
+            elapsed = time.perf_counter() - start
+            if i:  # 第一次为预热
+                times.append(elapsed)
+        result = {
+            'median': statistics.median(times),
+            'min': min(times),
+            'mean': statistics.fmean(times),
+            'repeat': self.repeat,
+            'params': self.params,
+        }
+        if self.details is not None:
+            result.update(self.details())
+        return result
+
+
+class Sizes:
+    """各测试项的规模，quick 模式下缩小以便快速检查"""
+
+    def __init__(self, quick=False):
+        self.quick = quick
+        self.count_per_type = 20 if quick else 100
+        self.freehand_strokes = 5 if quick else 20
+        self.freehand_points = 2000 if quick else 10000
+        self.layers = 10 if quick else 50
+        self.shapes_per_layer = 10 if quick else 40
+        self.fractals = 2 if quick else 4
+        self.hit_points = 50 if quick else 200
+        self.repeat = 3 if quick else 7
+
+
+def _canvas_cases(name, document, sizes):
+    """画布绘制：缩放到显示整个文档，分别测量不使用瓦片缓存和使用瓦片缓存时的 paintEvent"""
+    from DrawPicture.views.canvas import Canvas
+    canvas = Canvas(document)
+    canvas.resize(*CANVAS_SIZE)
+    canvas.set_render_quality(rendering.QUALITY_FINAL)
+    bounds = rendering.document_bounds(document)
+    if not bounds.isEmpty():
+        zoom = min(CANVAS_SIZE[0] / bounds.width(), CANVAS_SIZE[1] / bounds.height(), 1.0)
+        canvas.zoom_factor = zoom
+        canvas.pan_offset = QPoint(round(-bounds.left() * zoom), round(-bounds.top() * zoom))
+    canvas.show()
+    QApplication.processEvents()
+    params = {'shapes': len(document.shapes), 'size': list(CANVAS_SIZE), 'zoom': canvas.zoom_factor}
+    return [
+        Case(f"paint.{name}.cold", canvas.repaint, setup=canvas.tile_cache.clear,
+             repeat=sizes.repeat, params=params),
+        Case(f"paint.{name}.warm", canvas.repaint, repeat=sizes.repeat, params=params),
+    ]
+
+
+def _hit_test_case(document, sizes):
+    points = [QPointF(x, y) for x, y in
+              np.random.default_rng(1).uniform(0, generators.SCENE_SIZE, (sizes.hit_points, 2))]
+
+    def run():
+        for point in points:
+            document.get_shape_at(point)
+    return Case("get_shape_at", run, repeat=sizes.repeat,
+                params={'shapes': len(document.shapes), 'points': len(points)})
+
+
+def _history_cases(sizes):
+    document = generators.mixed_document(sizes.count_per_type, seed=2)
+    params = {'shapes': len(document.shapes)}
+
+    def fill_undo():
+        document.undo_stack.clear()
+        document.redo_stack.clear()
+        document.record_state()
+
+    def fill_redo():
+        fill_undo()
+        document.undo()
+    return [
+        Case("history.record_state", document.record_state, repeat=sizes.repeat, params=params),
+        Case("history.undo", document.undo, setup=fill_undo, repeat=sizes.repeat, params=params),
+        Case("history.redo", document.redo, setup=fill_redo, repeat=sizes.repeat, params=params),
+    ]
+
+
+def _file_cases(directory, sizes):
+    document = generators.mixed_document(sizes.count_per_type, seed=3)
+    path = os.path.join(directory, "bench.draw")
+    params = {'shapes': len(document.shapes)}
+    document.save(path)
+    return [
+        Case("file.save", lambda: document.save(path), repeat=sizes.repeat, params=params),
+        Case("file.load", lambda: Document().load(path), repeat=sizes.repeat, params=params),
+    ]
+
+
+def _clone_case(sizes):
+    state = {}
+
+    def setup():
+        document = generators.mixed_document(sizes.count_per_type, seed=4)
+        document.select_shapes(document.shapes[::10])
+        state['document'] = document
+    return Case("clone_selected_shapes", lambda: state['document'].clone_selected_shapes(),
+                setup=setup, repeat=sizes.repeat,
+                params={'count_per_type': sizes.count_per_type, 'selected': 'every 10th'})
+
+
+def _export_cases(directory, sizes):
+    document = generators.mixed_document(max(1, sizes.count_per_type // 4), seed=5)
+    params = {'shapes': len(document.shapes), 'dpi': 24}
+    cases = []
+    for suffix in ("png", "svg"):
+        path = os.path.join(directory, f"bench.{suffix}")
+        cases.append(Case(f"export.{suffix}", lambda path=path: export_document(document, path, dpi=24),
+                          repeat=sizes.repeat, params=params))
+    return cases
+
+
+def _replay_case(path, sizes):
+    """回放输入录制：计时一次完整回放，结果中附带最后一次回放的每事件延迟百分位"""
+    replayer = Replayer(path)
+    recording = replayer.recording
+    name = os.path.splitext(os.path.basename(path))[0]
+
+    def details():
+        latency = summarize(replayer.latencies)
+        return {'latency': latency['all'], 'latency_by_kind': latency['by_kind'],
+                'final_shapes': len(replayer.document.shapes)}
+    return Case(f"replay.{name}", replayer.run, setup=replayer.reset, repeat=sizes.repeat,
+                params={'events': len(recording.events), 'tools': recording.meta.get('tools', []),
+                        'shapes': recording.meta.get('shapes')},
+                details=details)
+
+
+def build_cases(directory, quick=False, replays=()):
+    """创建所有测试项
+
+    参数:
+        directory: 存放保存和导出文件的临时目录
+        replays: 作为测试项回放的输入录制文件
+    """
+    sizes = Sizes(quick)
+    mixed = generators.mixed_document(sizes.count_per_type)
+    cases = []
+    cases += _canvas_cases("mixed", mixed, sizes)
+    cases += _canvas_cases("freehand", generators.freehand_document(
+        sizes.freehand_strokes, sizes.freehand_points), sizes)
+    cases += _canvas_cases("layers", generators.layered_document(
+        sizes.layers, sizes.shapes_per_layer), sizes)
+    cases += _canvas_cases("fractals", generators.fractal_document(sizes.fractals), sizes)
+    cases.append(_hit_test_case(mixed, sizes))
+    cases += _history_cases(sizes)
+    cases += _file_cases(directory, sizes)
+    cases.append(_clone_case(sizes))
+    cases += _export_cases(directory, sizes)
+    cases += [_replay_case(path, sizes) for path in replays]
+    return cases
+
+
+def run(quick=False, pattern=None, progress=None, replays=()):
+    """运行基准测试，返回结果字典
+
+    参数:
+        pattern: 只运行名称包含该字符串的测试项
+        progress: 每完成一项调用 progress(名称, 结果)
+        replays: 同时回放的输入录制文件
+    """
+    directory = tempfile.mkdtemp(prefix="drawpicture-bench-")
+    try:
+        results = {}
+        for case in build_cases(directory, quick, replays):
+            if pattern and pattern not in case.name:
+                continue
+            results[case.name] = case.measure()
+            if progress is not None:
+                progress(case.name, results[case.name])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {
+        'version': RESULT_VERSION,
+        'meta': {
+            'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'quick': quick,
+            'python': platform.python_version(),
+            'qt': QT_VERSION_STR,
+            'pyqt': PYQT_VERSION_STR,
+            'platform': platform.platform(),
+            'qpa': QApplication.platformName(),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """与基线比较中位数时间
+
+    参数:
+        threshold: 相对变慢超过该比例时视为退化
+
+    返回:
+        [(名称, 基线中位数, 当前中位数, 比值, 是否退化)]，只包含两边都有的测试项
+    """
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        ratio = result['median'] / base['median'] if base['median'] > 0 else float('inf')
+        rows.append((name, base['median'], result['median'], ratio, ratio > 1 + threshold))
+    return rows
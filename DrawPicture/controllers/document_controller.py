@@ -2,11 +2,13 @@
 # -*- coding: utf-8 -*-
 
 from PyQt5.QtCore import QObject, pyqtSignal
-from PyQt5.QtWidgets import QFileDialog, QMessageBox
-from PyQt5.QtGui import QImage, QPainter, QColor
+from PyQt5.QtWidgets import QFileDialog, QMessageBox, QInputDialog
 
 import os
 
+from DrawPicture.models.export import export_document, is_vector_format
+from DrawPicture.models.document_file import read_header
+
 class DocumentController(QObject):
     """文档控制器类，处理文档的操作逻辑"""
     
@@ -99,7 +101,7 @@ class DocumentController(QObject):
         if parent_widget and canvas:
             file_path, filter_type = QFileDialog.getSaveFileName(
                 parent_widget, "导出图片", "", 
-                "PNG图片 (*.png);;JPEG图片 (*.jpg *.jpeg);;BMP图片 (*.bmp);;TIFF图片 (*.tiff);;WebP图片 (*.webp);;SVG图片 (*.svg);;ICO图标 (*.ico);;所有文件 (*)"
+                "PNG图片 (*.png);;JPEG图片 (*.jpg *.jpeg);;BMP图片 (*.bmp);;TIFF图片 (*.tiff);;WebP图片 (*.webp);;SVG图片 (*.svg);;PDF文档 (*.pdf);;Deep Zoom图块 (*.dzi);;ICO图标 (*.ico);;所有文件 (*)"
             )
             
             if file_path:
@@ -116,47 +118,28 @@ class DocumentController(QObject):
                     file_path += ".webp"
                 elif "SVG" in filter_type and not file_path.lower().endswith('.svg'):
                     file_path += ".svg"
+                elif "PDF" in filter_type and not file_path.lower().endswith('.pdf'):
+                    file_path += ".pdf"
+                elif "Deep Zoom" in filter_type and not file_path.lower().endswith('.dzi'):
+                    file_path += ".dzi"
                 elif "ICO" in filter_type and not file_path.lower().endswith('.ico'):
                     file_path += ".ico"
                 
-                # 创建高分辨率图像
-                canvas_size = canvas.size()
-                scale_factor = 2.0  # 2倍分辨率
-                image = QImage(canvas_size.width() * scale_factor, 
-                             canvas_size.height() * scale_factor,
-                             QImage.Format_ARGB32)
-                image.fill(QColor(255, 255, 255))
-                
-                # 使用高质量渲染
-                painter = QPainter(image)
-                painter.setRenderHint(QPainter.Antialiasing)
-                painter.setRenderHint(QPainter.SmoothPixmapTransform)
-                painter.setRenderHint(QPainter.TextAntialiasing)
-                
-                # 应用缩放以提高分辨率
-                painter.scale(scale_factor, scale_factor)
-                canvas.render(painter)
-                painter.end()
-                
-                # 根据文件类型设置保存选项
-                save_options = {}
-                if file_path.lower().endswith(('.jpg', '.jpeg')):
-                    save_options['quality'] = 95  # JPEG质量设置（0-100）
-                elif file_path.lower().endswith('.png'):
-                    save_options['quality'] = 100  # PNG质量设置（0-100）
-                    save_options['compression'] = 1  # PNG压缩级别（0-9）
-                elif file_path.lower().endswith('.webp'):
-                    save_options['quality'] = 95  # WebP质量设置（0-100）
-                elif file_path.lower().endswith('.tiff'):
-                    save_options['compression'] = 'lzw'  # TIFF压缩方式
-                
-                # 保存图片
-                if image.save(file_path, quality=save_options.get('quality', -1)):
+                # 位图格式需要选择导出分辨率，SVG/PDF直接输出矢量
+                dpi = 96
+                if not is_vector_format(file_path):
+                    dpi, ok = QInputDialog.getInt(parent_widget, "导出分辨率", "分辨率 (DPI):", 192, 24, 2400)
+                    if not ok:
+                        return False
+                    
+                # 基于文档边界导出，与画布窗口大小无关
+                try:
+                    width, height = export_document(self.document, file_path, dpi)
                     QMessageBox.information(parent_widget, "导出成功", 
-                                         f"图片已导出到: {file_path}\n分辨率: {image.width()}x{image.height()}")
+                                         f"图片已导出到: {file_path}\n分辨率: {width}x{height}")
                     return True
-                else:
-                    QMessageBox.warning(parent_widget, "导出失败", "无法导出图片。")
+                except Exception as e:
+                    QMessageBox.warning(parent_widget, "导出失败", f"无法导出图片：{str(e)}")
         return False
         
     def add_recent_file(self, file_path):
@@ -175,6 +158,16 @@ class DocumentController(QObject):
         # 过滤掉不存在的文件
         self.recent_files = [f for f in self.recent_files if os.path.exists(f)]
         return self.recent_files
+
+    def get_recent_file_previews(self):
+        """获取最近文件及其预览信息
+
+        只读取各文件的文件头（缩略图和摘要），不加载图形。
+
+        返回:
+            [(file_path, header)] 列表，旧格式文件的 header 为 None
+        """
+        return [(f, read_header(f)) for f in self.get_recent_files()]
         
     def check_unsaved_changes(self, parent_widget):
         """检查是否有未保存的更改"""
@@ -4,7 +4,7 @@
 from PyQt5.QtCore import QObject, pyqtSignal, QPointF
 from PyQt5.QtGui import QPen, QBrush
 
-from models.tools import (SelectionTool, LineTool, RectangleTool, CircleTool,
+from models.tools import (SelectionTool, LassoTool, LineTool, RectangleTool, CircleTool,
                         FreehandTool, SpiralTool, SineCurveTool, ColorTool, EraserTool,
                         PenTool)
 
@@ -23,6 +23,7 @@ class ToolController(QObject):
         """初始化所有工具"""
         self.tools = {
             "selection": SelectionTool(self.document),
+            "lasso": LassoTool(self.document),
             "line": LineTool(self.document),
             "rectangle": RectangleTool(self.document),
             "circle": CircleTool(self.document),
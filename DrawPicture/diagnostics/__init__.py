@@ -0,0 +1 @@
+# 诊断包初始化文件 
\ No newline at end of file
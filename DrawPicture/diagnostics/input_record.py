@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""输入事件录制
+
+录制画布交给工具的鼠标事件（场景坐标，已应用吸附）、画布的按键事件、工具切换、视图变化，
+以及菜单和快捷键等画布以外触发的文档命令（撤销、重做、删除、复制），带有相对录制开始的时间戳，
+保存为紧凑的二进制文件，可由 benchmarks.replay 在无界面环境下回放。
+
+文件格式：MAGIC、版本号，之后是 zlib 压缩的数据：元数据 JSON 块、录制开始时的文档快照块
+（与旧格式绘图文件相同的 pickle 数据，可为空），然后是事件记录。每条事件记录以
+（类型, 距上一事件的微秒数）开头，其余字段由类型决定。
+"""
+
+from contextlib import contextmanager
+import json
+import pickle
+import struct
+import time
+import zlib
+
+from PyQt5.QtCore import QEvent
+
+MAGIC = b"DPINPUT"
+VERSION = 1
+
+# 事件类型
+MOUSE_PRESS = 1
+MOUSE_MOVE = 2
+MOUSE_RELEASE = 3
+MOUSE_DOUBLE_CLICK = 4
+KEY_PRESS = 5
+TOOL = 6    # 切换工具
+VIEW = 7    # 缩放或平移
+COMMAND = 8  # 文档命令
+
+# 事件类型 -> 名称（回放报告中按名称分类）
+EVENT_NAMES = {
+    MOUSE_PRESS: "mouse_press",
+    MOUSE_MOVE: "mouse_move",
+    MOUSE_RELEASE: "mouse_release",
+    MOUSE_DOUBLE_CLICK: "mouse_double_click",
+    KEY_PRESS: "key_press",
+    TOOL: "tool",
+    VIEW: "view",
+    COMMAND: "command",
+}
+
+# 录制的文档命令（无参数）。Ctrl+Z、Ctrl+Y、Delete 是主窗口的快捷键，
+# 按键不会到达画布，因此在文档层面录制这些命令
+DOCUMENT_COMMANDS = ('undo', 'redo', 'delete_selected_shapes', 'clone_selected_shapes')
+
+# Qt 鼠标事件类型 <-> 事件类型
+MOUSE_EVENT_TYPES = {
+    QEvent.MouseButtonPress: MOUSE_PRESS,
+    QEvent.MouseMove: MOUSE_MOVE,
+    QEvent.MouseButtonRelease: MOUSE_RELEASE,
+    QEvent.MouseButtonDblClick: MOUSE_DOUBLE_CLICK,
+}
+QT_MOUSE_EVENT_TYPES = {kind: event_type for event_type, kind in MOUSE_EVENT_TYPES.items()}
+
+# 修饰键标志的最低位（Qt.ShiftModifier），鼠标事件中右移后用一个字节保存
+MODIFIER_SHIFT = 25
+
+_PREFIX = struct.Struct('<BI')          # 类型、距上一事件的微秒数
+_BLOCK = struct.Struct('<I')            # 块长度
+_PAYLOADS = {
+    MOUSE_PRESS: struct.Struct('<BBBff'),    # 按键、按下的按键、修饰键、x、y
+    MOUSE_MOVE: struct.Struct('<BBBff'),
+    MOUSE_RELEASE: struct.Struct('<BBBff'),
+    MOUSE_DOUBLE_CLICK: struct.Struct('<BBBff'),
+    KEY_PRESS: struct.Struct('<iI'),         # 键码、修饰键
+    TOOL: struct.Struct('<B'),               # 工具在元数据 tools 列表中的序号
+    VIEW: struct.Struct('<dii'),             # 缩放因子、平移偏移量
+    COMMAND: struct.Struct('<B'),            # 命令在 DOCUMENT_COMMANDS 中的序号
+}
+
+
+class InputRecording:
+    """一次录制的内容
+
+    events 中每个事件为 (类型, 距录制开始的秒数, 字段...)：
+    鼠标事件的字段为 (按键, 按下的按键, 修饰键, x, y)，按键事件为 (键码, 修饰键)，
+    工具切换为 (工具类名,)，视图变化为 (缩放因子, 平移x, 平移y)，文档命令为 (方法名,)。
+    """
+
+    def __init__(self, meta, document_data=b"", events=None):
+        self.meta = meta
+        self.document_data = document_data
+        self.events = events if events is not None else []
+
+    @property
+    def duration(self):
+        """录制时长（秒）"""
+        return self.events[-1][1] if self.events else 0.0
+
+    def save(self, file_path):
+        """保存为录制文件"""
+        tools = []
+        body = bytearray()
+        previous = 0
+        for kind, seconds, *fields in self.events:
+            micros = round(seconds * 1e6)
+            delta = min(max(micros - previous, 0), 0xFFFFFFFF)
+            previous += delta
+            if kind == TOOL:
+                if fields[0] not in tools:
+                    tools.append(fields[0])
+                fields = [tools.index(fields[0])]
+            elif kind == COMMAND:
+                fields = [DOCUMENT_COMMANDS.index(fields[0])]
+            elif kind in QT_MOUSE_EVENT_TYPES:
+                fields = [fields[0] & 0xFF, fields[1] & 0xFF, (fields[2] >> MODIFIER_SHIFT) & 0xFF,
+                          fields[3], fields[4]]
+            body += _PREFIX.pack(kind, delta)
+            body += _PAYLOADS[kind].pack(*fields)
+        # 工具名称列表在编码事件时才确定
+        meta = json.dumps(dict(self.meta, tools=tools), ensure_ascii=False).encode('utf-8')
+        data = _BLOCK.pack(len(meta)) + meta + _BLOCK.pack(len(self.document_data)) + self.document_data + body
+        with open(file_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<B', VERSION))
+            f.write(zlib.compress(bytes(data)))
+
+    @classmethod
+    def load(cls, file_path):
+        """读取录制文件"""
+        with open(file_path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("不是输入录制文件")
+            version = f.read(1)
+            if not version or version[0] > VERSION:
+                raise ValueError("不支持的输入录制文件版本")
+            data = zlib.decompress(f.read())
+
+        offset = 0
+
+        def block():
+            nonlocal offset
+            length, = _BLOCK.unpack_from(data, offset)
+            offset += _BLOCK.size
+            offset += length
+            return data[offset - length:offset]
+
+        meta = json.loads(block().decode('utf-8'))
+        document_data = block()
+        tools = meta.get('tools', [])
+        events = []
+        micros = 0
+        while offset < len(data):
+            kind, delta = _PREFIX.unpack_from(data, offset)
+            offset += _PREFIX.size
+            payload = _PAYLOADS.get(kind)
+            if payload is None:
+                raise ValueError(f"未知的输入事件类型: {kind}")
+            fields = payload.unpack_from(data, offset)
+            offset += payload.size
+            micros += delta
+            if kind == TOOL:
+                fields = (tools[fields[0]],)
+            elif kind == COMMAND:
+                fields = (DOCUMENT_COMMANDS[fields[0]],)
+            elif kind in QT_MOUSE_EVENT_TYPES:
+                fields = fields[:2] + (fields[2] << MODIFIER_SHIFT,) + fields[3:]
+            events.append((kind, micros / 1e6) + tuple(fields))
+        return cls(meta, document_data, events)
+
+
+class InputRecorder:
+    """录制画布的输入事件
+
+    画布的 input_recorder 不为 None 时，画布用 mouse()/key() 返回的上下文包住事件的处理，
+    切换工具时调用 tool()。鼠标事件前若缩放或平移发生了变化，先记录一个视图事件。
+
+    录制期间文档的 DOCUMENT_COMMANDS 方法被替换为记录命令的包装，只记录不在事件处理中
+    调用的命令（菜单、工具栏、快捷键）；工具或画布按键处理中调用的命令在回放该事件时会再次执行。
+    """
+
+    def __init__(self, canvas, include_document=True):
+        """
+        参数:
+            include_document: 是否在录制中保存开始时的文档，回放时从相同的文档开始
+        """
+        self.canvas = canvas
+        self.include_document = include_document
+        self.recording = None
+        self._start = 0.0
+        self._view = None
+        self._depth = 0  # 正在处理的已录制事件和命令的层数
+        self._document = None  # 替换了命令方法的文档
+
+    @property
+    def active(self):
+        return self.recording is not None
+
+    def start(self):
+        """开始录制"""
+        canvas = self.canvas
+        document = canvas.document
+        tool = canvas.current_tool
+        meta = {
+            'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'size': [canvas.width(), canvas.height()],
+            'grid': [canvas.grid_visible, canvas.grid_size],
+            'shapes': len(document.shapes),
+        }
+        color_tool = getattr(tool, 'color_tool', None)
+        if color_tool is not None:
+            meta['style'] = {
+                'line_color': color_tool.line_color.rgba(),
+                'fill_color': color_tool.fill_color.rgba(),
+                'line_width': color_tool.line_width,
+                'line_style': int(color_tool.line_style),
+            }
+        document_data = b""
+        if self.include_document:
+            document_data = pickle.dumps({
+                'shapes': document.shapes,
+                'layers': document.layers,
+                'current_layer': document.current_layer,
+            })
+        self.recording = InputRecording(meta, document_data)
+        self._start = time.perf_counter()
+        self._view = None
+        self._depth = 0
+        if tool is not None:
+            self.tool(tool)
+        # 实例属性覆盖类的方法，主窗口的菜单和快捷键通过 lambda 在调用时才取方法
+        for name in DOCUMENT_COMMANDS:
+            setattr(document, name, self._wrap_command(name, getattr(document, name)))
+        self._document = document
+        canvas.input_recorder = self
+
+    def stop(self):
+        """停止录制，返回录制内容"""
+        recording = self.recording
+        self.recording = None
+        if self._document is not None:
+            for name in DOCUMENT_COMMANDS:
+                self._document.__dict__.pop(name, None)
+            self._document = None
+        if self.canvas.input_recorder is self:
+            self.canvas.input_recorder = None
+        return recording
+
+    @contextmanager
+    def _handling(self):
+        """处理已录制的事件或命令期间，其中调用的文档命令不再单独录制"""
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+
+    def _wrap_command(self, name, method):
+        def command(*args, **kwargs):
+            if self.recording is not None and not self._depth:
+                self._append(COMMAND, name)
+            with self._handling():
+                return method(*args, **kwargs)
+        return command
+
+    def _append(self, kind, *fields):
+        self.recording.events.append((kind, time.perf_counter() - self._start) + fields)
+
+    def _check_view(self):
+        canvas = self.canvas
+        view = (canvas.zoom_factor, canvas.pan_offset.x(), canvas.pan_offset.y())
+        if view != self._view:
+            self._view = view
+            self._append(VIEW, *view)
+
+    def mouse(self, event):
+        """记录交给工具的场景坐标鼠标事件，返回包住工具处理方法的上下文"""
+        self._check_view()
+        pos = event.localPos()
+        self._append(MOUSE_EVENT_TYPES[event.type()], int(event.button()), int(event.buttons()),
+                     int(event.modifiers()), pos.x(), pos.y())
+        return self._handling()
+
+    def key(self, event):
+        """记录画布的按键事件，返回包住按键处理的上下文"""
+        self._append(KEY_PRESS, event.key(), int(event.modifiers()))
+        return self._handling()
+
+    def tool(self, tool):
+        """记录切换到的工具"""
+        self._append(TOOL, type(tool).__name__)
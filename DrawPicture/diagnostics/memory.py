@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""内存估算
+
+递归累加对象图中各对象的大小，共享的对象只计算一次。Qt 对象的大小由 sys.getsizeof
+无法得到，常用的值类型按 C++ 对象的大小估算，路径和多边形按元素个数估算。
+
+MemoryInspector 按图形类型、图层、撤销历史条目和缓存分类统计文档占用的内存，
+图形和历史条目的估算结果按版本缓存，可以定期采样；MemoryMonitor 定期采样并保留趋势记录，
+用于发现长时间使用中的内存泄漏。
+"""
+
+from collections import deque
+import json
+import sys
+import time
+
+from PyQt5.QtCore import QObject, QTimer, QPointF, QRectF, pyqtSignal
+from PyQt5.QtGui import QPainterPath, QPolygonF, QColor, QPen, QBrush, QTransform
+import numpy as np
+
+from DrawPicture.models.styles import style_table
+
+# QPainterPath 每个元素（类型 + 坐标）的估算字节数
+PATH_ELEMENT_BYTES = 24
+# QPolygonF 每个顶点的字节数
+POLYGON_POINT_BYTES = 16
+# 常用 Qt 值类型的 C++ 对象（含共享数据）估算字节数，不含 Python 包装对象
+QT_VALUE_BYTES = {
+    QPointF: 16,
+    QRectF: 32,
+    QColor: 16,
+    QTransform: 88,
+    QPen: 80,
+    QBrush: 56,
+}
+
+# 图形缓存属性 -> 缓存分类名称
+SHAPE_CACHES = {
+    '_cached_transform': "变换",
+    '_cached_global_bounds': "边界",
+    '_cached_scene_bounds': "边界",
+    '_cached_sample_points': "采样点",
+    '_cached_snap_points': "吸附点",
+    '_cached_polyline_lod': "细节层次",
+    '_cached_flattened_curve': "曲线展平",
+}
+
+# 图形中不计入图形自身数据的其他属性：所属的变换存储（文档共享）
+_SHAPE_EXCLUDED = ('_store',)
+
+
+def estimate_size(obj, seen=None):
+    """估算对象及其引用的所有对象占用的字节数
+
+    参数:
+        seen: 已计算过的对象 id 集合，多次调用共享同一个集合时共享的对象只计算一次；
+            预先放入的对象不计算，也不继续遍历
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            # 视图不拥有数据，计算其引用的数组
+            total += sys.getsizeof(obj)
+            if obj.base is not None:
+                stack.append(obj.base)
+            continue
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        elif isinstance(obj, QPainterPath):
+            total += obj.elementCount() * PATH_ELEMENT_BYTES
+        elif isinstance(obj, QPolygonF):
+            total += obj.count() * POLYGON_POINT_BYTES
+        elif type(obj) in QT_VALUE_BYTES:
+            total += QT_VALUE_BYTES[type(obj)]
+        elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+            stack.append(obj.__dict__)
+    return total
+
+
+def format_bytes(size):
+    """把字节数格式化为便于阅读的字符串"""
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class MemoryInspector:
+    """按图形类型、图层、撤销历史和缓存统计文档占用的内存"""
+
+    def __init__(self, document, canvas=None):
+        self.document = document
+        self.canvas = canvas
+        self._shape_sizes = {}    # id(图形) -> (图形, 几何版本, 属性个数, 字节数)
+        self._history_sizes = {}  # id(历史条目) -> (历史条目, 字节数)
+
+    def shape_bytes(self, shape):
+        """估算图形自身数据（不含缓存）占用的字节数，几何版本不变时沿用上次的结果"""
+        state = shape.__dict__
+        key = (state.get('_geometry_version'), len(state))
+        cached = self._shape_sizes.get(id(shape))
+        if cached is not None and cached[0] is shape and cached[1:3] == key:
+            return cached[3]
+        seen = {id(state)}
+        size = sys.getsizeof(shape) + sys.getsizeof(state)
+        for name, value in state.items():
+            if name in SHAPE_CACHES or name in _SHAPE_EXCLUDED:
+                continue
+            size += estimate_size(name, seen) + estimate_size(value, seen)
+        self._shape_sizes[id(shape)] = (shape, key[0], key[1], size)
+        return size
+
+    def shape_cache_bytes(self, shape):
+        """估算图形各缓存占用的字节数，返回 {缓存分类名称: 字节数}"""
+        result = {}
+        state = shape.__dict__
+        for name, category in SHAPE_CACHES.items():
+            value = state.get(name)
+            if value is not None:
+                result[category] = result.get(category, 0) + estimate_size(value)
+        return result
+
+    def history_bytes(self, entry):
+        """估算一个撤销/重做条目占用的字节数（条目不会被修改，结果按条目缓存）"""
+        cached = self._history_sizes.get(id(entry))
+        if cached is not None and cached[0] is entry:
+            return cached[1]
+        size = estimate_size(entry)
+        self._history_sizes[id(entry)] = (entry, size)
+        return size
+
+    def report(self):
+        """生成内存报告
+
+        返回:
+            字典：time、total、shape_count、shapes（图形数据字节数）、
+            shape_types 与 layers（名称 -> {'count', 'bytes'}）、
+            history（[{'stack', 'index', 'shapes', 'bytes'}]）、history_bytes、
+            caches（缓存名称 -> 字节数）、shared（共享数据名称 -> 字节数）
+        """
+        document = self.document
+        shape_types, layers, caches = {}, {}, {}
+        shapes_total = 0
+        for shape in document.shapes:
+            size = self.shape_bytes(shape)
+            shapes_total += size
+            for table, key in ((shape_types, type(shape).__name__), (layers, shape.layer)):
+                entry = table.setdefault(key, {'count': 0, 'bytes': 0})
+                entry['count'] += 1
+                entry['bytes'] += size
+            for name, cache_size in self.shape_cache_bytes(shape).items():
+                caches[name] = caches.get(name, 0) + cache_size
+
+        history = []
+        for stack_name, stack in (('undo', document.undo_stack), ('redo', document.redo_stack)):
+            for index, entry in enumerate(stack):
+                history.append({'stack': stack_name, 'index': index,
+                                'shapes': len(entry.get('shapes', ())), 'bytes': self.history_bytes(entry)})
+        history_total = sum(item['bytes'] for item in history)
+
+        # 文档共享的数据，不继续遍历到图形
+        excluded = {id(shape) for shape in document.shapes}
+        excluded.add(id(document.shapes))
+        shared = {
+            "变换存储": estimate_size(document.transforms, set(excluded)),
+            "样式表": estimate_size(style_table()),
+        }
+        if self.canvas is not None:
+            excluded.add(id(document.transforms))
+            shared["吸附索引"] = estimate_size(self.canvas.snapper.index, set(excluded))
+            caches.update(self.canvas.cache_memory())
+
+        # 清理已不存在的图形和历史条目的估算结果
+        live = {id(shape) for shape in document.shapes}
+        self._shape_sizes = {key: value for key, value in self._shape_sizes.items() if key in live}
+        live = {id(entry) for entry in document.undo_stack}
+        live.update(id(entry) for entry in document.redo_stack)
+        self._history_sizes = {key: value for key, value in self._history_sizes.items() if key in live}
+
+        return {
+            'time': time.time(),
+            'total': shapes_total + history_total + sum(caches.values()) + sum(shared.values()),
+            'shape_count': len(document.shapes),
+            'shapes': shapes_total,
+            'shape_types': shape_types,
+            'layers': layers,
+            'history': history,
+            'history_bytes': history_total,
+            'caches': caches,
+            'shared': shared,
+        }
+
+
+class MemoryMonitor(QObject):
+    """定期采样内存报告并保留趋势记录"""
+
+    sampled = pyqtSignal(dict)  # 每次采样后发送完整报告
+
+    INTERVAL = 30000    # 默认采样间隔（毫秒）
+    MAX_SAMPLES = 720   # 保留的趋势记录条数
+
+    def __init__(self, document, canvas=None, interval=INTERVAL, log_path=None, parent=None):
+        """
+        参数:
+            log_path: 趋势日志文件路径，每次采样追加一行 JSON，为 None 时只保留在内存中
+        """
+        super().__init__(parent)
+        self.inspector = MemoryInspector(document, canvas)
+        self.log_path = log_path
+        self.trend = deque(maxlen=self.MAX_SAMPLES)  # 每次采样的摘要
+        self.last_report = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.sample)
+
+    def start(self):
+        """开始定期采样"""
+        self._timer.start()
+
+    def stop(self):
+        """停止定期采样"""
+        self._timer.stop()
+
+    def sample(self):
+        """立即采样一次，返回报告"""
+        start = time.perf_counter()
+        report = self.inspector.report()
+        summary = {
+            'time': report['time'],
+            'total': report['total'],
+            'shape_count': report['shape_count'],
+            'shapes': report['shapes'],
+            'history': report['history_bytes'],
+            'caches': sum(report['caches'].values()),
+            'shared': sum(report['shared'].values()),
+            'cost': time.perf_counter() - start,  # 本次采样耗时（秒）
+        }
+        self.trend.append(summary)
+        self.last_report = report
+        if self.log_path:
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(summary) + "\n")
+            except OSError as e:
+                print(f"写入内存趋势日志失败: {str(e)}")
+        self.sampled.emit(report)
+        return report
+
+    def growth_rate(self, key='total'):
+        """按趋势记录的线性拟合估算内存增长速度（字节/分钟），记录少于3条时返回 None"""
+        if len(self.trend) < 3:
+            return None
+        times = np.array([sample['time'] for sample in self.trend])
+        values = np.array([sample[key] for sample in self.trend], dtype=np.float64)
+        if times[-1] - times[0] <= 0:
+            return None
+        slope = np.polyfit(times - times[0], values, 1)[0]
+        return slope * 60
+
+    def save_trend(self, file_path):
+        """把趋势记录保存为 JSON 行文件"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            for sample in self.trend:
+                f.write(json.dumps(sample) + "\n")
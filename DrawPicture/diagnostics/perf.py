@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""性能计数器
+
+绘制、缓存和文档信号的轻量计数器，供性能信息面板显示。计数器默认关闭，
+关闭时各调用点只检查一次 perf.enabled，不做其他工作：
+
+    if perf.enabled:
+        perf.cache("tiles", hit)
+
+计数在两次 snapshot 之间累积，snapshot 返回这段时间的统计并清零。
+"""
+
+from collections import defaultdict
+import time
+
+
+class PerfCounters:
+    """一段时间内的帧、图形、缓存和信号计数"""
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        """清零所有计数，开始新的统计区间"""
+        self._start = time.perf_counter()
+        self._frame_start = None
+        self.frames = 0
+        self.frame_time = 0.0      # 区间内所有帧的绘制时间之和（秒）
+        self.max_frame_time = 0.0
+        self.shapes_painted = 0
+        self.shapes_culled = 0
+        self.layer_times = defaultdict(float)     # 图层名称 -> 绘制时间（秒）
+        self.caches = defaultdict(lambda: [0, 0])  # 缓存名称 -> [命中次数, 未命中次数]
+        self.signals = defaultdict(int)            # 信号名称 -> 发射次数
+
+    def begin_frame(self):
+        """开始计时一帧"""
+        self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """结束计时一帧"""
+        if self._frame_start is None:
+            return
+        elapsed = time.perf_counter() - self._frame_start
+        self._frame_start = None
+        self.frames += 1
+        self.frame_time += elapsed
+        self.max_frame_time = max(self.max_frame_time, elapsed)
+
+    def count_shapes(self, painted, culled):
+        """记录一次绘制中绘制的图形数和被区域裁剪掉的图形数"""
+        self.shapes_painted += painted
+        self.shapes_culled += culled
+
+    def add_layer_time(self, layer, seconds):
+        """累加图层的绘制时间"""
+        self.layer_times[layer] += seconds
+
+    def cache(self, name, hit):
+        """记录一次缓存查找"""
+        self.caches[name][0 if hit else 1] += 1
+
+    def signal(self, name):
+        """记录一次信号发射"""
+        self.signals[name] += 1
+
+    def snapshot(self):
+        """获取自上次 snapshot（或 reset）以来的统计并清零
+
+        返回:
+            字典：elapsed（秒）、frames、fps、frame_time 与 max_frame_time（每帧平均与最大，秒）、
+            shapes_painted 与 shapes_culled（每帧平均）、layer_times（每帧平均，秒）、
+            caches（名称 -> (命中次数, 查找次数)）、signal_rates（名称 -> 每秒次数）
+        """
+        elapsed = max(time.perf_counter() - self._start, 1e-9)
+        frames = max(self.frames, 1)
+        result = {
+            'elapsed': elapsed,
+            'frames': self.frames,
+            'fps': self.frames / elapsed,
+            'frame_time': self.frame_time / frames,
+            'max_frame_time': self.max_frame_time,
+            'shapes_painted': self.shapes_painted / frames,
+            'shapes_culled': self.shapes_culled / frames,
+            'layer_times': {layer: seconds / frames for layer, seconds in self.layer_times.items()},
+            'caches': {name: (hits, hits + misses) for name, (hits, misses) in self.caches.items()},
+            'signal_rates': {name: count / elapsed for name, count in self.signals.items()},
+        }
+        self.reset()
+        return result
+
+
+# 全局计数器
+perf = PerfCounters()
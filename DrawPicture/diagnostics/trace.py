@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""性能跟踪
+
+记录图形绘制、画布绘制事件、工具鼠标事件和文档修改的耗时区间，输出为 Chrome 跟踪格式
+（JSON），可在 chrome://tracing 或 Perfetto（ui.perfetto.dev）中打开。
+
+跟踪是可选的：start() 时才用计时包装替换各类的方法，stop() 时恢复原方法，
+未跟踪时没有任何额外开销。区间名称为 "类名.方法名"，可按图形或工具类型查看耗时。
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+
+# 文档中记录跟踪区间的修改操作
+DOCUMENT_METHODS = (
+    'add_shape', 'remove_shape', 'clear', 'move_selected_shapes', 'rotate_selected_shapes',
+    'scale_selected_shapes', 'clone_selected_shapes', 'delete_selected_shapes',
+    'bring_to_front', 'send_to_back', 'add_layer', 'remove_layer', 'rename_layer',
+    'move_layer_up', 'move_layer_down', 'set_layer_visibility', 'set_layer_locked',
+    'set_layer_opacity', 'record_state', 'undo', 'redo', 'new_document', 'save', 'load',
+)
+
+# 工具中记录跟踪区间的事件处理方法
+TOOL_METHODS = ('mouse_press', 'mouse_move', 'mouse_release')
+
+
+def _subclasses(cls):
+    """cls 及其所有子类"""
+    result = [cls]
+    for subclass in cls.__subclasses__():
+        result.extend(c for c in _subclasses(subclass) if c not in result)
+    return result
+
+
+class Tracer:
+    """Chrome 跟踪格式的区间记录器"""
+
+    MAX_EVENTS = 1000000  # 最多记录的区间数，超过后丢弃新的区间
+
+    def __init__(self):
+        self.active = False
+        self.events = []  # (名称, 类别, 开始纳秒, 持续纳秒, 线程 id)
+        self.dropped = 0
+        self._patched = []  # (类, 方法名, 原方法)
+        self._origin = 0
+
+    def start(self):
+        """清空已记录的区间并开始跟踪"""
+        if self.active:
+            return
+        self.events = []
+        self.dropped = 0
+        self._origin = time.perf_counter_ns()
+        self._install()
+        self.active = True
+
+    def stop(self):
+        """停止跟踪，恢复被包装的方法"""
+        if not self.active:
+            return
+        self.active = False
+        for cls, name, original in reversed(self._patched):
+            setattr(cls, name, original)
+        self._patched = []
+
+    def record(self, name, category, start, duration):
+        """记录一个区间（纳秒）"""
+        if len(self.events) >= self.MAX_EVENTS:
+            self.dropped += 1
+            return
+        self.events.append((name, category, start, duration, threading.get_ident()))
+
+    def span(self, name, category="app"):
+        """用于 with 语句的计时区间，未跟踪时不记录"""
+        return _Span(self, name, category)
+
+    def to_chrome_trace(self):
+        """转换为 Chrome 跟踪格式的字典"""
+        pid = os.getpid()
+        origin = self._origin
+        events = [{'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - origin) / 1000.0, 'dur': duration / 1000.0}
+                  for name, category, start, duration, tid in self.events]
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for tid in {event[4] for event in self.events}:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': names.get(tid, str(tid))}})
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'dropped_events': self.dropped},
+        }
+
+    def save(self, file_path):
+        """把已记录的区间写入 Chrome 跟踪文件"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+    def _install(self):
+        """用计时包装替换需要跟踪的方法"""
+        from DrawPicture.models.document import Document
+        from DrawPicture.models.shapes import Shape
+        from DrawPicture.models.tools import DrawingTool
+        from DrawPicture.views.canvas import Canvas
+
+        targets = [(Canvas, 'paintEvent', 'canvas')]
+        for cls in _subclasses(Shape):
+            targets += [(cls, name, 'paint') for name in ('paint', '_draw') if name in cls.__dict__]
+        for cls in _subclasses(DrawingTool):
+            targets += [(cls, name, 'tool') for name in TOOL_METHODS if name in cls.__dict__]
+        targets += [(Document, name, 'document') for name in DOCUMENT_METHODS if name in Document.__dict__]
+
+        for cls, name, category in targets:
+            original = cls.__dict__[name]
+            setattr(cls, name, self._wrap(original, name, category))
+            self._patched.append((cls, name, original))
+
+    def _wrap(self, method, name, category):
+        """包装方法，区间名称取调用对象的实际类型，继承的方法也按子类区分"""
+        record = self.record
+        clock = time.perf_counter_ns
+
+        @functools.wraps(method)
+        def wrapper(obj, *args, **kwargs):
+            start = clock()
+            try:
+                return method(obj, *args, **kwargs)
+            finally:
+                record(f"{type(obj).__name__}.{name}", category, start, clock() - start)
+        return wrapper
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'category', 'start')
+
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self.tracer.active:
+            self.tracer.record(self.name, self.category, self.start, time.perf_counter_ns() - self.start)
+        return False
+
+
+# 全局跟踪器
+tracer = Tracer()
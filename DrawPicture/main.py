@@ -8,9 +8,19 @@ from PyQt5.QtWidgets import QApplication
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from DrawPicture.diagnostics.trace import tracer
 from DrawPicture.views.main_window import MainWindow
 
 if __name__ == "__main__":
+    # 设置环境变量 DRAWPICTURE_TRACE=文件路径 时记录整个会话的性能跟踪，退出时保存
+    # 相对路径相对于启动时的工作目录，需在切换目录前解析
+    trace_path = os.environ.get("DRAWPICTURE_TRACE")
+    if trace_path:
+        trace_path = os.path.abspath(trace_path)
+    # 主窗口读取的内存趋势日志路径同样先解析为绝对路径
+    if os.environ.get("DRAWPICTURE_MEMORY_LOG"):
+        os.environ["DRAWPICTURE_MEMORY_LOG"] = os.path.abspath(os.environ["DRAWPICTURE_MEMORY_LOG"])
+    
     # 确保当前目录是程序所在目录
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
     
@@ -18,9 +28,16 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     app.setStyle('Fusion')  # 使用Fusion风格
     
+    if trace_path:
+        tracer.start()
+    
     # 创建并显示主窗口
     window = MainWindow()
     window.show()
     
     # 运行应用
-    sys.exit(app.exec_()) 
\ No newline at end of file
+    status = app.exec_()
+    if trace_path and tracer.active:
+        tracer.stop()
+        tracer.save(trace_path)
+    sys.exit(status) 
\ No newline at end of file
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from PyQt5.QtCore import QObject, pyqtSignal, QPointF, QFileInfo
+from PyQt5.QtCore import QObject, pyqtSignal, QPointF, QRectF, QFileInfo
 from PyQt5.QtGui import QColor, QPen, QBrush
-import pickle
 import os
 
+import numpy as np
+
+from DrawPicture.models.document_file import write_document, read_document
+from DrawPicture.models.geometry import points_in_polygon
+from DrawPicture.models.transform_store import TransformStore
+
 class DrawingDocument(QObject):
     """图形文档类，管理所有图形对象"""
     
@@ -440,13 +445,13 @@ class DrawingDocument(QObject):
     def save(self, filepath):
         """保存文档"""
         try:
-            with open(filepath, 'wb') as f:
-                data = {
-                    'shapes': self.shapes,
-                    'layers': self.layers,
-                    'current_layer': self.current_layer
-                }
-                pickle.dump(data, f)
+            data = {
+                'shapes': self.shapes,
+                'layers': self.layers,
+                'current_layer': self.current_layer
+            }
+            # 文件头中附带缩略图和摘要，便于不加载文档即可预览
+            write_document(filepath, self, data)
                 
             self.file_path = filepath
             self.set_modified(False)
@@ -461,8 +466,7 @@ class DrawingDocument(QObject):
             return False
             
         try:
-            with open(filepath, 'rb') as f:
-                data = pickle.load(f)
+            data = read_document(filepath)
                 
             self.shapes = data.get('shapes', [])
             self.layers = data.get('layers', [{'name': '默认图层', 'visible': True}])
@@ -496,9 +500,8 @@ class DrawingDocument(QObject):
             shape_copy = shape.clone()
             # 确保选择状态也被复制
             shape_copy.selected = shape.selected
-            # 确保填充和线条属性正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享填充和线条样式（样式表中的条目不可变，只需复制编号）
+            shape_copy.copy_style(shape)
             state.append(shape_copy)
             
         self.undo_stack.append({
@@ -526,9 +529,8 @@ class DrawingDocument(QObject):
             shape_copy = shape.clone()
             # 确保选择状态也被复制
             shape_copy.selected = shape.selected
-            # 确保填充和线条属性正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享填充和线条样式（样式表中的条目不可变，只需复制编号）
+            shape_copy.copy_style(shape)
             current_state.append(shape_copy)
             
         self.redo_stack.append({
@@ -545,9 +547,8 @@ class DrawingDocument(QObject):
         for shape in state['shapes']:
             # 创建一个新的深度副本，确保不会引用原始对象
             shape_copy = shape.clone()
-            # 确保pen和brush被正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享pen和brush
+            shape_copy.copy_style(shape)
             # 复制选择状态
             shape_copy.selected = shape.selected
             restored_shapes.append(shape_copy)
@@ -580,9 +581,8 @@ class DrawingDocument(QObject):
             shape_copy = shape.clone()
             # 确保选择状态也被复制
             shape_copy.selected = shape.selected
-            # 确保填充和线条属性正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享填充和线条样式（样式表中的条目不可变，只需复制编号）
+            shape_copy.copy_style(shape)
             current_state.append(shape_copy)
             
         self.undo_stack.append({
@@ -599,9 +599,8 @@ class DrawingDocument(QObject):
         for shape in state['shapes']:
             # 创建一个新的深度副本，确保不会引用原始对象
             shape_copy = shape.clone()
-            # 确保pen和brush被正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享pen和brush
+            shape_copy.copy_style(shape)
             # 复制选择状态
             shape_copy.selected = shape.selected
             restored_shapes.append(shape_copy)
@@ -652,6 +651,11 @@ class Document(QObject):
         self.selected_shapes = []  # 存储选中的图形
         self.temp_shapes = []  # 临时形状，用于预览
         
+        # 图形变换的列式存储，同时作为空间索引
+        self.transforms = TransformStore()
+        self._order_version = 0  # 不经过绑定/解绑改变绘制顺序（置顶、置底）时递增
+        self._draw_order = None  # 缓存的 (键, 行号 -> 绘制序号)
+        
         # 文件信息
         self.file_path = None  # 文档文件路径
         self.modified = False  # 文档是否被修改
@@ -669,6 +673,7 @@ class Document(QObject):
         """添加图形"""
         self.record_state()
         self.shapes.append(shape)
+        self.transforms.bind(shape)
         self.modified = True
         self.document_changed.emit()
         
@@ -679,6 +684,7 @@ class Document(QObject):
             self.record_state()
             
             self.shapes.remove(shape)
+            self.transforms.unbind(shape)
             if shape in self.selected_shapes:
                 self.selected_shapes.remove(shape)
                 self.selection_changed.emit()
@@ -691,6 +697,7 @@ class Document(QObject):
         if self.shapes:
             self.record_state()
             self.shapes.clear()
+            self.transforms.rebuild(self.shapes)
             self.selected_shapes.clear()
             self.set_modified(True)
             self.document_changed.emit()
@@ -711,6 +718,26 @@ class Document(QObject):
             shape.is_selected = True
             self.selection_changed.emit()
     
+    def select_shapes(self, shapes, multi_select=False):
+        """批量选择图形，只发送一次选择变化信号"""
+        changed = False
+        if not multi_select and self.selected_shapes:
+            for s in self.selected_shapes:
+                s.is_selected = False
+            self.selected_shapes.clear()
+            changed = True
+            
+        selected = set(self.selected_shapes)
+        for shape in shapes:
+            if shape not in selected:
+                selected.add(shape)
+                self.selected_shapes.append(shape)
+                shape.is_selected = True
+                changed = True
+                
+        if changed:
+            self.selection_changed.emit()
+    
     def deselect_shape(self, shape):
         """取消选择图形"""
         if shape in self.selected_shapes:
@@ -726,6 +753,94 @@ class Document(QObject):
             self.selected_shapes.clear()
             self.selection_changed.emit()
     
+    def rows_in_rect(self, rect, contained=False):
+        """查询区域内可见图层中的图形，返回其在变换存储中的行号数组
+        
+        参数:
+            rect: 场景坐标中的查询矩形
+            contained: 为True时只返回边界完全位于矩形内的图形，否则返回边界与矩形相交的图形
+        """
+        rows = self.transforms.query_rect_rows(rect, contained)
+        # 只有存在隐藏图层时才需要逐个过滤
+        if len(rows) and not all(layer['visible'] for layer in self.layers):
+            visible = {layer['name'] for layer in self.layers if layer['visible']}
+            shapes = self.transforms.shapes
+            rows = rows[np.fromiter((shapes[row].layer in visible for row in rows),
+                                    dtype=bool, count=len(rows))]
+        return rows
+    
+    def rows_in_polygon(self, polygon):
+        """查询完全位于多边形内的可见图形，返回其在变换存储中的行号数组
+        
+        先用空间索引筛选出边界位于多边形外接矩形内的图形，
+        再对这些图形的全部采样点做一次批量的点在多边形内判断。
+        
+        参数:
+            polygon: (M, 2) 场景坐标的多边形顶点数组
+        """
+        polygon = np.asarray(polygon, dtype=np.float64)
+        if len(polygon) < 3:
+            return np.empty(0, dtype=np.intp)
+        left, top = polygon.min(axis=0)
+        right, bottom = polygon.max(axis=0)
+        rows = self.rows_in_rect(QRectF(left, top, right - left, bottom - top), contained=True)
+        if not len(rows):
+            return rows
+            
+        shapes = self.transforms.shapes
+        samples = [shapes[row].sample_points() for row in rows]
+        counts = np.fromiter((len(points) for points in samples), dtype=np.intp, count=len(samples))
+        points = self.transforms.map_points(np.repeat(rows, counts), np.concatenate(samples))
+        inside = points_in_polygon(points, polygon)
+        
+        # 图形的所有采样点都在多边形内才算位于多边形内
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        return rows[np.logical_and.reduceat(inside, starts)]
+    
+    def shapes_in_rect(self, rect, contained=False):
+        """查询区域内可见图层中的图形，参数同 rows_in_rect"""
+        shapes = self.transforms.shapes
+        return [shapes[row] for row in self.rows_in_rect(rect, contained)]
+    
+    def _draw_order_ranks(self):
+        """获取行号 -> 绘制序号的数组，图形列表的增删都会绑定或解绑行，据此判断缓存是否过期"""
+        key = (self.transforms.binding_revision, self._order_version, len(self.shapes))
+        if self._draw_order is None or self._draw_order[0] != key:
+            rows = self.transforms.rows_of(self.shapes)
+            # rows_of 可能绑定了新图形，键需要重新获取
+            key = (self.transforms.binding_revision, self._order_version, len(self.shapes))
+            ranks = np.zeros(self.transforms.count, dtype=np.intp)
+            ranks[rows] = np.arange(len(rows))
+            self._draw_order = (key, ranks)
+        return self._draw_order[1]
+    
+    def shapes_to_draw(self, rects, include=None, exclude=None):
+        """获取与任一矩形相交的可见图形，按绘制顺序排列，每个图形只出现一次
+        
+        参数:
+            rects: 场景坐标的矩形列表
+            include: 行号数组，不为 None 时只返回这些行中的图形
+            exclude: 行号数组，不返回这些行中的图形
+        """
+        rows = np.unique(np.concatenate([self.rows_in_rect(rect) for rect in rects] or
+                                        [np.empty(0, dtype=np.intp)]))
+        if include is not None:
+            rows = rows[np.isin(rows, include)]
+        if exclude is not None and len(exclude):
+            rows = rows[~np.isin(rows, exclude)]
+        ranks = self._draw_order_ranks()
+        rows = rows[np.argsort(ranks[rows], kind='stable')]
+        shapes = self.transforms.shapes
+        return [shapes[row] for row in rows]
+    
+    def begin_damage(self):
+        """开始记录被修改图形的区域，见 take_damage"""
+        self.transforms.begin_damage()
+        
+    def take_damage(self):
+        """获取自 begin_damage 以来被移动、修改、添加或删除的图形在修改前后覆盖的场景区域"""
+        return self.transforms.take_damage()
+    
     def get_shape_at(self, point, exclude_eraser=False):
         """获取指定点上的图形"""
         # 从后向前遍历（顶层优先）
@@ -744,44 +859,61 @@ class Document(QObject):
                 
         return None
     
+    def selection_bounds(self, margin=0):
+        """获取所有选中图形的合并边界矩形（场景坐标），没有选中图形时返回空矩形"""
+        if not self.selected_shapes:
+            return QRectF()
+        rows = self.transforms.rows_of(self.selected_shapes)
+        rect = self.transforms.union_bounds(rows)
+        return rect.adjusted(-margin, -margin, margin, margin)
+    
     def move_selected_shapes(self, delta):
         """移动选中的图形"""
         if not self.selected_shapes:
             return
         
-        for shape in self.selected_shapes:
-            if hasattr(shape, 'position'):
-                # 更新图形位置
-                shape.position = QPointF(shape.position.x() + delta.x(), 
-                                      shape.position.y() + delta.y())
+        # 在列式存储中一次性平移所有选中图形
+        rows = self.transforms.rows_of(self.selected_shapes)
+        self.transforms.translate(rows, delta.x(), delta.y())
                 
         # 发送文档变化信号，强制重绘画布
         self.document_changed.emit()
         # 发送选择变化信号，确保选择框也更新
         self.selection_changed.emit()
     
-    def rotate_selected_shapes(self, angle):
-        """旋转选中的图形"""
+    def rotate_selected_shapes(self, angle, pivot=None):
+        """旋转选中的图形
+        
+        参数:
+            angle: 旋转角度
+            pivot: 旋转中心，为None时各图形绕自身原点旋转
+        """
         if not self.selected_shapes:
             return
             
             self.record_state()
         
-        for shape in self.selected_shapes:
-            shape.rotate(angle)
+        rows = self.transforms.rows_of(self.selected_shapes)
+        self.transforms.rotate(rows, angle, pivot)
             
         self.set_modified(True)
         self.document_changed.emit()
     
-    def scale_selected_shapes(self, factor):
-        """缩放选中的图形"""
+    def scale_selected_shapes(self, factor, pivot=None, factor_y=None):
+        """缩放选中的图形
+        
+        参数:
+            factor: 缩放因子（factor_y 不为None时为水平方向的缩放因子）
+            pivot: 缩放中心，为None时各图形以自身原点缩放
+            factor_y: 垂直方向的缩放因子，为None时与 factor 相同
+        """
         if not self.selected_shapes:
             return
             
             self.record_state()
         
-        for shape in self.selected_shapes:
-            shape.scale(factor)
+        rows = self.transforms.rows_of(self.selected_shapes)
+        self.transforms.scale(rows, factor, factor_y, pivot)
             
         self.set_modified(True)
         self.document_changed.emit()
@@ -801,6 +933,7 @@ class Document(QObject):
                                      clone.position.y() + 10))
             clone.z_value = self.current_layer
             self.shapes.append(clone)
+            self.transforms.bind(clone)
             new_shapes.append(clone)
         
         # 选择新复制的图形
@@ -820,6 +953,7 @@ class Document(QObject):
         for shape in self.selected_shapes:
             if shape in self.shapes:
                 self.shapes.remove(shape)
+                self.transforms.unbind(shape)
         
         self.selected_shapes.clear()
         self.modified = True
@@ -837,6 +971,7 @@ class Document(QObject):
         
         self.shapes.remove(shape)
         self.shapes.append(shape)
+        self._order_version += 1
         
         self.set_modified(True)
         self.document_changed.emit()
@@ -852,6 +987,7 @@ class Document(QObject):
         
         self.shapes.remove(shape)
         self.shapes.insert(0, shape)
+        self._order_version += 1
         
         self.set_modified(True)
         self.document_changed.emit()
@@ -893,6 +1029,7 @@ class Document(QObject):
             for shape in shapes_to_remove:
                 if shape in self.shapes:
                     self.shapes.remove(shape)
+                    self.transforms.unbind(shape)
                 if shape in self.selected_shapes:
                     self.selected_shapes.remove(shape)
             
@@ -1057,6 +1194,7 @@ class Document(QObject):
         """新建文档"""
         self.clear()
         self.shapes.clear()
+        self.transforms.rebuild(self.shapes)
         self.selected_shapes.clear()
         self.file_path = None
         self.undo_stack.clear()
@@ -1070,13 +1208,13 @@ class Document(QObject):
     def save(self, filepath):
         """保存文档"""
         try:
-            with open(filepath, 'wb') as f:
-                data = {
-                    'shapes': self.shapes,
-                    'layers': self.layers,
-                    'current_layer': self.current_layer
-                }
-                pickle.dump(data, f)
+            data = {
+                'shapes': self.shapes,
+                'layers': self.layers,
+                'current_layer': self.current_layer
+            }
+            # 文件头中附带缩略图和摘要，便于不加载文档即可预览
+            write_document(filepath, self, data)
                 
             self.file_path = filepath
             self.set_modified(False)
@@ -1092,10 +1230,10 @@ class Document(QObject):
             return False
             
         try:
-            with open(filepath, 'rb') as f:
-                data = pickle.load(f)
+            data = read_document(filepath)
                 
             self.shapes = data.get('shapes', [])
+            self.transforms.rebuild(self.shapes)
             self.layers = data.get('layers', [{'name': '默认图层', 'visible': True}])
             self.current_layer = data.get('current_layer', 0)
             self.selected_shapes.clear()
@@ -1127,9 +1265,8 @@ class Document(QObject):
             shape_copy = shape.clone()
             # 确保选择状态也被复制
             shape_copy.selected = shape.selected
-            # 确保填充和线条属性正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享填充和线条样式（样式表中的条目不可变，只需复制编号）
+            shape_copy.copy_style(shape)
             state.append(shape_copy)
             
         self.undo_stack.append({
@@ -1157,9 +1294,8 @@ class Document(QObject):
             shape_copy = shape.clone()
             # 确保选择状态也被复制
             shape_copy.selected = shape.selected
-            # 确保填充和线条属性正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享填充和线条样式（样式表中的条目不可变，只需复制编号）
+            shape_copy.copy_style(shape)
             current_state.append(shape_copy)
             
         self.redo_stack.append({
@@ -1176,15 +1312,15 @@ class Document(QObject):
         for shape in state['shapes']:
             # 创建一个新的深度副本，确保不会引用原始对象
             shape_copy = shape.clone()
-            # 确保pen和brush被正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享pen和brush
+            shape_copy.copy_style(shape)
             # 复制选择状态
             shape_copy.selected = shape.selected
             restored_shapes.append(shape_copy)
             
         # 恢复图形列表
         self.shapes = restored_shapes
+        self.transforms.rebuild(self.shapes)
         
         # 恢复选择状态
         self.selected_shapes = [shape for shape in self.shapes if shape.selected]
@@ -1211,9 +1347,8 @@ class Document(QObject):
             shape_copy = shape.clone()
             # 确保选择状态也被复制
             shape_copy.selected = shape.selected
-            # 确保填充和线条属性正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享填充和线条样式（样式表中的条目不可变，只需复制编号）
+            shape_copy.copy_style(shape)
             current_state.append(shape_copy)
             
         self.undo_stack.append({
@@ -1230,15 +1365,15 @@ class Document(QObject):
         for shape in state['shapes']:
             # 创建一个新的深度副本，确保不会引用原始对象
             shape_copy = shape.clone()
-            # 确保pen和brush被正确复制
-            shape_copy.pen = QPen(shape.pen)
-            shape_copy.brush = QBrush(shape.brush)
+            # 共享pen和brush
+            shape_copy.copy_style(shape)
             # 复制选择状态
             shape_copy.selected = shape.selected
             restored_shapes.append(shape_copy)
             
         # 恢复图形列表
         self.shapes = restored_shapes
+        self.transforms.rebuild(self.shapes)
         
         # 恢复选择状态
         self.selected_shapes = [shape for shape in self.shapes if shape.selected]
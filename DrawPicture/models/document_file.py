@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""绘图文件格式
+
+文件由三部分组成：
+    1. 魔数 MAGIC
+    2. 文件头：长度前缀的JSON摘要（图形数量、图层名称、边界）和长度前缀的PNG缩略图
+    3. pickle序列化的文档数据
+
+文件头不包含任何图形对象，最近文件菜单、打开对话框等只需读取文件开头
+即可显示预览，无需反序列化整个文档。没有魔数的旧文件仍按纯pickle格式读取。
+"""
+
+import json
+import pickle
+import struct
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+from PyQt5.QtGui import QImage, QColor
+
+from DrawPicture.models import rendering
+from DrawPicture.models.export import render_region
+
+MAGIC = b'DRAWPIC\x00'
+FORMAT_VERSION = 1
+
+# 缩略图最大边长（像素）
+THUMBNAIL_SIZE = 256
+
+
+def render_thumbnail(document, size=THUMBNAIL_SIZE):
+    """渲染文档缩略图，返回PNG字节串，文档为空时返回空字节串"""
+    source_rect = rendering.document_bounds(document, margin=10)
+    if source_rect.isEmpty():
+        return b''
+
+    # 只缩小不放大
+    scale = min(size / source_rect.width(), size / source_rect.height(), 1.0)
+    width = max(1, int(source_rect.width() * scale))
+    height = max(1, int(source_rect.height() * scale))
+
+    shapes = rendering.visible_shapes(document)
+    image = render_region(shapes, rendering.shape_bounds_array(shapes), source_rect, scale,
+                          0, 0, width, height, QColor(255, 255, 255))
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    buffer.close()
+    return bytes(data)
+
+
+def make_header(document):
+    """生成文档摘要"""
+    bounds = rendering.document_bounds(document)
+    return {
+        'version': FORMAT_VERSION,
+        'shape_count': len(document.shapes),
+        'layers': [layer['name'] for layer in document.layers],
+        'bounds': None if bounds.isEmpty() else
+                  [bounds.left(), bounds.top(), bounds.width(), bounds.height()],
+    }
+
+
+def _write_block(f, data):
+    f.write(struct.pack('>I', len(data)))
+    f.write(data)
+
+
+def _read_block(f):
+    length, = struct.unpack('>I', f.read(4))
+    data = f.read(length)
+    if len(data) != length:
+        raise ValueError("文件头不完整")
+    return data
+
+
+def write_document(filepath, document, data):
+    """写入带文件头的文档
+
+    参数:
+        filepath: 文件路径
+        document: 用于生成摘要和缩略图的文档对象
+        data: 需要pickle序列化的文档数据
+    """
+    header = json.dumps(make_header(document), ensure_ascii=False).encode('utf-8')
+    thumbnail = render_thumbnail(document)
+    with open(filepath, 'wb') as f:
+        f.write(MAGIC)
+        _write_block(f, header)
+        _write_block(f, thumbnail)
+        pickle.dump(data, f)
+
+
+def read_document(filepath):
+    """读取文档数据，兼容没有文件头的旧格式"""
+    with open(filepath, 'rb') as f:
+        if f.read(len(MAGIC)) == MAGIC:
+            _read_block(f)
+            _read_block(f)
+        else:
+            f.seek(0)
+        return pickle.load(f)
+
+
+def read_header(filepath):
+    """只读取文件头，不反序列化图形
+
+    返回:
+        摘要字典，其中 'thumbnail' 为缩略图QImage（可能为空图像）；
+        旧格式文件或读取失败时返回 None
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            header = json.loads(_read_block(f).decode('utf-8'))
+            header['thumbnail'] = QImage.fromData(_read_block(f), 'PNG')
+        return header
+    except (OSError, ValueError, struct.error):
+        return None
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""文档导出
+
+导出直接基于文档边界和目标DPI进行，与画布窗口大小、缩放和平移无关。
+大尺寸PNG按固定大小的图块逐条渲染并流式写入编码器，内存占用只与条带大小有关。
+SVG和PDF通过矢量绘图设备直接输出各图形自身的绘制路径，不经过位图。
+DZI导出为网页查看器生成多层级图块金字塔，各层级在工作进程中并行渲染。
+"""
+
+import math
+import multiprocessing
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from PyQt5.QtCore import QRectF, QSize, QSizeF, QMarginsF
+from PyQt5.QtGui import (QImage, QPainter, QColor, QPdfWriter, QPageSize, QPageLayout,
+                         QGuiApplication)
+from PyQt5.QtSvg import QSvgGenerator
+import numpy as np
+
+from DrawPicture.models import rendering
+
+# 文档坐标以96DPI下的像素为单位（与画布100%缩放一致）
+BASE_DPI = 96
+
+# 不支持流式写入的格式在内存中整体渲染时允许的最大字节数
+MAX_IN_MEMORY_BYTES = 1024 * 1024 * 1024
+
+# 矢量导出支持的扩展名
+VECTOR_FORMATS = ('.svg', '.pdf')
+
+# Deep Zoom 描述文件扩展名
+DEEP_ZOOM_FORMAT = '.dzi'
+
+
+def region_rect(source_rect, scale, x, y, width, height):
+    """输出图像中的像素区域对应的文档区域"""
+    return QRectF(source_rect.left() + x / scale, source_rect.top() + y / scale,
+                  width / scale, height / scale)
+
+
+def render_region(shapes, bounds, source_rect, scale, x, y, width, height, background,
+                  options=rendering.EXPORT_OPTIONS):
+    """渲染输出图像中的一个矩形区域
+
+    参数:
+        shapes: 按绘制顺序排列的图形列表
+        bounds: 图形场景边界数组，见 rendering.shape_bounds_array
+        source_rect: 输出图像左上角对应的文档区域
+        scale: 每个文档单位对应的像素数
+        x, y, width, height: 区域在输出图像中的像素位置和尺寸
+        background: 背景颜色
+        options: 渲染选项
+    返回:
+        QImage（Format_RGBA8888）
+    """
+    image = QImage(width, height, QImage.Format_RGBA8888)
+    image.fill(background)
+
+    # 区域在文档坐标中的范围，只绘制与之相交的图形
+    tile_rect = region_rect(source_rect, scale, x, y, width, height)
+    indices = np.nonzero(rendering.intersecting(bounds, tile_rect))[0] if len(shapes) else []
+
+    if len(indices):
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing, options.antialiasing)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.translate(-x, -y)
+        painter.scale(scale, scale)
+        painter.translate(-source_rect.left(), -source_rect.top())
+        with rendering.use_options(options):
+            rendering.paint_shapes(painter, shapes, indices)
+        painter.end()
+    return image
+
+
+class PngStreamWriter:
+    """逐行写入的PNG编码器，不需要在内存中保存整幅图像"""
+    def __init__(self, file_path, width, height, dpi=BASE_DPI):
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.file_path = file_path
+        self._file = open(file_path, 'wb')
+        self._compressor = zlib.compressobj(6)
+
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        # 8位RGBA
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+        # 物理像素密度（每米像素数）
+        pixels_per_meter = int(round(dpi / 0.0254))
+        self._write_chunk(b'pHYs', struct.pack('>IIB', pixels_per_meter, pixels_per_meter, 1))
+
+    def _write_chunk(self, chunk_type, data):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    def write_rows(self, rows):
+        """写入若干行像素，rows 为 (h, width, 4) 的 uint8 数组"""
+        height = rows.shape[0]
+        # 每行前添加过滤类型字节（0: None）
+        scanlines = np.zeros((height, self.width * 4 + 1), dtype=np.uint8)
+        scanlines[:, 1:] = rows.reshape(height, self.width * 4)
+        data = self._compressor.compress(scanlines.tobytes())
+        if data:
+            self._write_chunk(b'IDAT', data)
+        self.rows_written += height
+
+    def close(self):
+        """结束写入"""
+        if self._file is None:
+            return
+        self._write_chunk(b'IDAT', self._compressor.flush())
+        self._write_chunk(b'IEND', b'')
+        self._file.close()
+        self._file = None
+
+    def abort(self):
+        """放弃写入：关闭文件并删除未完成的图像"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self.file_path)
+        except OSError:
+            pass
+
+
+class RasterExporter:
+    """位图导出器
+
+    参数:
+        document: 文档对象
+        dpi: 输出分辨率，96DPI时一个文档单位对应一个像素
+        margin: 文档边界四周的留白（文档单位）
+        tile_size: 渲染图块的边长（像素）
+        memory_budget: 渲染缓冲区的内存预算（字节）
+        background: 背景颜色
+        options: 渲染选项，见 rendering.export_options
+    """
+    def __init__(self, document, dpi=BASE_DPI, margin=10, tile_size=1024,
+                 memory_budget=64 * 1024 * 1024, background=None, options=rendering.EXPORT_OPTIONS):
+        self.document = document
+        self.dpi = dpi
+        self.margin = margin
+        self.tile_size = tile_size
+        self.memory_budget = memory_budget
+        self.background = background if background is not None else QColor(255, 255, 255)
+        self.options = options
+
+        self.scale = dpi / BASE_DPI
+        self.source_rect = rendering.document_bounds(document, margin)
+
+    def output_size(self):
+        """获取输出图像的像素尺寸"""
+        if self.source_rect.isEmpty():
+            return 0, 0
+        width = max(1, int(np.ceil(self.source_rect.width() * self.scale)))
+        height = max(1, int(np.ceil(self.source_rect.height() * self.scale)))
+        return width, height
+
+    def _strip_height(self, width):
+        """根据内存预算计算每条带的高度"""
+        # 条带缓冲区 + 过滤字节副本 + 压缩输入，约为条带像素数据的3倍
+        rows = self.memory_budget // (width * 4 * 3)
+        return int(max(16, min(self.tile_size, rows)))
+
+    def _render_tile(self, shapes, bounds, x, y, width, height):
+        """渲染单个图块，返回 (height, width, 4) 的RGBA数组"""
+        image = render_region(shapes, bounds, self.source_rect, self.scale,
+                              x, y, width, height, self.background, self.options)
+        data = image.constBits().asstring(image.sizeInBytes())
+        rows = np.frombuffer(data, dtype=np.uint8).reshape(height, image.bytesPerLine())
+        return rows[:, :width * 4].reshape(height, width, 4)
+
+    def iter_strips(self):
+        """按从上到下的顺序逐条生成 (y, rows) 像素数据"""
+        width, height = self.output_size()
+        shapes = rendering.visible_shapes(self.document)
+        bounds = rendering.shape_bounds_array(shapes)
+        strip_height = self._strip_height(width)
+
+        for y in range(0, height, strip_height):
+            h = min(strip_height, height - y)
+            tiles = [self._render_tile(shapes, bounds, x, y, min(self.tile_size, width - x), h)
+                     for x in range(0, width, self.tile_size)]
+            yield y, np.concatenate(tiles, axis=1)
+
+    def export_png(self, file_path):
+        """流式导出PNG"""
+        width, height = self.output_size()
+        writer = PngStreamWriter(file_path, width, height, self.dpi)
+        try:
+            for _, rows in self.iter_strips():
+                writer.write_rows(rows)
+            writer.close()
+        except BaseException:
+            # 渲染或写入失败时不留下截断但格式完整的PNG
+            writer.abort()
+            raise
+        return width, height
+
+    def render_image(self):
+        """将整幅图像渲染到内存中的QImage（用于不支持流式写入的格式）"""
+        width, height = self.output_size()
+        if width * height * 4 > MAX_IN_MEMORY_BYTES:
+            raise MemoryError(f"输出尺寸 {width}x{height} 过大，请使用PNG格式流式导出")
+        image = QImage(width, height, QImage.Format_RGBA8888)
+        image.setDotsPerMeterX(int(round(self.dpi / 0.0254)))
+        image.setDotsPerMeterY(int(round(self.dpi / 0.0254)))
+        painter = QPainter(image)
+        for y, rows in self.iter_strips():
+            data = rows.tobytes()
+            strip = QImage(data, width, rows.shape[0], width * 4, QImage.Format_RGBA8888)
+            painter.drawImage(0, y, strip)
+        painter.end()
+        return image
+
+    def export(self, file_path, quality=-1):
+        """导出到文件，根据扩展名选择编码方式
+
+        返回:
+            (width, height) 输出图像尺寸
+        """
+        width, height = self.output_size()
+        if width == 0 or height == 0:
+            raise ValueError("文档中没有可导出的图形")
+
+        if file_path.lower().endswith('.png'):
+            return self.export_png(file_path)
+
+        image = self.render_image()
+        if not image.save(file_path, quality=quality):
+            raise IOError(f"无法保存图片: {file_path}")
+        return width, height
+
+
+class VectorExporter:
+    """矢量导出器，将每个图形的绘制路径直接写入SVG或PDF
+
+    参数:
+        document: 文档对象
+        margin: 文档边界四周的留白（文档单位）
+        title: 写入文件的标题
+        options: 渲染选项，见 rendering.export_options
+    """
+    def __init__(self, document, margin=10, title="DrawPicture", options=rendering.EXPORT_OPTIONS):
+        self.document = document
+        self.margin = margin
+        self.title = title
+        self.options = options
+        self.source_rect = rendering.document_bounds(document, margin)
+
+    def _paint(self, painter):
+        """按文档中的绘制顺序绘制所有可见图形，层叠关系与画布和位图导出一致"""
+        painter.setRenderHint(QPainter.Antialiasing, self.options.antialiasing)
+        painter.translate(-self.source_rect.left(), -self.source_rect.top())
+        with rendering.use_options(self.options):
+            rendering.paint_shapes(painter, rendering.visible_shapes(self.document))
+
+    def export_svg(self, file_path):
+        """导出SVG"""
+        width = int(np.ceil(self.source_rect.width()))
+        height = int(np.ceil(self.source_rect.height()))
+
+        generator = QSvgGenerator()
+        generator.setFileName(file_path)
+        generator.setTitle(self.title)
+        generator.setResolution(BASE_DPI)
+        generator.setSize(QSize(width, height))
+        generator.setViewBox(QRectF(0, 0, width, height))
+
+        painter = QPainter()
+        if not painter.begin(generator):
+            raise IOError(f"无法写入文件: {file_path}")
+        self._paint(painter)
+        painter.end()
+        return width, height
+
+    def export_pdf(self, file_path):
+        """导出单页PDF，页面大小与文档边界一致"""
+        width = self.source_rect.width()
+        height = self.source_rect.height()
+
+        writer = QPdfWriter(file_path)
+        writer.setTitle(self.title)
+        writer.setCreator("DrawPicture")
+        # 设备分辨率与文档单位一致，页面尺寸以点（1/72英寸）为单位
+        writer.setResolution(BASE_DPI)
+        page_size = QPageSize(QSizeF(width * 72 / BASE_DPI, height * 72 / BASE_DPI), QPageSize.Point)
+        writer.setPageLayout(QPageLayout(page_size, QPageLayout.Portrait, QMarginsF(0, 0, 0, 0)))
+
+        painter = QPainter()
+        if not painter.begin(writer):
+            raise IOError(f"无法写入文件: {file_path}")
+        self._paint(painter)
+        painter.end()
+        return int(np.ceil(width)), int(np.ceil(height))
+
+    def export(self, file_path):
+        """根据扩展名导出SVG或PDF
+
+        返回:
+            (width, height) 以文档单位表示的页面尺寸
+        """
+        if self.source_rect.isEmpty():
+            raise ValueError("文档中没有可导出的图形")
+        if file_path.lower().endswith('.pdf'):
+            return self.export_pdf(file_path)
+        return self.export_svg(file_path)
+
+
+# 图块工作进程中的渲染数据，由 _init_tile_worker 设置
+_worker_state = None
+
+
+def _init_tile_worker(shapes, bounds, source_rect, background_rgba, options=rendering.EXPORT_OPTIONS):
+    """图块工作进程初始化
+
+    每个进程只接收一次图形和预先计算好的边界，之后的任务只传递图块位置。
+    绘制文字等需要 QGuiApplication，子进程中以离屏方式创建。
+    """
+    global _worker_state
+    app = QGuiApplication.instance()
+    if app is None:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        app = QGuiApplication(['DrawPicture-tiles'])
+    background = QColor()
+    background.setRgba(background_rgba)
+    _worker_state = (app, shapes, bounds, source_rect, background, options)
+
+
+def _render_tile_row(level_dir, row, scale, level_width, level_height,
+                     tile_size, overlap, tile_format):
+    """渲染并写入某一层级中的一行图块，返回实际写入的图块数"""
+    _, shapes, bounds, source_rect, background, options = _worker_state
+    y0 = max(0, row * tile_size - overlap)
+    y1 = min(level_height, (row + 1) * tile_size + overlap)
+    quality = 90 if tile_format == 'jpg' else -1
+
+    written = 0
+    for col in range(math.ceil(level_width / tile_size)):
+        x0 = max(0, col * tile_size - overlap)
+        x1 = min(level_width, (col + 1) * tile_size + overlap)
+        # 跳过不与任何图形相交的空白图块
+        tile_rect = region_rect(source_rect, scale, x0, y0, x1 - x0, y1 - y0)
+        if not len(shapes) or not rendering.intersecting(bounds, tile_rect).any():
+            continue
+        image = render_region(shapes, bounds, source_rect, scale,
+                              x0, y0, x1 - x0, y1 - y0, background, options)
+        tile_path = os.path.join(level_dir, f"{col}_{row}.{tile_format}")
+        if not image.save(tile_path, quality=quality):
+            raise IOError(f"无法保存图块: {tile_path}")
+        written += 1
+    return written
+
+
+class DeepZoomExporter:
+    """Deep Zoom（DZI）图块金字塔导出器
+
+    输出 name.dzi 描述文件和 name_files/<层级>/<列>_<行>.<格式> 图块。
+    每个层级直接从矢量图形按该层级的缩放渲染，而不是由上一层位图缩小得到。
+    不与任何图形相交的图块不写入，查看器会将缺失的图块显示为空白，
+    因此PNG图块默认使用透明背景。
+
+    参数:
+        document: 文档对象
+        dpi: 最高层级的分辨率
+        margin: 文档边界四周的留白（文档单位）
+        tile_size: 图块边长（像素）
+        overlap: 相邻图块的重叠像素数
+        tile_format: 图块格式，'png' 或 'jpg'
+        workers: 工作进程数，None 表示使用全部CPU，1 表示在当前进程中渲染
+        background: 背景颜色
+        options: 渲染选项，见 rendering.export_options
+    """
+    def __init__(self, document, dpi=BASE_DPI, margin=10, tile_size=256, overlap=1,
+                 tile_format='png', workers=None, background=None, options=rendering.EXPORT_OPTIONS):
+        self.document = document
+        self.dpi = dpi
+        self.margin = margin
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.tile_format = tile_format
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        if background is None:
+            # JPEG没有透明通道，使用白色背景
+            background = QColor(255, 255, 255) if tile_format == 'jpg' else QColor(0, 0, 0, 0)
+        self.background = background
+        self.options = options
+        self.tiles_written = 0
+
+        self.scale = dpi / BASE_DPI
+        self.source_rect = rendering.document_bounds(document, margin)
+
+    def output_size(self):
+        """获取最高层级的像素尺寸"""
+        if self.source_rect.isEmpty():
+            return 0, 0
+        width = max(1, int(math.ceil(self.source_rect.width() * self.scale)))
+        height = max(1, int(math.ceil(self.source_rect.height() * self.scale)))
+        return width, height
+
+    def max_level(self):
+        """最高层级编号（第0层为1x1像素）"""
+        width, height = self.output_size()
+        return int(math.ceil(math.log2(max(width, height, 1))))
+
+    def level_size(self, level):
+        """获取指定层级的像素尺寸"""
+        width, height = self.output_size()
+        factor = 2 ** (self.max_level() - level)
+        return int(math.ceil(width / factor)), int(math.ceil(height / factor))
+
+    def _prepare_level_dir(self, files_dir, level):
+        """创建层级目录并清除上次导出遗留的图块"""
+        level_dir = os.path.join(files_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+        suffix = '.' + self.tile_format
+        for name in os.listdir(level_dir):
+            if name.endswith(suffix):
+                os.remove(os.path.join(level_dir, name))
+        return level_dir
+
+    def _tasks(self, files_dir):
+        """生成所有图块行的渲染任务，从最大的层级开始以便均衡负载"""
+        max_level = self.max_level()
+        for level in range(max_level, -1, -1):
+            level_dir = self._prepare_level_dir(files_dir, level)
+            level_width, level_height = self.level_size(level)
+            scale = self.scale / 2 ** (max_level - level)
+            for row in range(math.ceil(level_height / self.tile_size)):
+                yield (level_dir, row, scale, level_width, level_height,
+                       self.tile_size, self.overlap, self.tile_format)
+
+    def write_descriptor(self, file_path):
+        """写入DZI描述文件"""
+        width, height = self.output_size()
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write(f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+                    f'Format="{self.tile_format}" Overlap="{self.overlap}" '
+                    f'TileSize="{self.tile_size}">\n')
+            f.write(f'  <Size Width="{width}" Height="{height}"/>\n')
+            f.write('</Image>\n')
+
+    def export(self, file_path):
+        """导出图块金字塔
+
+        返回:
+            (width, height) 最高层级的像素尺寸
+        """
+        width, height = self.output_size()
+        if width == 0 or height == 0:
+            raise ValueError("文档中没有可导出的图形")
+
+        files_dir = os.path.splitext(file_path)[0] + '_files'
+        tasks = list(self._tasks(files_dir))
+
+        # 图形边界只计算一次，随图形一起交给各工作进程
+        shapes = rendering.visible_shapes(self.document)
+        initargs = (shapes, rendering.shape_bounds_array(shapes),
+                    self.source_rect, self.background.rgba(), self.options)
+
+        workers = max(1, min(self.workers, len(tasks)))
+        if workers == 1:
+            _init_tile_worker(*initargs)
+            self.tiles_written = sum(_render_tile_row(*task) for task in tasks)
+        else:
+            # 使用spawn启动，避免在已创建Qt应用的进程中fork
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                     initializer=_init_tile_worker,
+                                     initargs=initargs) as pool:
+                futures = [pool.submit(_render_tile_row, *task) for task in tasks]
+                self.tiles_written = sum(future.result() for future in futures)
+
+        self.write_descriptor(file_path)
+        return width, height
+
+
+def is_deep_zoom_format(file_path):
+    """是否为Deep Zoom图块金字塔"""
+    return file_path.lower().endswith(DEEP_ZOOM_FORMAT)
+
+
+def is_vector_format(file_path):
+    """是否为矢量导出格式"""
+    return file_path.lower().endswith(VECTOR_FORMATS)
+
+
+def export_document(document, file_path, dpi=BASE_DPI, quality=rendering.QUALITY_FINAL):
+    """按文件类型导出文档，返回输出尺寸
+
+    参数:
+        quality: 渲染质量，rendering.QUALITY_FINAL 或 rendering.QUALITY_DRAFT（快速预览）
+    """
+    options = rendering.export_options(quality)
+    if is_vector_format(file_path):
+        return VectorExporter(document, options=options).export(file_path)
+    if is_deep_zoom_format(file_path):
+        return DeepZoomExporter(document, dpi=dpi, options=options).export(file_path)
+    return RasterExporter(document, dpi=dpi, options=options).export(file_path, export_quality(file_path))
+
+
+def export_quality(file_path):
+    """根据文件类型获取保存质量参数"""
+    if file_path.lower().endswith(('.jpg', '.jpeg', '.webp')):
+        return 95
+    return -1
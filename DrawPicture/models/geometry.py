@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""基于numpy的批量几何计算"""
+
+import numpy as np
+
+
+def points_in_polygon(points, polygon):
+    """批量判断点是否位于多边形内（交叉数法，奇偶规则）
+
+    点按y坐标排序后，每条边只需检查y坐标落在该边范围内的那一段连续的点，
+    总计算量约为 点数 × 平均跨越的边数，而不是 点数 × 边数。
+
+    参数:
+        points: (N, 2) 点坐标数组
+        polygon: (M, 2) 多边形顶点数组，首尾自动闭合
+    返回:
+        长度为 N 的布尔数组
+    """
+    points = np.asarray(points, dtype=np.float64)
+    polygon = np.asarray(polygon, dtype=np.float64)
+    inside = np.zeros(len(points), dtype=bool)
+    if len(polygon) < 3 or not len(points):
+        return inside
+
+    order = np.argsort(points[:, 1], kind='stable')
+    xs, ys = points[order, 0], points[order, 1]
+
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    # 边只与 y 位于 [min(y1, y2), max(y1, y2)) 的水平射线相交，水平边不参与计算
+    starts = np.searchsorted(ys, np.minimum(y1, y2), 'left')
+    ends = np.searchsorted(ys, np.maximum(y1, y2), 'left')
+
+    crossings = np.zeros(len(points), dtype=bool)
+    for i in np.nonzero(ends > starts)[0]:
+        start, end = starts[i], ends[i]
+        # 水平射线与边的交点x坐标，点在交点左侧时射线穿过该边
+        cross_x = x1[i] + (ys[start:end] - y1[i]) * (x2[i] - x1[i]) / (y2[i] - y1[i])
+        crossings[start:end] ^= xs[start:end] < cross_x
+
+    inside[order] = crossings
+    return inside
+
+
+def simplification_errors(points):
+    """计算折线每个顶点在道格拉斯-普克简化中被保留的容差上限
+
+    对任意容差 tolerance，points[errors > tolerance] 即为按该容差简化后的折线，
+    一次计算即可得到所有简化层次。子线段的误差不超过父线段的误差，因此各层次是嵌套的。
+    递归按层进行：同一层的所有线段一起计算，每层只有几次numpy运算。
+
+    参数:
+        points: (N, 2) 折线顶点数组
+    返回:
+        长度为 N 的数组，首尾顶点为无穷大
+    """
+    points = np.asarray(points, dtype=np.float64)
+    errors = np.full(len(points), np.inf)
+    if len(points) < 3:
+        return errors
+
+    starts = np.array([0])
+    ends = np.array([len(points) - 1])
+    limits = np.array([np.inf])
+    while len(starts):
+        # 只有中间还有顶点的线段需要继续划分
+        keep = ends - starts >= 2
+        starts, ends, limits = starts[keep], ends[keep], limits[keep]
+        if not len(starts):
+            break
+        counts = ends - starts - 1
+        firsts = np.cumsum(counts) - counts
+        segment = np.repeat(np.arange(len(starts)), counts)
+        indices = np.repeat(starts + 1 - firsts, counts) + np.arange(counts.sum())
+
+        # 顶点到所在线段的距离
+        a = points[starts[segment]]
+        ab = points[ends[segment]] - a
+        ap = points[indices] - a
+        length2 = (ab * ab).sum(axis=1)
+        t = np.clip((ap * ab).sum(axis=1) / np.where(length2 > 0, length2, 1), 0, 1)
+        distance = np.hypot(ap[:, 0] - t * ab[:, 0], ap[:, 1] - t * ab[:, 1])
+
+        # 每条线段取距离最大的顶点作为分割点
+        best = np.maximum.reduceat(distance, firsts)
+        candidates = np.nonzero(distance == best[segment])[0]
+        _, first_candidate = np.unique(segment[candidates], return_index=True)
+        splits = indices[candidates[first_candidate]]
+        split_errors = np.minimum(best, limits)
+        errors[splits] = split_errors
+
+        starts, ends = np.concatenate((starts, splits)), np.concatenate((splits, ends))
+        limits = np.concatenate((split_errors, split_errors))
+    return errors
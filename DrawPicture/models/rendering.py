@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""文档空间渲染
+
+与画布控件无关的渲染工具：按文档坐标（而不是窗口坐标）计算边界并绘制图形，
+供导出、缩略图等离屏场景使用。
+"""
+
+from bisect import bisect_right
+from contextlib import contextmanager
+import math
+
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QPainter, QPainterPath, QPolygonF
+import numpy as np
+
+from DrawPicture.diagnostics.perf import perf
+from DrawPicture.models.geometry import simplification_errors
+
+
+# 渲染质量：高质量用于静止画面和导出，草稿用于交互过程中快速出图
+QUALITY_FINAL = "final"
+QUALITY_DRAFT = "draft"
+
+
+class RenderOptions:
+    """渲染选项"""
+    def __init__(self, show_selection=True, antialiasing=True, curve_tolerance=0.25,
+                 lod_tolerance=0.5, gradients=True, fractals=True):
+        self.show_selection = show_selection  # 是否绘制选择指示器
+        self.antialiasing = antialiasing  # 是否启用抗锯齿
+        self.curve_tolerance = curve_tolerance  # 解析曲线展平的弦误差上限（设备像素）
+        self.lod_tolerance = lod_tolerance  # 折线细节层次简化允许的误差（设备像素）
+        self.gradients = gradients  # 是否绘制渐变，关闭时以纯色代替
+        self.fractals = fractals  # 是否计算分形，关闭时只绘制占位矩形
+
+
+def quality_options(quality, show_selection=True):
+    """获取指定渲染质量的选项
+
+    草稿质量关闭抗锯齿、渐变和分形，并使用更粗的曲线展平和折线简化。
+    """
+    if quality == QUALITY_DRAFT:
+        return RenderOptions(show_selection, antialiasing=False, curve_tolerance=1.0,
+                             lod_tolerance=2.0, gradients=False, fractals=False)
+    return RenderOptions(show_selection)
+
+
+def export_options(quality=QUALITY_FINAL):
+    """获取导出使用的选项：不绘制选择框等界面元素"""
+    return quality_options(quality, show_selection=False)
+
+
+# 当前生效的渲染选项（画布默认行为）
+_current_options = RenderOptions()
+
+
+def current_options():
+    """获取当前生效的渲染选项"""
+    return _current_options
+
+
+@contextmanager
+def use_options(options):
+    """在上下文中临时使用指定的渲染选项"""
+    global _current_options
+    previous = _current_options
+    _current_options = options
+    try:
+        yield options
+    finally:
+        _current_options = previous
+
+
+# 导出时默认使用的选项
+EXPORT_OPTIONS = export_options()
+
+
+def visible_shapes(document):
+    """按绘制顺序返回可见图层中的图形"""
+    return [shape for shape in document.shapes if document.is_layer_visible(shape.layer)]
+
+
+def shape_bounds_array(shapes):
+    """将图形的场景边界转换为 (N, 4) 数组，每行为 [left, top, right, bottom]"""
+    # 图形都属于同一文档时直接使用变换存储中批量刷新的边界
+    store = shapes[0]._store if shapes else None
+    if store is not None and all(shape._store is store for shape in shapes):
+        return store.bounds_of(store.rows_of(shapes))
+
+    bounds = np.empty((len(shapes), 4), dtype=np.float64)
+    for i, shape in enumerate(shapes):
+        rect = shape.scene_bounds()
+        bounds[i] = (rect.left(), rect.top(), rect.right(), rect.bottom())
+    return bounds
+
+
+def document_bounds(document, margin=0):
+    """获取文档中所有可见图形的场景边界
+
+    参数:
+        document: 文档对象
+        margin: 四周额外留白（文档单位）
+    返回:
+        QRectF，文档为空时返回空矩形
+    """
+    shapes = visible_shapes(document)
+    if not shapes:
+        return QRectF()
+    bounds = shape_bounds_array(shapes)
+    left, top = bounds[:, 0].min(), bounds[:, 1].min()
+    right, bottom = bounds[:, 2].max(), bounds[:, 3].max()
+    return QRectF(left - margin, top - margin,
+                  right - left + 2 * margin, bottom - top + 2 * margin)
+
+
+def paint_shapes(painter, shapes, indices=None):
+    """按顺序绘制图形，indices 为需要绘制的图形下标（已按绘制顺序排列）"""
+    if indices is None:
+        indices = range(len(shapes))
+    for i in indices:
+        painter.save()
+        shapes[i].paint(painter)
+        painter.restore()
+
+
+def render_document(painter, document, scene_rect=None, options=EXPORT_OPTIONS):
+    """在文档坐标系中绘制文档
+
+    调用前 painter 应已设置好从文档坐标到设备坐标的变换。
+    scene_rect 不为空时只绘制与该区域相交的图形。
+    """
+    shapes = visible_shapes(document)
+    indices = None
+    if scene_rect is not None and shapes:
+        bounds = shape_bounds_array(shapes)
+        indices = np.nonzero(intersecting(bounds, scene_rect))[0]
+    painter.setRenderHint(QPainter.Antialiasing, options.antialiasing)
+    with use_options(options):
+        paint_shapes(painter, shapes, indices)
+
+
+def intersecting(bounds, rect):
+    """返回与矩形相交的边界行的布尔掩码"""
+    return ((bounds[:, 0] <= rect.right()) & (bounds[:, 2] >= rect.left()) &
+            (bounds[:, 1] <= rect.bottom()) & (bounds[:, 3] >= rect.top()))
+
+
+def points_to_polygon(points):
+    """将 (N, 2) 坐标数组直接复制到QPolygonF中，避免逐个创建QPointF"""
+    points = np.ascontiguousarray(points, dtype=np.float64)
+    polygon = QPolygonF(len(points))
+    if len(points):
+        buffer = polygon.data()
+        buffer.setsize(points.nbytes)
+        np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)[:] = points
+    return polygon
+
+
+def device_scale(transform):
+    """变换的最大拉伸比例（线性部分的最大奇异值）
+
+    本地坐标中长度为 d 的误差映射到设备上不超过 d × 该值。
+    """
+    norm2 = (transform.m11() ** 2 + transform.m12() ** 2 +
+             transform.m21() ** 2 + transform.m22() ** 2)
+    det = transform.m11() * transform.m22() - transform.m12() * transform.m21()
+    return math.sqrt((norm2 + math.sqrt(max(norm2 * norm2 - 4 * det * det, 0))) / 2)
+
+
+# 折线细节层次的简化容差（本地坐标单位），从细到粗
+LOD_TOLERANCES = (1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+
+# 顶点数少于该值的折线总是完整绘制
+LOD_MIN_POINTS = 256
+
+
+class PolylineLOD:
+    """折线的细节层次金字塔
+
+    保存完整折线和按 LOD_TOLERANCES 逐级简化后的路径。每个顶点的简化误差只计算一次，
+    各层次的路径在第一次用到时生成。绘制时根据画家的变换选择误差不超过渲染选项中
+    lod_tolerance 个设备像素的最粗层次，缩小查看时只需绘制很少的顶点。
+    """
+
+    def __init__(self, points, closed=False):
+        """
+        参数:
+            points: (N, 2) 本地坐标顶点数组
+            closed: 是否闭合
+        """
+        self.points = np.asarray(points, dtype=np.float64)
+        self.closed = closed
+        self._errors = None  # 每个顶点的简化误差，按需计算
+        self._paths = {}  # 层次 -> QPainterPath，-1 为完整折线
+
+    def level_for(self, transform, tolerance=0.5):
+        """根据本地坐标到设备坐标的变换和设备像素误差选择层次，-1 表示完整折线"""
+        if len(self.points) < LOD_MIN_POINTS:
+            return -1
+        scale = device_scale(transform)
+        if scale == 0:
+            return len(LOD_TOLERANCES) - 1
+        return bisect_right(LOD_TOLERANCES, tolerance / scale) - 1
+
+    def path(self, level=-1):
+        """获取指定层次的路径（缓存，只读）"""
+        path = self._paths.get(level)
+        if path is None:
+            points = self.points
+            if level >= 0:
+                if self._errors is None:
+                    self._errors = simplification_errors(points)
+                points = points[self._errors > LOD_TOLERANCES[level]]
+            path = QPainterPath()
+            path.addPolygon(points_to_polygon(points))
+            if self.closed:
+                path.closeSubpath()
+            self._paths[level] = path
+        return path
+
+    def draw(self, painter):
+        """按画家当前的变换和渲染选项选择层次绘制"""
+        level = self.level_for(painter.worldTransform(), current_options().lod_tolerance)
+        painter.drawPath(self.path(level))
+
+
+# 展平一条解析曲线最多生成的顶点数，避免极度放大时占用过多内存
+MAX_CURVE_POINTS = 65536
+
+
+def flatten_curve(evaluate, start, end, intervals, tolerance):
+    """按弦误差自适应地展平参数曲线
+
+    先把参数区间均匀分成 intervals 段，用相邻采样点的二阶差分估计每段的弦误差
+    （曲率在段内近似不变时，弦误差约为 |Δ²p| / 8，细分成 k 段后缩小为 1/k²），
+    再按误差把每段细分到不超过 tolerance。曲率大的地方采样密，平直的地方采样稀。
+
+    参数:
+        evaluate: 向量化的求值函数，参数数组 -> (N, 2) 坐标数组
+        start, end: 参数范围
+        intervals: 初始分段数，需足以分辨曲线的起伏
+        tolerance: 弦误差上限（本地坐标单位）
+    返回:
+        (N, 2) 顶点数组
+    """
+    t = np.linspace(start, end, intervals + 1)
+    points = evaluate(t)
+    second = points[:-2] - 2 * points[1:-1] + points[2:]
+    curvature = np.hypot(second[:, 0], second[:, 1])
+    # 每段取两端采样点估计值中较大的一个
+    error = np.maximum(np.concatenate((curvature[:1], curvature)),
+                       np.concatenate((curvature, curvature[-1:]))) / 8
+    counts = np.ceil(np.sqrt(error / tolerance))
+    total = counts.sum()
+    if total > MAX_CURVE_POINTS:
+        counts *= MAX_CURVE_POINTS / total
+    counts = np.maximum(counts, 1).astype(np.int64)
+
+    # 展开为每段内等距的参数值
+    firsts = np.cumsum(counts) - counts
+    offsets = np.arange(counts.sum()) - np.repeat(firsts, counts)
+    steps = np.repeat(np.diff(t) / counts, counts)
+    t = np.append(np.repeat(t[:-1], counts) + offsets * steps, end)
+    return evaluate(t)
+
+
+class FlattenedCurve:
+    """解析曲线按缩放自适应展平后的路径缓存
+
+    绘制时按画家的变换把设备像素的弦误差上限换算为本地容差，
+    容差向下取整到2的幂作为缓存档位，缩放时只有跨过档位才重新展平。
+    """
+
+    MAX_BUCKETS = 8  # 最多缓存的容差档位数
+
+    def __init__(self, evaluate, start, end, intervals, closed=False):
+        """
+        参数:
+            evaluate, start, end, intervals: 见 flatten_curve
+            closed: 是否闭合
+        """
+        self.evaluate = evaluate
+        self.start = start
+        self.end = end
+        self.intervals = intervals
+        self.closed = closed
+        self._paths = {}  # 容差档位 -> QPainterPath
+
+    @staticmethod
+    def bucket_for(transform, tolerance):
+        """根据本地坐标到设备坐标的变换和设备像素容差计算容差档位"""
+        scale = device_scale(transform)
+        if scale == 0:
+            return 64
+        return math.floor(math.log2(tolerance / scale))
+
+    def path(self, bucket):
+        """获取容差为 2**bucket 的路径（缓存，只读）"""
+        path = self._paths.get(bucket)
+        if perf.enabled:
+            perf.cache('curves', path is not None)
+        if path is None:
+            if len(self._paths) >= self.MAX_BUCKETS:
+                self._paths.clear()
+            points = flatten_curve(self.evaluate, self.start, self.end, self.intervals,
+                                   2.0 ** bucket)
+            path = QPainterPath()
+            path.addPolygon(points_to_polygon(points))
+            if self.closed:
+                path.closeSubpath()
+            self._paths[bucket] = path
+        return path
+
+    def draw(self, painter):
+        """按画家当前的变换和渲染选项中的弦误差上限绘制"""
+        bucket = self.bucket_for(painter.worldTransform(), current_options().curve_tolerance)
+        painter.drawPath(self.path(bucket))
@@ -6,8 +6,34 @@ from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QPainterPath, QTransform
 import numpy as np
 import math
 
+from DrawPicture.diagnostics.perf import perf
+from DrawPicture.models import rendering
+from DrawPicture.models.snapping import SNAP_ENDPOINT, SNAP_MIDPOINT, SNAP_CENTER
+from DrawPicture.models.styles import style_table
+from DrawPicture.models.transform_store import next_version
+
+# 变换属性（由属性的setter负责使缓存失效）
+_TRANSFORM_ATTRS = frozenset(('position', 'rotation', 'scale_x', 'scale_y'))
+
+# 每个图形用于区域选择的最大采样点数
+MAX_SAMPLE_POINTS = 64
+
+# 不影响几何形状的属性，修改时不需要使缓存失效
+_STYLE_ATTRS = frozenset(('color', 'fill_color', 'line_width', 'line_style', 'brush_id', 'layer',
+                          'selected', 'is_selected', 'is_eraser', 'z_value'))
+
+
 class Shape:
-    """基础图形类"""
+    """基础图形类
+
+    加入文档后，图形的位置、旋转和缩放保存在文档的列式变换存储
+    （TransformStore）中，未加入文档时保存在图形自身。
+    """
+    _store = None  # 绑定的列式变换存储
+    _row = -1  # 在存储中的行号
+    _transform_version = 0  # 未绑定时的变换版本号
+    _geometry_version = 0  # 几何形状版本号
+
     def __init__(self, color=None, fill_color=None, line_width=1, line_style=Qt.SolidLine, layer="默认图层"):
         # 图形属性
         self.color = color or QColor(0, 0, 0)
@@ -22,10 +48,9 @@ class Shape:
         # 标记是否为橡皮擦
         self.is_eraser = False
         
-        self.pen = QPen(self.color, self.line_width, self.line_style)
-        self.brush = QBrush(Qt.transparent)  # 默认透明填充
-        if self.fill_color is not None:
-            self.brush = QBrush(self.fill_color)
+        # 画笔和画刷保存为共享样式表中的编号，默认透明填充
+        self.pen_id = style_table().simple_pen_id(self.color, self.line_width, self.line_style)
+        self.brush_id = style_table().simple_brush_id(self.fill_color)
             
         self.position = QPointF(0, 0)
         self.rotation = 0  # 旋转角度
@@ -35,51 +60,292 @@ class Shape:
         
     def __getstate__(self):
         """序列化时调用"""
-        state = self.__dict__.copy()
-        # 保存QPen的属性
-        state['pen_color'] = self.pen.color().rgba()
-        state['pen_width'] = self.pen.width()
-        state['pen_style'] = int(self.pen.style())
-        # 保存QBrush的属性
-        state['brush_color'] = self.brush.color().rgba()
-        state['brush_style'] = int(self.brush.style())
-        # 保存QPointF的属性
-        state['position_x'] = self.position.x()
-        state['position_y'] = self.position.y()
-        # 删除无法序列化的对象
-        del state['pen']
-        del state['brush']
-        del state['position']
+        # 不保存私有属性（变换存储绑定、缓存等）
+        state = {key: value for key, value in self.__dict__.items() if not key.startswith('_')}
+        # 样式编号只在当前会话有效，保存样式表中的序列化数据
+        state['pen_key'], state['pen_name'] = style_table().pen_state(self.pen_id)
+        state['brush_key'], state['brush_name'] = style_table().brush_state(self.brush_id)
+        del state['pen_id']
+        del state['brush_id']
+        # 保存变换属性
+        position = self.position
+        state['position_x'] = position.x()
+        state['position_y'] = position.y()
+        state['rotation'] = self.rotation
+        state['scale_x'] = self.scale_x
+        state['scale_y'] = self.scale_y
         return state
         
     def __setstate__(self, state):
         """反序列化时调用"""
-        # 恢复QPen
-        pen_color = QColor()
-        pen_color.setRgba(state.pop('pen_color'))
-        pen_width = state.pop('pen_width')
-        pen_style = Qt.PenStyle(state.pop('pen_style'))
-        self.pen = QPen(pen_color, pen_width, pen_style)
-        
-        # 恢复QBrush
-        brush_color = QColor()
-        brush_color.setRgba(state.pop('brush_color'))
-        brush_style = Qt.BrushStyle(state.pop('brush_style'))
-        self.brush = QBrush(brush_color, brush_style)
+        if 'pen_key' in state:
+            # 恢复共享样式
+            self.pen_id = style_table().pen_from_state(state.pop('pen_key'), state.pop('pen_name'))
+            self.brush_id = style_table().brush_from_state(state.pop('brush_key'), state.pop('brush_name'))
+        else:
+            # 旧格式：恢复QPen
+            pen_color = QColor()
+            pen_color.setRgba(state.pop('pen_color'))
+            pen_width = state.pop('pen_width')
+            pen_style = Qt.PenStyle(state.pop('pen_style'))
+            self.pen = QPen(pen_color, pen_width, pen_style)
+            
+            # 旧格式：恢复QBrush
+            brush_color = QColor()
+            brush_color.setRgba(state.pop('brush_color'))
+            brush_style = Qt.BrushStyle(state.pop('brush_style'))
+            self.brush = QBrush(brush_color, brush_style)
         
-        # 恢复QPointF
+        # 恢复变换属性（早期文件没有缩放属性）
         x = state.pop('position_x')
         y = state.pop('position_y')
         self.position = QPointF(x, y)
+        self.rotation = state.pop('rotation', 0)
+        self.scale_x = state.pop('scale_x', 1.0)
+        self.scale_y = state.pop('scale_y', 1.0)
         
         # 恢复其他属性
         self.__dict__.update(state)
         
+    def __setattr__(self, name, value):
+        """设置属性，几何属性变化时使缓存失效"""
+        object.__setattr__(self, name, value)
+        if name not in _TRANSFORM_ATTRS and name not in _STYLE_ATTRS and not name.startswith('_'):
+            self.invalidate_geometry()
+
+    # 变换属性
+    @property
+    def position(self):
+        """位置（返回副本，修改请重新赋值）"""
+        if self._store is None:
+            return QPointF(self._position)
+        return self._store.position(self._row)
+
+    @position.setter
+    def position(self, pos):
+        if self._store is None:
+            self.__dict__['_position'] = QPointF(pos)
+            self.__dict__['_transform_version'] = next_version()
+        else:
+            self._store.set_position(self._row, pos.x(), pos.y())
+
+    @property
+    def rotation(self):
+        """旋转角度"""
+        if self._store is None:
+            return self._rotation
+        return float(self._store.rotations[self._row])
+
+    @rotation.setter
+    def rotation(self, rotation):
+        if self._store is None:
+            self.__dict__['_rotation'] = rotation
+            self.__dict__['_transform_version'] = next_version()
+        else:
+            self._store.set_rotation(self._row, rotation)
+
+    @property
+    def scale_x(self):
+        """X方向缩放因子"""
+        if self._store is None:
+            return self._scale_x
+        return float(self._store.scales[self._row, 0])
+
+    @scale_x.setter
+    def scale_x(self, value):
+        if self._store is None:
+            self.__dict__['_scale_x'] = value
+            self.__dict__['_transform_version'] = next_version()
+        else:
+            self._store.set_scale(self._row, 0, value)
+
+    @property
+    def scale_y(self):
+        """Y方向缩放因子"""
+        if self._store is None:
+            return self._scale_y
+        return float(self._store.scales[self._row, 1])
+
+    @scale_y.setter
+    def scale_y(self, value):
+        if self._store is None:
+            self.__dict__['_scale_y'] = value
+            self.__dict__['_transform_version'] = next_version()
+        else:
+            self._store.set_scale(self._row, 1, value)
+
+    def invalidate_geometry(self):
+        """几何形状变化后使边界缓存失效（原地修改点列表等属性后需手动调用）"""
+        self.__dict__['_geometry_version'] = next_version()
+        if self._store is not None:
+            self._store.mark_geometry_dirty(self._row)
+
+    def transform_version(self):
+        """当前变换的版本号，变换每次修改后都会变化"""
+        if self._store is None:
+            return self._transform_version
+        return int(self._store.versions[self._row])
+
+    def _transforms(self):
+        """获取缓存的 (正变换, 逆变换)，不可逆时逆变换为 None"""
+        version = self.transform_version()
+        cached = self.__dict__.get('_cached_transform')
+        if perf.enabled:
+            perf.cache('transforms', cached is not None and cached[0] == version)
+        if cached is None or cached[0] != version:
+            transform = QTransform()
+            position = self.position
+            transform.translate(position.x(), position.y())
+            transform.rotate(self.rotation)
+            transform.scale(self.scale_x, self.scale_y)
+            inverted, success = transform.inverted()
+            cached = (version, transform, inverted if success else None)
+            self.__dict__['_cached_transform'] = cached
+        return cached[1], cached[2]
+
+    def _cached_bounds(self, name, compute):
+        """按变换和几何版本号缓存的边界矩形"""
+        key = (self.transform_version(), self._geometry_version)
+        cached = self.__dict__.get(name)
+        if perf.enabled:
+            perf.cache('bounds', cached is not None and cached[0] == key)
+        if cached is None or cached[0] != key:
+            cached = (key, compute())
+            self.__dict__[name] = cached
+        return QRectF(cached[1])
+
+    def sample_points(self):
+        """获取图形上的采样点（本地坐标的 (N, 2) 数组，按几何版本号缓存，只读）
+        
+        用于套索等区域选择：所有采样点都在区域内时认为图形位于区域内。
+        """
+        cached = self.__dict__.get('_cached_sample_points')
+        if cached is None or cached[0] != self._geometry_version:
+            cached = (self._geometry_version, self._compute_sample_points())
+            self.__dict__['_cached_sample_points'] = cached
+        return cached[1]
+
+    def _compute_sample_points(self):
+        """默认使用边界矩形的四个角点和中心点"""
+        rect = self.bounding_rect()
+        return np.array([(rect.left(), rect.top()), (rect.right(), rect.top()),
+                         (rect.right(), rect.bottom()), (rect.left(), rect.bottom()),
+                         (rect.center().x(), rect.center().y())])
+
+    def snap_points(self):
+        """获取图形自身的吸附点 (本地坐标的 (N, 2) 数组, 类型数组)，按几何版本号缓存，只读
+        
+        边界框的角点、边中点和中心点由吸附索引统一计算，这里只需返回图形特有的点。
+        """
+        cached = self.__dict__.get('_cached_snap_points')
+        if cached is None or cached[0] != self._geometry_version:
+            points = self._compute_snap_points()
+            if points:
+                cached = (self._geometry_version,
+                          (np.array([(x, y) for x, y, _ in points], dtype=np.float64),
+                           np.array([kind for _, _, kind in points], dtype=np.int8)))
+            else:
+                cached = (self._geometry_version, (np.empty((0, 2)), np.empty(0, dtype=np.int8)))
+            self.__dict__['_cached_snap_points'] = cached
+        return cached[1]
+
+    def _compute_snap_points(self):
+        """返回图形特有的吸附点列表 [(x, y, 类型), ...]"""
+        return []
+
+    def polyline_lod(self):
+        """获取折线类图形的细节层次金字塔（按几何版本号缓存），其他图形返回 None"""
+        cached = self.__dict__.get('_cached_polyline_lod')
+        if cached is None or cached[0] != self._geometry_version:
+            polyline = self._compute_polyline()
+            cached = (self._geometry_version,
+                      rendering.PolylineLOD(*polyline) if polyline is not None else None)
+            self.__dict__['_cached_polyline_lod'] = cached
+        return cached[1]
+
+    def _compute_polyline(self):
+        """返回折线顶点 ((N, 2) 本地坐标数组, 是否闭合)，不是折线时返回 None"""
+        return None
+
+    def flattened_curve(self):
+        """获取解析曲线按缩放自适应展平的路径缓存（按几何版本号缓存），其他图形返回 None"""
+        cached = self.__dict__.get('_cached_flattened_curve')
+        if cached is None or cached[0] != self._geometry_version:
+            curve = self._compute_curve()
+            cached = (self._geometry_version,
+                      rendering.FlattenedCurve(*curve) if curve is not None else None)
+            self.__dict__['_cached_flattened_curve'] = cached
+        return cached[1]
+
+    def _compute_curve(self):
+        """返回解析曲线的参数化描述 (求值函数, 起点参数, 终点参数, 初始分段数, 是否闭合)，
+        求值函数把参数数组映射为 (N, 2) 本地坐标数组，不是解析曲线时返回 None"""
+        return None
+
+    def world_transform(self):
+        """本地坐标到场景坐标的变换（缓存，只读）"""
+        return self._transforms()[0]
+
+    def inverse_world_transform(self):
+        """场景坐标到本地坐标的变换（缓存，只读），不可逆时返回 None"""
+        return self._transforms()[1]
+
+    @property
+    def pen(self):
+        """共享画笔（只读，修改时请复制后通过 set_pen 设置）"""
+        return style_table().pen(self.pen_id)
+
+    @pen.setter
+    def pen(self, pen):
+        self.pen_id = style_table().intern_pen(pen)
+
+    @property
+    def brush(self):
+        """共享画刷（只读，修改时请复制后通过 set_brush 设置）"""
+        return style_table().brush(self.brush_id)
+
+    @brush.setter
+    def brush(self, brush):
+        self.brush_id = style_table().intern_brush(brush)
+
     def set_pen(self, pen):
         self.pen = pen
         
     def set_brush(self, brush):
         self.brush = brush
+
+    def set_named_pen(self, name):
+        """引用命名画笔，之后修改该命名画笔会同时影响本图形
+
+        命名画笔需要先通过样式表的 define_pen 定义，未定义时抛出 KeyError。
+        """
+        pen_id = style_table().named_pen_id(name)
+        if pen_id is None:
+            raise KeyError(f"未定义的命名画笔: {name}")
+        self.pen_id = pen_id
+
+    def set_named_brush(self, name):
+        """引用命名画刷，之后修改该命名画刷会同时影响本图形
+
+        命名画刷需要先通过样式表的 define_brush 定义，未定义时抛出 KeyError。
+        """
+        brush_id = style_table().named_brush_id(name)
+        if brush_id is None:
+            raise KeyError(f"未定义的命名画刷: {name}")
+        self.brush_id = brush_id
+
+    def copy_style(self, other):
+        """共享另一个图形的画笔和画刷"""
+        self.pen_id = other.pen_id
+        self.brush_id = other.brush_id
+
+    def copy_transform(self, other):
+        """复制另一个图形的位置、旋转、缩放和z顺序"""
+        self.position = other.position
+        self.rotation = other.rotation
+        self.scale_x = other.scale_x
+        self.scale_y = other.scale_y
+        self.z_value = other.z_value
     
     def set_position(self, pos):
         self.position = pos
@@ -111,21 +377,17 @@ class Shape:
         
     def _transform_point_to_local(self, point):
         """将全局坐标点转换为图形的本地坐标系"""
-        # 创建转换矩阵
-        transform = QTransform()
-        # 反向应用变换（位置、旋转、缩放）
-        transform.translate(self.position.x(), self.position.y())
-        transform.rotate(self.rotation)
-        transform.scale(self.scale_x, self.scale_y)
-        # 计算逆变换
-        inverted, success = transform.inverted()
-        if not success:
+        # 应用缓存的逆变换（位置、旋转、缩放）
+        inverted = self.inverse_world_transform()
+        if inverted is None:
             return point
-        # 应用逆变换
         return inverted.map(point)
         
     def _get_global_bounds(self):
-        """获取图形在全局坐标系中的边界矩形"""
+        """获取图形在全局坐标系中的边界矩形（用于选择和手柄）"""
+        return self._cached_bounds('_cached_global_bounds', self._compute_global_bounds)
+
+    def _compute_global_bounds(self):
         # 获取本地边界矩形，添加额外的边距使选择更容易
         local_rect = self.bounding_rect()
         
@@ -133,19 +395,8 @@ class Shape:
         margin = max(10, self.pen.width())
         local_rect = local_rect.adjusted(-margin, -margin, margin, margin)
         
-        # 创建变换矩阵
-        transform = QTransform()
-        transform.translate(self.position.x(), self.position.y())
-        transform.rotate(self.rotation)
-        transform.scale(self.scale_x, self.scale_y)
-        
-        # 变换矩形的四个角点
-        path = QPainterPath()
-        path.addRect(local_rect)
-        transformed_path = transform.map(path)
-        
-        # 返回变换后路径的边界矩形
-        return transformed_path.boundingRect()
+        # 变换后矩形四个角点的边界
+        return self.world_transform().mapRect(local_rect)
         
     def _contains_local(self, point):
         """检查本地坐标点是否在图形内，由子类实现"""
@@ -155,27 +406,40 @@ class Shape:
         """获取图形的边界矩形"""
         return QRectF()
         
+    def visual_rect(self):
+        """获取图形实际绘制内容在本地坐标系中的边界（包含笔宽）"""
+        margin = self.pen.widthF() / 2 + 1
+        return self.bounding_rect().adjusted(-margin, -margin, margin, margin)
+        
+    def scene_bounds(self):
+        """获取图形绘制内容在场景坐标系中的边界矩形，用于导出和裁剪"""
+        return self._cached_bounds('_cached_scene_bounds',
+                                   lambda: self.world_transform().mapRect(self.visual_rect()))
+        
     def paint(self, painter):
         """绘制图形"""
         painter.save()
-        # 应用变换
-        painter.translate(self.position)
-        painter.rotate(self.rotation)
-        painter.scale(self.scale_x, self.scale_y)
+        # 应用变换（位置、旋转、缩放）
+        painter.setWorldTransform(self.world_transform(), True)
         
-        # 设置画笔和画刷
-        painter.setPen(self.pen)
-        painter.setBrush(self.brush)
+        # 设置画笔和画刷，草稿质量下渐变以纯色代替
+        options = rendering.current_options()
+        if options.gradients:
+            pen, brush = self.pen, self.brush
+        else:
+            pen, brush = style_table().flat_pen(self.pen_id), style_table().flat_brush(self.brush_id)
+        painter.setPen(pen)
+        painter.setBrush(brush)
         
-        # 如果被选中，绘制选择指示器
-        if self.selected:
+        # 如果被选中，绘制选择指示器（导出时不绘制）
+        if self.selected and options.show_selection:
             select_pen = QPen(Qt.blue, 1, Qt.DashLine)
             painter.setPen(select_pen)
             painter.setBrush(Qt.transparent)
             rect = self.bounding_rect()
             painter.drawRect(rect.adjusted(-3, -3, 3, 3))
-            painter.setPen(self.pen)
-            painter.setBrush(self.brush)
+            painter.setPen(pen)
+            painter.setBrush(brush)
         
         # 子类实现具体绘制逻辑
         self._draw(painter)
@@ -190,9 +454,8 @@ class Shape:
         """创建图形的副本"""
         shape_copy = Shape(self.color, self.fill_color, self.line_width, self.line_style, self.layer)
         
-        # 直接复制画笔和画刷
-        shape_copy.pen = QPen(self.pen)
-        shape_copy.brush = QBrush(self.brush)
+        # 共享画笔和画刷
+        shape_copy.copy_style(self)
         
         # 复制变换属性
         shape_copy.position = QPointF(self.position)
@@ -268,6 +531,17 @@ class Line(Shape):
         click_tolerance = max(5, self.pen.width() / 2)
         return distance <= click_tolerance
         
+    def _compute_sample_points(self):
+        """直线取两个端点和中点"""
+        start, end = self.start_point, self.end_point
+        return np.array([(start.x(), start.y()), (end.x(), end.y()),
+                         ((start.x() + end.x()) / 2, (start.y() + end.y()) / 2)])
+        
+    def _compute_snap_points(self):
+        start, end = self.start_point, self.end_point
+        return [(start.x(), start.y(), SNAP_ENDPOINT), (end.x(), end.y(), SNAP_ENDPOINT),
+                ((start.x() + end.x()) / 2, (start.y() + end.y()) / 2, SNAP_MIDPOINT)]
+        
     def bounding_rect(self):
         """获取直线的边界矩形"""
         return QRectF(
@@ -280,6 +554,8 @@ class Line(Shape):
     def clone(self):
         """创建直线的副本"""
         line_copy = Line(QPointF(self.start_point), QPointF(self.end_point), self.color, self.fill_color, self.line_width, self.line_style, self.layer)
+        line_copy.copy_style(self)
+        line_copy.copy_transform(self)
         line_copy.selected = False
         return line_copy
 
@@ -320,6 +596,17 @@ class Rectangle(Shape):
         """检查点是否在矩形内"""
         return self.rect.contains(point)
         
+    def _compute_snap_points(self):
+        """矩形的角点、边中点和中心（旋转后仍在矩形上，与边界框不同）"""
+        rect = self.rect
+        left, top, right, bottom = rect.left(), rect.top(), rect.right(), rect.bottom()
+        center = rect.center()
+        return [(left, top, SNAP_ENDPOINT), (right, top, SNAP_ENDPOINT),
+                (right, bottom, SNAP_ENDPOINT), (left, bottom, SNAP_ENDPOINT),
+                (center.x(), top, SNAP_MIDPOINT), (right, center.y(), SNAP_MIDPOINT),
+                (center.x(), bottom, SNAP_MIDPOINT), (left, center.y(), SNAP_MIDPOINT),
+                (center.x(), center.y(), SNAP_CENTER)]
+        
     def bounding_rect(self):
         """获取矩形的边界"""
         return self.rect
@@ -330,8 +617,7 @@ class Rectangle(Shape):
         rect_copy = Rectangle(QRectF(self.rect), self.color, self.fill_color, self.line_width, self.line_style, self.layer)
         
         # 复制基类属性（画笔、画刷和变换）
-        rect_copy.pen = QPen(self.pen)
-        rect_copy.brush = QBrush(self.brush)
+        rect_copy.copy_style(self)
         rect_copy.position = QPointF(self.position)
         rect_copy.rotation = self.rotation
         rect_copy.scale_x = self.scale_x
@@ -340,30 +626,6 @@ class Rectangle(Shape):
         
         return rect_copy
 
-    # 重写_get_global_bounds确保与选择框计算一致
-    def _get_global_bounds(self):
-        """获取图形在全局坐标系中的边界矩形"""
-        # 获取本地边界矩形
-        local_rect = self.bounding_rect()
-        
-        # 添加额外的边距，考虑笔宽
-        margin = max(10, self.pen.width())
-        local_rect = local_rect.adjusted(-margin, -margin, margin, margin)
-        
-        # 创建变换矩阵
-        transform = QTransform()
-        transform.translate(self.position.x(), self.position.y())
-        transform.rotate(self.rotation)
-        transform.scale(self.scale_x, self.scale_y)
-        
-        # 变换矩形的四个角点
-        path = QPainterPath()
-        path.addRect(local_rect)
-        transformed_path = transform.map(path)
-        
-        # 返回变换后路径的边界矩形
-        return transformed_path.boundingRect()
-
 
 class Circle(Shape):
     """圆形"""
@@ -402,6 +664,15 @@ class Circle(Shape):
         dy = point.y() - self.center.y()
         return (dx * dx + dy * dy) <= (self.radius * self.radius)
         
+    def _compute_sample_points(self):
+        """圆周上均匀取16个点"""
+        angles = np.linspace(0, 2 * np.pi, 16, endpoint=False)
+        return np.column_stack((self.center.x() + self.radius * np.cos(angles),
+                                self.center.y() + self.radius * np.sin(angles)))
+        
+    def _compute_snap_points(self):
+        return [(self.center.x(), self.center.y(), SNAP_CENTER)]
+        
     def bounding_rect(self):
         """获取圆的边界矩形"""
         return QRectF(
@@ -451,66 +722,92 @@ class ArchimedeanSpiral(Shape):
         super().__setstate__(state)
         
     def _draw(self, painter):
-        path = QPainterPath()
+        self.flattened_curve().draw(painter)
         
-        # 计算螺线点
-        first_point = True
-        for theta in np.linspace(0, 2 * math.pi * self.turns, 500):
-            r = self.a + self.b * theta
-            x = r * math.cos(theta) + self.center.x()
-            y = r * math.sin(theta) + self.center.y()
-            
-            if first_point:
-                path.moveTo(x, y)
-                first_point = False
-            else:
-                path.lineTo(x, y)
+    def _compute_curve(self):
+        """螺线以极角为参数，每圈初始分32段"""
+        a, b = self.a, self.b
+        cx, cy = self.center.x(), self.center.y()
         
-        painter.drawPath(path)
+        def evaluate(theta):
+            r = a + b * theta
+            return np.column_stack((r * np.cos(theta) + cx, r * np.sin(theta) + cy))
+        
+        return evaluate, 0.0, 2 * math.pi * self.turns, max(8, math.ceil(32 * self.turns)), False
         
     def _contains_local(self, point):
         """检查点是否在螺线上或附近"""
-        # 获取点到中心的距离
+        # 点击容差
+        tolerance = max(5.0, self.pen.widthF() / 2)
+        
+        # 快速排除螺线最大半径之外的点
         dx = point.x() - self.center.x()
         dy = point.y() - self.center.y()
-        distance = math.sqrt(dx*dx + dy*dy)
-        
-        # 计算角度
-        angle = math.atan2(dy, dx)
-        if angle < 0:
-            angle += 2 * math.pi
-        
-        # 计算该角度对应的螺线半径
-        turns_at_angle = angle / (2 * math.pi)
-        max_turns = min(self.turns, turns_at_angle + self.turns)
-        
-        # 检查点是否在螺线的一定范围内
-        tolerance = 5.0  # 点击容差，可以调整
-        
-        # 检查点是否在螺线最大范围内
-        max_radius = self.a + self.b * (2 * math.pi * max_turns)
-        if distance > max_radius:
+        max_radius = max(abs(self.a), abs(self.a + self.b * 2 * math.pi * self.turns))
+        if math.hypot(dx, dy) > max_radius + tolerance:
             return False
             
-        # 找到最接近的螺线点
-        min_distance = float('inf')
-        for theta in np.linspace(0, 2 * math.pi * self.turns, 100):
-            r = self.a + self.b * theta
-            x = r * math.cos(theta) + self.center.x()
-            y = r * math.sin(theta) + self.center.y()
-            
-            dx_spiral = x - point.x()
-            dy_spiral = y - point.y()
-            dist_to_spiral = math.sqrt(dx_spiral*dx_spiral + dy_spiral*dy_spiral)
-            
-            min_distance = min(min_distance, dist_to_spiral)
-            
-        return min_distance <= tolerance
+        return self.distance_to_curve(point, tolerance) <= tolerance
+        
+    def distance_to_curve(self, point, limit=math.inf):
+        """本地坐标点到螺线的最短距离
+        
+        螺线每圈与点所在极角方向的射线相交一次，以这些交点（及两个端点）为初值，
+        用牛顿法求出每圈上的最近点，计算量与圈数成正比。
+        半径 a + bθ 为负时参数 θ 处的点位于极角 θ+π 方向，因此按半径的符号分段
+        （分界处螺线经过中心），半径为负的段上以 θ+π 与点同极角的参数为初值。
+        给出 limit 时跳过半径与点相差过大、不可能在 limit 以内的圈，
+        距离超过 limit 时返回值只保证大于 limit。
+        """
+        dx = point.x() - self.center.x()
+        dy = point.y() - self.center.y()
+        theta_max = 2 * math.pi * self.turns
+        if theta_max <= 0:
+            return math.hypot(dx - self.a, dy)
+        
+        a, b = self.a, self.b
+        rho = math.hypot(dx, dy)
+        angle = math.atan2(dy, dx) % (2 * math.pi)
+        # 最近点与同极角的初值相差不超过半圈，半径相差不超过 π|b|
+        reach = limit + 2 * math.pi * abs(b)
+        breaks = [0.0, theta_max]
+        if b and 0 < -a / b < theta_max:
+            breaks.insert(1, -a / b)
+        candidates = list(breaks)
+        for start, end in zip(breaks, breaks[1:]):
+            # 每圈上与点同极角的参数
+            offset = angle if a + b * (start + end) / 2 >= 0 else angle + math.pi
+            first = math.floor((start - offset) / (2 * math.pi))
+            last = math.ceil((end - offset) / (2 * math.pi))
+            candidates += [theta for theta in (min(max(offset + 2 * math.pi * k, start), end)
+                                               for k in range(first, last + 1))
+                           if abs(rho - abs(a + b * theta)) <= reach]
+        
+        best = math.inf
+        for theta in candidates:
+            # 牛顿法求 (S(θ) - P)·S'(θ) = 0，S 为螺线上的点
+            for _ in range(4):
+                cos_t, sin_t = math.cos(theta), math.sin(theta)
+                r = a + b * theta
+                ex, ey = r * cos_t - dx, r * sin_t - dy
+                d1x, d1y = b * cos_t - r * sin_t, b * sin_t + r * cos_t
+                d2x, d2y = -2 * b * sin_t - r * cos_t, 2 * b * cos_t - r * sin_t
+                df = d1x * d1x + d1y * d1y + ex * d2x + ey * d2y
+                # 只在极小值附近（二阶导为正）迭代
+                if df <= 0:
+                    break
+                theta = min(max(theta - (ex * d1x + ey * d1y) / df, 0.0), theta_max)
+            r = a + b * theta
+            best = min(best, math.hypot(r * math.cos(theta) - dx, r * math.sin(theta) - dy))
+        return best
+        
+    def _compute_snap_points(self):
+        return [(self.center.x(), self.center.y(), SNAP_CENTER)]
         
     def bounding_rect(self):
         """获取螺线的边界矩形"""
-        # 最大半径是在最大角度时
-        max_r = self.a + self.b * (2 * math.pi * self.turns)
+        # 半径随角度线性变化，最大半径在两个端点之一（参数可能为负）
+        max_r = max(abs(self.a), abs(self.a + self.b * (2 * math.pi * self.turns)))
         return QRectF(
             self.center.x() - max_r,
             self.center.y() - max_r,
@@ -558,39 +855,101 @@ class SineCurve(Shape):
         super().__setstate__(state)
         
     def _draw(self, painter):
-        path = QPainterPath()
+        self.flattened_curve().draw(painter)
         
-        # 增加采样点数量，使曲线更平滑
-        num_points = 500  # 增加点数
+    def _compute_curve(self):
+        """正弦曲线以横坐标为参数，每个周期初始分32段"""
+        amplitude, frequency = self.amplitude, self.frequency
+        sx, sy = self.start.x(), self.start.y()
         
-        # 计算正弦曲线点
-        first_point = True
-        for x in np.linspace(0, self.length, num_points):
-            y = self.amplitude * math.sin(x * self.frequency)
-            
-            if first_point:
-                path.moveTo(x + self.start.x(), y + self.start.y())
-                first_point = False
-            else:
-                path.lineTo(x + self.start.x(), y + self.start.y())
+        def evaluate(x):
+            return np.column_stack((x + sx, amplitude * np.sin(x * frequency) + sy))
         
-        # 使用抗锯齿绘制
-        painter.setRenderHint(QPainter.Antialiasing, True)
-        painter.drawPath(path)
+        periods = abs(self.length * frequency) / (2 * math.pi)
+        return evaluate, 0.0, float(self.length), max(8, math.ceil(32 * periods)), False
         
     def _contains_local(self, point):
         """检查点是否在正弦曲线上或附近"""
-        # 检查点是否在曲线的横向范围内
-        if point.x() < self.start.x() or point.x() > self.start.x() + self.length:
-            return False
-            
-        # 计算在x位置的正弦值
-        x_local = point.x() - self.start.x()
-        expected_y = self.amplitude * math.sin(x_local * self.frequency) + self.start.y()
-        
-        # 检查点是否在曲线附近
-        tolerance = 5.0  # 点击容差
-        return abs(point.y() - expected_y) <= tolerance
+        # 点击容差
+        tolerance = max(5.0, self.pen.widthF() / 2)
+        return self.distance_to_curve(point, tolerance) <= tolerance
+        
+    def distance_to_curve(self, point, limit=math.inf):
+        """本地坐标点到正弦曲线的最短距离
+        
+        最近点满足 g(x) = (x - px) + (y(x) - py)·y'(x) = 0（连线沿曲线法向）。
+        最短距离不超过点到曲线的竖直距离 d0，最近点的横坐标与 px 之差也不超过 d0 和 limit，
+        因此只需在这个窗口内搜索，计算量与曲线长度无关。
+        g'(x) = 1 + A²f²·cos(2fx) + py·A·f²·sin(fx) 是 sin(fx) 的二次式，其根可以直接求出，
+        以这些根和窗口两端划分区间后 g 在每个区间内单调，至多有一个根：
+        g 由负变正的区间用带二分保护的牛顿法求根，其余区间的最小值在端点处。
+        距离超过 limit 时返回值只保证大于 limit。
+        """
+        px = point.x() - self.start.x()
+        py = point.y() - self.start.y()
+        amplitude, frequency = self.amplitude, self.frequency
+        
+        def distance(x):
+            return math.hypot(x - px, amplitude * math.sin(frequency * x) - py)
+        
+        def g(x):
+            """距离平方的一半对 x 的一阶和二阶导数"""
+            sin_x, cos_x = math.sin(frequency * x), math.cos(frequency * x)
+            ey = amplitude * sin_x - py
+            slope = amplitude * frequency * cos_x
+            return ((x - px) + ey * slope,
+                    1 + slope * slope - ey * amplitude * frequency * frequency * sin_x)
+        
+        def refine(left, right, x):
+            """在 [left, right] 内从 x 出发求单调递增的 g 的根"""
+            for _ in range(100):
+                gx, slope = g(x)
+                if gx <= 0:
+                    left = x
+                else:
+                    right = x
+                if abs(gx) < 1e-12 or right - left < 1e-9:
+                    break
+                # 牛顿步落在区间外时退化为二分
+                newton = x - gx / slope if slope > 0 else left - 1
+                x = newton if left < newton < right else (left + right) / 2
+            return x
+        
+        lo, hi = min(0.0, self.length), max(0.0, self.length)
+        reach = limit
+        if lo <= px <= hi:
+            reach = min(reach, distance(px))
+        lo, hi = max(lo, px - reach), min(hi, px + reach)
+        if lo > hi:
+            return math.inf
+        
+        # g' = 0 即 -2A²f²·s² + py·A·f²·s + (1 + A²f²) = 0，s = sin(fx)；判别式恒为正
+        breaks = [lo, hi]
+        a2 = -2 * (amplitude * frequency) ** 2
+        if a2 != 0:
+            a1 = py * amplitude * frequency * frequency
+            a0 = 1 + (amplitude * frequency) ** 2
+            root = math.sqrt(a1 * a1 - 4 * a2 * a0)
+            u_lo, u_hi = sorted((frequency * lo, frequency * hi))
+            for s in ((-a1 + root) / (2 * a2), (-a1 - root) / (2 * a2)):
+                if abs(s) > 1:
+                    continue
+                for base in (math.asin(s), math.pi - math.asin(s)):
+                    k_first = math.ceil((u_lo - base) / (2 * math.pi))
+                    k_last = math.floor((u_hi - base) / (2 * math.pi))
+                    for k in range(k_first, k_last + 1):
+                        x = (base + 2 * math.pi * k) / frequency
+                        if lo < x < hi:
+                            breaks.append(x)
+        breaks.sort()
+        
+        values = [g(x)[0] for x in breaks]
+        best = min(distance(x) for x in breaks)
+        for i in range(len(breaks) - 1):
+            if values[i] <= 0 < values[i + 1]:
+                left, right = breaks[i], breaks[i + 1]
+                best = min(best, distance(refine(left, right, (left + right) / 2)))
+        return best
         
     def bounding_rect(self):
         """获取正弦曲线的边界矩形"""
@@ -639,19 +998,15 @@ class Freehand(Shape):
         
     def add_point(self, point):
         self.points.append(point)
+        self.invalidate_geometry()
         
     def _draw(self, painter):
         if len(self.points) < 2:
             return
-            
-        # 创建路径
-        path = QPainterPath()
-        path.moveTo(self.points[0])
+        self.polyline_lod().draw(painter)
         
-        for i in range(1, len(self.points)):
-            path.lineTo(self.points[i])
-            
-        painter.drawPath(path)
+    def _compute_polyline(self):
+        return np.array([(point.x(), point.y()) for point in self.points], dtype=np.float64), False
         
     def _contains_local(self, point):
         """检查点是否在自由绘制线条上或附近"""
@@ -694,6 +1049,18 @@ class Freehand(Shape):
                 
         return False
         
+    def _compute_sample_points(self):
+        """取线条上的点，点数过多时均匀抽取"""
+        if not self.points:
+            return super()._compute_sample_points()
+        step = max(1, len(self.points) // MAX_SAMPLE_POINTS)
+        points = self.points[::step] + self.points[-1:]
+        return np.array([(point.x(), point.y()) for point in points])
+        
+    def _compute_snap_points(self):
+        """线条的起点和终点"""
+        return [(point.x(), point.y(), SNAP_ENDPOINT) for point in self.points[:1] + self.points[-1:]]
+        
     def bounding_rect(self):
         """获取自由绘制线条的边界矩形"""
         if not self.points:
@@ -737,10 +1104,12 @@ class ShapeGroup(Shape):
         
     def add(self, shape):
         self.shapes.append(shape)
+        self.invalidate_geometry()
         
     def remove(self, shape):
         if shape in self.shapes:
             self.shapes.remove(shape)
+            self.invalidate_geometry()
             
     def _draw(self, painter):
         for shape in self.shapes:
@@ -773,10 +1142,21 @@ class ShapeGroup(Shape):
         group_copy = ShapeGroup(self.color, self.fill_color, self.line_width, self.line_style, self.layer)
         for shape in self.shapes:
             group_copy.add(shape.clone())
+        group_copy.copy_style(self)
+        group_copy.copy_transform(self)
         group_copy.selected = False
         return group_copy
 
 
+def _draw_placeholder(painter, rect):
+    """绘制计算量大的图形的占位矩形"""
+    painter.save()
+    painter.setPen(QPen(QColor(160, 160, 160), 0, Qt.DashLine))
+    painter.setBrush(QColor(230, 230, 230))
+    painter.drawRect(rect)
+    painter.restore()
+
+
 class MandelbrotSet(Shape):
     """曼德勃罗集"""
     def __init__(self, rect=QRectF(-2, -1.5, 3, 3), max_iter=100, color=None, fill_color=None, line_width=1, line_style=Qt.SolidLine, layer="默认图层"):
@@ -788,6 +1168,11 @@ class MandelbrotSet(Shape):
         width = int(self.rect.width() * 100)  # 分辨率
         height = int(self.rect.height() * 100)
         
+        # 草稿质量下不计算分形
+        if not rendering.current_options().fractals:
+            _draw_placeholder(painter, QRectF(0, 0, width, height))
+            return
+        
         # 创建图像
         for px in range(width):
             for py in range(height):
@@ -825,6 +1210,8 @@ class MandelbrotSet(Shape):
     def clone(self):
         """创建分形图形的副本"""
         fractal_copy = MandelbrotSet(QRectF(self.rect), self.max_iter, self.color, self.fill_color, self.line_width, self.line_style, self.layer)
+        fractal_copy.copy_style(self)
+        fractal_copy.copy_transform(self)
         fractal_copy.selected = False
         return fractal_copy
 
@@ -841,6 +1228,11 @@ class JuliaSet(Shape):
         width = int(self.rect.width() * 100)  # 分辨率
         height = int(self.rect.height() * 100)
         
+        # 草稿质量下不计算分形
+        if not rendering.current_options().fractals:
+            _draw_placeholder(painter, QRectF(0, 0, width, height))
+            return
+        
         # 创建图像
         for px in range(width):
             for py in range(height):
@@ -877,6 +1269,8 @@ class JuliaSet(Shape):
     def clone(self):
         """创建分形图形的副本"""
         julia_copy = JuliaSet(QRectF(self.rect), self.c, self.max_iter, self.color, self.fill_color, self.line_width, self.line_style, self.layer)
+        julia_copy.copy_style(self)
+        julia_copy.copy_transform(self)
         julia_copy.selected = False
         return julia_copy
 
@@ -891,28 +1285,20 @@ class SuperEllipse(Shape):
         self.n = n  # 拉梅参数
         
     def _draw(self, painter):
-        path = QPainterPath()
+        self.flattened_curve().draw(painter)
         
-        # 生成超椭圆的点
-        points = []
-        steps = 200
-        for i in range(steps + 1):
-            t = 2 * math.pi * i / steps
-            # 超椭圆参数方程
-            cos_t = math.cos(t)
-            sin_t = math.sin(t)
-            x = self.a * math.copysign(abs(cos_t) ** (2/self.n), cos_t)
-            y = self.b * math.copysign(abs(sin_t) ** (2/self.n), sin_t)
-            points.append(QPointF(x + self.center.x(), y + self.center.y()))
-        
-        # 绘制路径
-        if points:
-            path.moveTo(points[0])
-            for point in points[1:]:
-                path.lineTo(point)
-            path.closeSubpath()
-            
-        painter.drawPath(path)
+    def _compute_curve(self):
+        """超椭圆参数方程，参数范围为 [0, 2π]"""
+        a, b, exponent = self.a, self.b, 2 / self.n
+        cx, cy = self.center.x(), self.center.y()
+        
+        def evaluate(t):
+            cos_t, sin_t = np.cos(t), np.sin(t)
+            x = a * np.sign(cos_t) * np.abs(cos_t) ** exponent
+            y = b * np.sign(sin_t) * np.abs(sin_t) ** exponent
+            return np.column_stack((x + cx, y + cy))
+        
+        return evaluate, 0.0, 2 * math.pi, 256, True
         
     def _contains_local(self, point):
         """检查点是否在超椭圆内"""
@@ -934,6 +1320,8 @@ class SuperEllipse(Shape):
     def clone(self):
         """创建超椭圆的副本"""
         ellipse_copy = SuperEllipse(QPointF(self.center), self.a, self.b, self.n, self.color, self.fill_color, self.line_width, self.line_style, self.layer)
+        ellipse_copy.copy_style(self)
+        ellipse_copy.copy_transform(self)
         ellipse_copy.selected = False
         return ellipse_copy
 
@@ -948,47 +1336,42 @@ class ParametricCurve(Shape):
         self.n = n  # 参数（玫瑰线的瓣数等）
         
     def _draw(self, painter):
-        path = QPainterPath()
+        curve = self.flattened_curve()
+        if curve is not None:
+            curve.draw(painter)
         
-        # 生成参数曲线的点
-        points = []
-        steps = 500
+    def _compute_curve(self):
+        """参数曲线的参数范围为 [0, 2π]"""
+        radius, n = self.radius, self.n
+        cx, cy = self.center.x(), self.center.y()
         
         if self.curve_type == "rose":
-            # 玫瑰线
-            for i in range(steps + 1):
-                t = 2 * math.pi * i / steps
-                r = self.radius * math.cos(self.n * t)
-                x = r * math.cos(t)
-                y = r * math.sin(t)
-                points.append(QPointF(x + self.center.x(), y + self.center.y()))
+            # 玫瑰线，初始分段数随瓣数增加
+            def evaluate(t):
+                r = radius * np.cos(n * t)
+                return np.column_stack((r * np.cos(t) + cx, r * np.sin(t) + cy))
+            intervals = 64 * max(1, math.ceil(abs(n)))
                 
         elif self.curve_type == "heart":
             # 心形线
-            for i in range(steps + 1):
-                t = 2 * math.pi * i / steps
-                x = self.radius * math.sin(t) ** 3
-                y = self.radius * (1.3 * math.cos(t) - 0.5 * math.cos(2*t) - 0.2 * math.cos(3*t) - 0.1 * math.cos(4*t))
-                points.append(QPointF(x + self.center.x(), -y + self.center.y()))
+            def evaluate(t):
+                x = radius * np.sin(t) ** 3
+                y = radius * (1.3 * np.cos(t) - 0.5 * np.cos(2*t) - 0.2 * np.cos(3*t) - 0.1 * np.cos(4*t))
+                return np.column_stack((x + cx, -y + cy))
+            intervals = 128
                 
         elif self.curve_type == "butterfly":
             # 蝴蝶线
-            for i in range(steps + 1):
-                t = 2 * math.pi * i / steps
-                r = math.exp(math.cos(t)) - 2 * math.cos(4*t) - math.sin(t/12) ** 5
-                x = self.radius * math.sin(t) * r
-                y = self.radius * math.cos(t) * r
-                points.append(QPointF(x + self.center.x(), y + self.center.y()))
-        
-        # 绘制路径
-        if points:
-            path.moveTo(points[0])
-            for point in points[1:]:
-                path.lineTo(point)
-            if self.curve_type != "butterfly":  # 蝴蝶线不闭合
-                path.closeSubpath()
+            def evaluate(t):
+                r = np.exp(np.cos(t)) - 2 * np.cos(4*t) - np.sin(t/12) ** 5
+                return np.column_stack((radius * np.sin(t) * r + cx, radius * np.cos(t) * r + cy))
+            intervals = 256
             
-        painter.drawPath(path)
+        else:
+            return None
+        
+        # 蝴蝶线不闭合
+        return evaluate, 0.0, 2 * math.pi, intervals, self.curve_type != "butterfly"
         
     def _contains_local(self, point):
         """检查点是否在曲线附近"""
@@ -997,6 +1380,21 @@ class ParametricCurve(Shape):
         dy = point.y() - self.center.y()
         return dx*dx + dy*dy <= self.radius*self.radius
         
+    def visual_rect(self):
+        """获取曲线实际绘制范围（心形线和蝴蝶线会超出基础半径）"""
+        margin = self.pen.widthF() / 2 + 1
+        if self.curve_type == "heart":
+            # y = 1.3cos(t) - 0.5cos(2t) - 0.2cos(3t) - 0.1cos(4t)，取值范围约为[-1.7, 0.5]
+            rect = QRectF(self.center.x() - self.radius, self.center.y() - 0.5 * self.radius,
+                          2 * self.radius, 2.2 * self.radius)
+        elif self.curve_type == "butterfly":
+            # r = e^cos(t) - 2cos(4t) - sin(t/12)^5，|r| 不超过 e + 3
+            extent = (math.e + 3) * self.radius
+            rect = QRectF(self.center.x() - extent, self.center.y() - extent, 2 * extent, 2 * extent)
+        else:
+            rect = self.bounding_rect()
+        return rect.adjusted(-margin, -margin, margin, margin)
+        
     def bounding_rect(self):
         """获取曲线的边界矩形"""
         # 根据不同曲线类型返回不同的边界
@@ -1018,6 +1416,8 @@ class ParametricCurve(Shape):
     def clone(self):
         """创建参数曲线的副本"""
         curve_copy = ParametricCurve(QPointF(self.center), self.radius, self.curve_type, self.n, self.color, self.fill_color, self.line_width, self.line_style, self.layer)
+        curve_copy.copy_style(self)
+        curve_copy.copy_transform(self)
         curve_copy.selected = False
         return curve_copy
 
@@ -1076,6 +1476,8 @@ class Gear(Shape):
         
     def clone(self):
         gear_copy = Gear(QPointF(self.center), self.outer_radius, self.tooth_count, self.tooth_depth, self.color, self.fill_color, self.line_width, self.line_style, self.layer)
+        gear_copy.copy_style(self)
+        gear_copy.copy_transform(self)
         gear_copy.selected = False
         return gear_copy
 
@@ -1152,8 +1554,15 @@ class Leaf(Shape):
             self.size
         )
         
+    def visual_rect(self):
+        """获取树叶实际绘制范围（叶脉超出叶片，且会随角度旋转）"""
+        extent = self.size * 1.2 + self.pen.widthF() / 2 + 1
+        return QRectF(self.center.x() - extent, self.center.y() - extent, 2 * extent, 2 * extent)
+        
     def clone(self):
         leaf_copy = Leaf(QPointF(self.center), self.size, self.angle, self.color, self.fill_color, self.line_width, self.line_style, self.layer)
+        leaf_copy.copy_style(self)
+        leaf_copy.copy_transform(self)
         leaf_copy.selected = False
         return leaf_copy
 
@@ -1211,8 +1620,17 @@ class Cloud(Shape):
             self.height
         )
         
+    def visual_rect(self):
+        """获取云朵实际绘制范围（组成云朵的圆会超出宽高）"""
+        margin = self.pen.widthF() / 2 + 1
+        half_w = self.width * 0.3 + self.height * 0.7 + margin
+        half_h = self.height * 0.8 + margin
+        return QRectF(self.center.x() - half_w, self.center.y() - half_h, 2 * half_w, 2 * half_h)
+        
     def clone(self):
         cloud_copy = Cloud(QPointF(self.center), self.width, self.height, self.color, self.fill_color, self.line_width, self.line_style, self.layer)
+        cloud_copy.copy_style(self)
+        cloud_copy.copy_transform(self)
         cloud_copy.selected = False
         return cloud_copy
 
@@ -1224,7 +1642,19 @@ class PenPath(Shape):
         self.points = []  # 存储锚点
         self.path = QPainterPath()  # 绘制路径
         self.is_closed = False  # 路径是否闭合
-        
+
+    def __getstate__(self):
+        """序列化时调用"""
+        state = super().__getstate__()
+        # QPainterPath无法序列化，反序列化时由锚点重建
+        del state['path']
+        return state
+
+    def __setstate__(self, state):
+        """反序列化时调用"""
+        super().__setstate__(state)
+        self._update_path()
+
     def add_point(self, point):
         """添加一个锚点"""
         self.points.append(point)
@@ -1261,7 +1691,10 @@ class PenPath(Shape):
             
     def _draw(self, painter):
         """绘制路径"""
-        painter.drawPath(self.path)
+        if len(self.points) < 2:
+            painter.drawPath(self.path)
+        else:
+            self.polyline_lod().draw(painter)
         
         # 如果被选中，绘制锚点
         if self.selected:
@@ -1277,6 +1710,10 @@ class PenPath(Shape):
             
             painter.restore()
             
+    def _compute_polyline(self):
+        points = np.array([(point.x(), point.y()) for point in self.points], dtype=np.float64)
+        return points, self.is_closed and len(self.points) > 2
+        
     def _contains_local(self, point):
         """检查点是否在路径上"""
         # 为路径创建一个"笔触"区域
@@ -1291,10 +1728,30 @@ class PenPath(Shape):
         # 检查点是否在笔触路径内
         return stroke_path.contains(point)
         
+    def _compute_sample_points(self):
+        """取线条上的点，点数过多时均匀抽取"""
+        if not self.points:
+            return super()._compute_sample_points()
+        step = max(1, len(self.points) // MAX_SAMPLE_POINTS)
+        points = self.points[::step] + self.points[-1:]
+        return np.array([(point.x(), point.y()) for point in points])
+        
+    def _compute_snap_points(self):
+        """路径的锚点和线段中点"""
+        points = [(point.x(), point.y(), SNAP_ENDPOINT) for point in self.points]
+        for a, b in zip(self.points, self.points[1:]):
+            points.append(((a.x() + b.x()) / 2, (a.y() + b.y()) / 2, SNAP_MIDPOINT))
+        return points
+        
     def bounding_rect(self):
         """获取路径的边界矩形"""
         return self.path.boundingRect()
         
+    def visual_rect(self):
+        """获取路径实际绘制范围（包含选中时的锚点）"""
+        margin = max(self.pen.widthF() / 2, 4) + 1
+        return self.bounding_rect().adjusted(-margin, -margin, margin, margin)
+        
     def clone(self):
         """创建路径的副本"""
         new_path = PenPath(
@@ -1308,9 +1765,8 @@ class PenPath(Shape):
         new_path.is_closed = self.is_closed
         new_path._update_path()
         
-        # 直接复制画笔和画刷
-        new_path.pen = QPen(self.pen)
-        new_path.brush = QBrush(self.brush)
+        # 共享画笔和画刷
+        new_path.copy_style(self)
         
         # 复制变换属性
         new_path.position = QPointF(self.position)
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""吸附
+
+支持网格、端点、中点、中心和边界框吸附。图形上的候选吸附点保存在一组KD树中：
+    - 图形变化时，旧的点只做删除标记，新的点追加到末尾的缓冲区（查询时直接遍历）；
+    - 缓冲区满后建成一棵小KD树，大小相近的树再合并成更大的树，每个点被重建的次数是对数级的；
+    - 已删除的点超过一半时才整体压缩重建。
+需要同步哪些图形由变换存储中每行的版本号决定，鼠标每次移动的查询只访问KD树中很少的节点。
+"""
+
+from collections import namedtuple
+
+from PyQt5.QtCore import QPointF
+import numpy as np
+
+# 吸附点类型
+SNAP_ENDPOINT = 0  # 端点（直线端点、矩形角点、路径锚点等）
+SNAP_MIDPOINT = 1  # 中点（线段中点、矩形边中点）
+SNAP_CENTER = 2  # 中心
+SNAP_BOUNDS = 3  # 边界框的角点和边中点
+SNAP_GRID = 4  # 网格交点
+
+# 吸附模式名称 -> 吸附点类型
+SNAP_MODES = {
+    'endpoint': SNAP_ENDPOINT,
+    'midpoint': SNAP_MIDPOINT,
+    'center': SNAP_CENTER,
+    'bounds': SNAP_BOUNDS,
+    'grid': SNAP_GRID,
+}
+
+SnapResult = namedtuple('SnapResult', ['point', 'kind'])
+
+
+class _KDTree:
+    """二维点的静态KD树
+
+    不创建节点对象：构建时按中位数原地划分下标数组，节点 [lo, hi) 的左右子树为 [lo, mid) 和 [mid, hi)，
+    分割轴按深度交替，节点按堆的方式编号（子节点为 2i+1 和 2i+2），分割值保存在数组中。
+    """
+    LEAF_SIZE = 32
+
+    def __init__(self, points, start, end):
+        """为 points 中下标位于 [start, end) 的点建树"""
+        self.points = points
+        self.order = np.arange(start, end)
+        depth = max(0, int(np.ceil(np.log2(max(end - start, 1) / self.LEAF_SIZE))) + 1)
+        self.splits = np.empty(2 ** (depth + 1))
+        stack = [(0, end - start, 0, 0)]
+        while stack:
+            lo, hi, axis, node = stack.pop()
+            if hi - lo <= self.LEAF_SIZE:
+                continue
+            mid = (lo + hi) // 2
+            indices = self.order[lo:hi]
+            indices = indices[np.argpartition(self.points[indices, axis], mid - lo)]
+            self.order[lo:hi] = indices
+            self.splits[node] = self.points[indices[mid - lo], axis]
+            stack.append((lo, mid, 1 - axis, 2 * node + 1))
+            stack.append((mid, hi, 1 - axis, 2 * node + 2))
+
+    def nearest(self, x, y, max_d2, accept):
+        """查找距离平方不超过 max_d2 的最近点
+
+        参数:
+            accept: 接收点下标数组、返回布尔掩码的函数，用于跳过已删除或被排除的点
+        返回:
+            (点下标, 距离平方)，没有找到时下标为 -1
+        """
+        best = [max_d2, -1]
+        points, order, splits = self.points, self.order, self.splits
+
+        def search(lo, hi, axis, node):
+            if hi - lo <= self.LEAF_SIZE:
+                indices = order[lo:hi]
+                indices = indices[accept(indices)]
+                if len(indices):
+                    d2 = (points[indices, 0] - x) ** 2 + (points[indices, 1] - y) ** 2
+                    i = d2.argmin()
+                    if d2[i] <= best[0]:
+                        best[0], best[1] = d2[i], indices[i]
+                return
+            mid = (lo + hi) // 2
+            diff = (x, y)[axis] - splits[node]
+            if diff < 0:
+                search(lo, mid, 1 - axis, 2 * node + 1)
+                if diff * diff <= best[0]:
+                    search(mid, hi, 1 - axis, 2 * node + 2)
+            else:
+                search(mid, hi, 1 - axis, 2 * node + 2)
+                if diff * diff <= best[0]:
+                    search(lo, mid, 1 - axis, 2 * node + 1)
+
+        if len(order):
+            search(0, len(order), 0, 0)
+        return best[1], best[0]
+
+
+class SnapIndex:
+    """文档中所有图形吸附点的增量索引"""
+
+    # 缓冲区的最大点数，超过后建成KD树
+    BUFFER_SIZE = 2048
+
+    def __init__(self, store):
+        self.store = store
+        self._points = np.empty((0, 2))  # 点坐标，[0, 最后一棵树的末尾) 在KD树中，其余在缓冲区中
+        self._rows = np.empty(0, dtype=np.intp)  # 点所属的行
+        self._kinds = np.empty(0, dtype=np.int8)  # 点的类型
+        self._alive = np.empty(0, dtype=bool)  # False 表示已删除
+        self._size = 0  # 已使用的点数
+        self._dead = 0  # 已删除但未清理的点数
+        self._trees = []  # [(start, end, 树)]，按下标顺序排列，越早建成的越大
+
+        # 每行在点数组中的区间，以及同步时的版本
+        self._row_start = np.zeros(0, dtype=np.intp)
+        self._row_count = np.zeros(0, dtype=np.intp)
+        self._seen_versions = np.zeros(0, dtype=np.int64)
+        self._seen_geometry = np.zeros(0, dtype=np.int64)
+        self._seen_alive = np.zeros(0, dtype=bool)
+        self._seen_revision = -1
+
+    def _ensure_rows(self, count):
+        if len(self._row_start) >= count:
+            return
+        grow = count - len(self._row_start)
+        self._row_start = np.concatenate((self._row_start, np.zeros(grow, dtype=np.intp)))
+        self._row_count = np.concatenate((self._row_count, np.zeros(grow, dtype=np.intp)))
+        self._seen_versions = np.concatenate((self._seen_versions, np.zeros(grow, dtype=np.int64)))
+        self._seen_geometry = np.concatenate((self._seen_geometry, np.zeros(grow, dtype=np.int64)))
+        self._seen_alive = np.concatenate((self._seen_alive, np.zeros(grow, dtype=bool)))
+
+    def _reserve(self, extra):
+        """保证点数组还能容纳 extra 个点"""
+        needed = self._size + extra
+        if needed <= len(self._points):
+            return
+        capacity = max(needed, 2 * len(self._points), 256)
+        for name, shape, dtype in (('_points', (capacity, 2), np.float64), ('_rows', capacity, np.intp),
+                                   ('_kinds', capacity, np.int8), ('_alive', capacity, bool)):
+            column = np.zeros(shape, dtype=dtype)
+            old = getattr(self, name)
+            column[:len(old)] = old
+            setattr(self, name, column)
+        # KD树引用的是旧数组，需要指向新数组
+        for _, _, tree in self._trees:
+            tree.points = self._points
+
+    def sync(self, exclude=None):
+        """将变换存储中的变化同步到索引
+
+        参数:
+            exclude: 行的布尔掩码，其中的行暂不同步（例如正在拖动的图形，查询时本来就会排除）
+        """
+        store = self.store
+        if store.revision == self._seen_revision:
+            return
+        count = store.count
+        self._ensure_rows(count)
+        changed = ((store.versions[:count] != self._seen_versions[:count]) |
+                   (store.geometry_versions[:count] != self._seen_geometry[:count]) |
+                   (store.alive[:count] != self._seen_alive[:count]))
+        deferred = False
+        if exclude is not None:
+            deferred = bool((changed & exclude[:count]).any())
+            changed &= ~exclude[:count]
+        rows = np.nonzero(changed)[0]
+        if len(rows):
+            self._remove_rows(rows)
+            self._add_rows(rows[store.alive[rows]])
+            self._seen_versions[rows] = store.versions[rows]
+            self._seen_geometry[rows] = store.geometry_versions[rows]
+            self._seen_alive[rows] = store.alive[rows]
+            self._maybe_rebuild()
+        if not deferred:
+            self._seen_revision = store.revision
+
+    def _remove_rows(self, rows):
+        """标记行原有的点为已删除"""
+        counts = self._row_count[rows]
+        if not counts.sum():
+            return
+        indices = np.repeat(self._row_start[rows], counts) + _ranges(counts)
+        self._alive[indices] = False
+        self._dead += len(indices)
+        self._row_count[rows] = 0
+
+    def _add_rows(self, rows):
+        """计算行的吸附点并追加到缓冲区，每行的点连续存放"""
+        if not len(rows):
+            return
+        store = self.store
+        bounds = store.bounds_of(rows)
+        left, top, right, bottom = bounds.T
+        center_x, center_y = (left + right) / 2, (top + bottom) / 2
+        # 边界框的8个点和中心点
+        box = np.stack((
+            np.column_stack((left, top)), np.column_stack((center_x, top)),
+            np.column_stack((right, top)), np.column_stack((right, center_y)),
+            np.column_stack((right, bottom)), np.column_stack((center_x, bottom)),
+            np.column_stack((left, bottom)), np.column_stack((left, center_y)),
+            np.column_stack((center_x, center_y))), axis=1)
+        box_kinds = np.array([SNAP_BOUNDS] * 8 + [SNAP_CENTER], dtype=np.int8)
+
+        # 图形自身定义的吸附点（本地坐标，按几何版本缓存）
+        own = [store.shapes[row].snap_points() for row in rows]
+        own_counts = np.fromiter((len(points) for points, _ in own), dtype=np.intp, count=len(own))
+        counts = own_counts + len(box_kinds)
+        total = int(counts.sum())
+        self._reserve(total)
+
+        starts = self._size + np.concatenate(([0], np.cumsum(counts)[:-1]))
+        box_indices = (starts[:, None] + np.arange(len(box_kinds))).ravel()
+        self._points[box_indices] = box.reshape(-1, 2)
+        self._kinds[box_indices] = np.tile(box_kinds, len(rows))
+        if own_counts.sum():
+            own_rows = np.repeat(rows, own_counts)
+            own_indices = np.repeat(starts + len(box_kinds), own_counts) + _ranges(own_counts)
+            local = np.concatenate([points for points, _ in own])
+            self._points[own_indices] = store.map_points(own_rows, local)
+            self._kinds[own_indices] = np.concatenate([kinds for _, kinds in own])
+
+        span = slice(self._size, self._size + total)
+        self._rows[span] = np.repeat(rows, counts)
+        self._alive[span] = True
+        self._row_start[rows] = starts
+        self._row_count[rows] = counts
+        self._size += total
+
+    def _tree_end(self):
+        return self._trees[-1][1] if self._trees else 0
+
+    def _maybe_rebuild(self):
+        """已删除的点过多时压缩重建，缓冲区满时建树并合并大小相近的树"""
+        if self._dead > self._size // 2:
+            self.rebuild()
+            return
+        if self._size - self._tree_end() < self.BUFFER_SIZE:
+            return
+        start = self._tree_end()
+        # 新树不小于前一棵树时与其合并，两棵树的下标区间是相邻的
+        while self._trees and self._trees[-1][1] - self._trees[-1][0] <= self._size - start:
+            start = self._trees.pop()[0]
+        self._trees.append((start, self._size, _KDTree(self._points, start, self._size)))
+
+    def rebuild(self):
+        """清理已删除的点并重建为一棵KD树"""
+        size = self._size
+        keep = np.nonzero(self._alive[:size])[0]
+        # 删除的点之前的存活点数即为新下标
+        new_index = np.cumsum(self._alive[:size]) - 1
+        rows = np.nonzero(self._row_count)[0]
+        self._row_start[rows] = new_index[self._row_start[rows]]
+
+        for name in ('_points', '_rows', '_kinds', '_alive'):
+            column = getattr(self, name)
+            column[:len(keep)] = column[keep]
+        self._size = len(keep)
+        self._dead = 0
+        self._trees = [(0, self._size, _KDTree(self._points, 0, self._size))] if self._size else []
+
+    def nearest(self, x, y, radius, kinds, exclude=None):
+        """查找最近的吸附点
+
+        参数:
+            kinds: 按类型索引的布尔数组，表示启用的吸附点类型
+            exclude: 行的布尔掩码，这些行的点不参与吸附
+        返回:
+            (x, y, 类型)，没有找到时返回 None
+        """
+        def accept(indices):
+            mask = self._alive[indices] & kinds[self._kinds[indices]]
+            if exclude is not None:
+                mask &= ~exclude[self._rows[indices]]
+            return mask
+
+        best, best_d2 = -1, radius * radius
+        for _, _, tree in self._trees:
+            index, d2 = tree.nearest(x, y, best_d2, accept)
+            if index >= 0:
+                best, best_d2 = index, d2
+
+        # 缓冲区中的点直接遍历
+        if self._size > self._tree_end():
+            indices = np.arange(self._tree_end(), self._size)
+            indices = indices[accept(indices)]
+            if len(indices):
+                d2 = (self._points[indices, 0] - x) ** 2 + (self._points[indices, 1] - y) ** 2
+                i = d2.argmin()
+                if d2[i] <= best_d2:
+                    best = indices[i]
+        if best < 0:
+            return None
+        px, py = self._points[best]
+        return px, py, int(self._kinds[best])
+
+
+def _ranges(counts):
+    """将 [3, 2] 展开为 [0, 1, 2, 0, 1]"""
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1]) - np.repeat(ends - counts, counts)
+
+
+class Snapper:
+    """吸附服务
+
+    tolerance 为场景坐标中的吸附距离（画布根据缩放比例设置），grid_size 为 None 时不吸附网格。
+    对象吸附点优先于网格。
+    """
+    def __init__(self, document):
+        self.document = document
+        self.index = SnapIndex(document.transforms)
+        self.enabled = True
+        self.modes = set(SNAP_MODES)  # 启用的吸附模式
+        self.tolerance = 8.0
+        self.grid_size = None
+        self.last_result = None  # 最近一次吸附的结果，用于绘制指示器
+
+    def set_mode(self, mode, enabled):
+        """启用或禁用某种吸附模式"""
+        if enabled:
+            self.modes.add(mode)
+        else:
+            self.modes.discard(mode)
+
+    def _kind_mask(self):
+        mask = np.zeros(len(SNAP_MODES), dtype=bool)
+        for mode in self.modes:
+            mask[SNAP_MODES[mode]] = True
+        return mask
+
+    def _exclude_mask(self, rows):
+        if rows is None or not len(rows):
+            return None
+        mask = np.zeros(self.document.transforms.count, dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def _find(self, x, y, kinds, exclude):
+        """查找 (x, y) 附近的吸附点，返回 (x, y, 类型) 或 None"""
+        if kinds[:SNAP_GRID].any():
+            found = self.index.nearest(x, y, self.tolerance, kinds, exclude)
+            if found is not None:
+                return found
+        if kinds[SNAP_GRID] and self.grid_size:
+            gx = round(x / self.grid_size) * self.grid_size
+            gy = round(y / self.grid_size) * self.grid_size
+            if (gx - x) ** 2 + (gy - y) ** 2 <= self.tolerance ** 2:
+                return gx, gy, SNAP_GRID
+        return None
+
+    def snap(self, point, exclude_rows=None):
+        """吸附单个点
+
+        参数:
+            point: 场景坐标
+            exclude_rows: 不参与吸附的图形的行号（如正在移动的图形）
+        返回:
+            SnapResult，没有可吸附的点时返回 None
+        """
+        self.last_result = None
+        if not self.enabled or not self.modes:
+            return None
+        exclude = self._exclude_mask(exclude_rows)
+        self.index.sync(exclude)
+        found = self._find(point.x(), point.y(), self._kind_mask(), exclude)
+        if found is not None:
+            self.last_result = SnapResult(QPointF(found[0], found[1]), found[2])
+        return self.last_result
+
+    def snap_point(self, point):
+        """吸附单个点，返回吸附后的点（无吸附时为原点）"""
+        result = self.snap(point)
+        return QPointF(result.point) if result else point
+
+    def snap_offset(self, points, exclude_rows=None):
+        """为一组参考点（如被拖动图形的边界框角点）寻找最近的吸附
+
+        返回:
+            需要追加的偏移 QPointF，没有可吸附的点时为 (0, 0)
+        """
+        self.last_result = None
+        if not self.enabled or not self.modes:
+            return QPointF()
+        exclude = self._exclude_mask(exclude_rows)
+        self.index.sync(exclude)
+        kinds = self._kind_mask()
+        best = None
+        for point in points:
+            found = self._find(point.x(), point.y(), kinds, exclude)
+            if found is None:
+                continue
+            offset = QPointF(found[0] - point.x(), found[1] - point.y())
+            distance = offset.x() ** 2 + offset.y() ** 2
+            if best is None or distance < best[0]:
+                best = (distance, offset, SnapResult(QPointF(found[0], found[1]), found[2]))
+        if best is None:
+            return QPointF()
+        self.last_result = best[2]
+        return best[1]
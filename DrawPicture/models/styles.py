@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""共享样式表
+
+图形不再各自持有QPen/QBrush，而是通过整数编号引用样式表中的共享条目。
+相同的画笔/画刷只保存一份；复制图形、记录撤销状态时只需复制编号。
+
+样式表中的QPen/QBrush对象被所有引用它的图形共享，取出后不能原地修改，
+需要修改时应复制一份再重新设置到图形上。
+
+命名样式是可替换的条目：重新定义同名样式只替换该条目的内容，
+所有引用它的图形立即使用新样式，耗时与引用数量无关。加载文件时只有当前会话中
+尚未定义的命名样式才会被定义；已定义但内容不同的同名样式按匿名条目恢复，
+不会改变当前会话中引用该名称的图形和撤销记录。
+
+样式表在整个进程中只增不减：编号被图形、撤销记录和剪贴板等处共享，无法安全地回收。
+每个不同的画笔/画刷（而不是每次编辑）占用一个条目，约几百字节，重复使用的样式不会新增条目，
+因此样式表的大小取决于会话中出现过的不同样式数量，可通过 StyleTable.stats() 查看。
+"""
+
+from PyQt5.QtCore import Qt, QByteArray, QDataStream, QIODevice
+from PyQt5.QtGui import QPen, QBrush, QColor
+
+# 固定序列化版本，保证同一样式在不同会话中得到相同的键
+_STREAM_VERSION = QDataStream.Qt_5_12
+
+
+def _serialize(value):
+    """将QPen/QBrush完整序列化为字节串（包含渐变、线帽等全部属性）"""
+    data = QByteArray()
+    stream = QDataStream(data, QIODevice.WriteOnly)
+    stream.setVersion(_STREAM_VERSION)
+    stream << value
+    return bytes(data)
+
+
+def _deserialize(key, value):
+    """从字节串恢复QPen/QBrush，value 为用于接收结果的空对象"""
+    # QDataStream只保存缓冲区指针，需要保持data的引用
+    data = QByteArray(key)
+    stream = QDataStream(data, QIODevice.ReadOnly)
+    stream.setVersion(_STREAM_VERSION)
+    stream >> value
+    return value
+
+
+class _StylePool:
+    """单一类型（画笔或画刷）的样式池"""
+    def __init__(self, factory):
+        self._factory = factory  # 用于反序列化的空对象构造函数
+        self.values = []  # 编号 -> QPen/QBrush
+        self.keys = []  # 编号 -> 序列化字节串
+        self._ids = {}  # 字节串 -> 编号（只包含匿名条目）
+        self._simple_ids = {}  # (颜色, 宽度, 线型) -> 编号，避免重复序列化
+        self.names = {}  # 名称 -> 编号
+        self._slot_names = {}  # 编号 -> 名称
+
+    def _append(self, key, value):
+        self.values.append(value)
+        self.keys.append(key)
+        return len(self.values) - 1
+
+    def intern(self, value):
+        """获取与 value 相同的匿名条目编号，不存在时添加"""
+        key = _serialize(value)
+        style_id = self._ids.get(key)
+        if style_id is None:
+            style_id = self._ids[key] = self._append(key, self._factory(value))
+        return style_id
+
+    def intern_key(self, key):
+        """按序列化字节串获取匿名条目编号（用于反序列化）"""
+        style_id = self._ids.get(key)
+        if style_id is None:
+            value = _deserialize(key, self._factory())
+            style_id = self._ids[key] = self._append(key, value)
+        return style_id
+
+    def intern_simple(self, simple_key, build):
+        """按简单属性元组获取条目编号，build 用于在未命中时构造样式"""
+        style_id = self._simple_ids.get(simple_key)
+        if style_id is None:
+            style_id = self._simple_ids[simple_key] = self.intern(build())
+        return style_id
+
+    def define(self, name, value):
+        """定义或替换命名条目，返回其编号"""
+        style_id = self.names.get(name)
+        if style_id is None:
+            style_id = self.names[name] = self._append(_serialize(value), self._factory(value))
+            self._slot_names[style_id] = name
+        else:
+            # 原地替换条目，所有引用该编号的图形都会使用新样式
+            self.values[style_id] = self._factory(value)
+            self.keys[style_id] = _serialize(value)
+        return style_id
+
+    def from_state(self, key, name):
+        """由序列化数据恢复条目编号
+
+        命名条目未定义时按保存的内容定义；已定义且内容相同时沿用；
+        内容不同时按匿名条目恢复，不修改当前会话中的命名条目。
+        """
+        if name is None:
+            return self.intern_key(key)
+        style_id = self.names.get(name)
+        if style_id is None:
+            return self.define(name, _deserialize(key, self._factory()))
+        if self.keys[style_id] != key:
+            return self.intern_key(key)
+        return style_id
+
+    def name_of(self, style_id):
+        """获取条目的名称，匿名条目返回 None"""
+        return self._slot_names.get(style_id)
+
+
+class StyleTable:
+    """画笔和画刷的共享样式表"""
+    def __init__(self):
+        self._pens = _StylePool(QPen)
+        self._brushes = _StylePool(QBrush)
+        self._flat_pens = {}  # 编号 -> (原画笔, 去掉渐变的画笔)
+        self._flat_brushes = {}  # 编号 -> (原画刷, 去掉渐变的画刷)
+
+    # 画笔
+    def pen(self, pen_id):
+        """获取共享画笔（只读）"""
+        return self._pens.values[pen_id]
+
+    def intern_pen(self, pen):
+        """获取画笔的编号"""
+        return self._pens.intern(pen)
+
+    def simple_pen_id(self, color, width, style):
+        """获取由颜色、线宽、线型构成的普通画笔的编号"""
+        return self._pens.intern_simple(
+            (QColor(color).rgba(), width, int(style)),
+            lambda: QPen(QColor(color), width, style))
+
+    def define_pen(self, name, pen):
+        """定义或修改命名画笔，引用它的图形立即更新"""
+        return self._pens.define(name, pen)
+
+    def named_pen_id(self, name):
+        """获取命名画笔的编号，不存在时返回 None"""
+        return self._pens.names.get(name)
+
+    # 画刷
+    def brush(self, brush_id):
+        """获取共享画刷（只读）"""
+        return self._brushes.values[brush_id]
+
+    def intern_brush(self, brush):
+        """获取画刷的编号"""
+        return self._brushes.intern(brush)
+
+    def simple_brush_id(self, color):
+        """获取纯色画刷的编号，color 为 None 时为透明画刷"""
+        if color is None:
+            return self._brushes.intern_simple(None, lambda: QBrush(Qt.transparent))
+        return self._brushes.intern_simple(QColor(color).rgba(), lambda: QBrush(QColor(color)))
+
+    def define_brush(self, name, brush):
+        """定义或修改命名画刷，引用它的图形立即更新"""
+        return self._brushes.define(name, brush)
+
+    def named_brush_id(self, name):
+        """获取命名画刷的编号，不存在时返回 None"""
+        return self._brushes.names.get(name)
+
+    # 草稿渲染
+    def flat_pen(self, pen_id):
+        """获取去掉渐变的画笔（只读），渐变以各渐变色的平均色代替"""
+        pen = self._pens.values[pen_id]
+        cached = self._flat_pens.get(pen_id)
+        # 命名画笔重新定义后条目对象会被替换
+        if cached is None or cached[0] is not pen:
+            flat = pen
+            if pen.brush().gradient() is not None:
+                flat = QPen(pen)
+                flat.setBrush(_flat_brush(pen.brush()))
+            cached = self._flat_pens[pen_id] = (pen, flat)
+        return cached[1]
+
+    def flat_brush(self, brush_id):
+        """获取去掉渐变的画刷（只读），渐变以各渐变色的平均色代替"""
+        brush = self._brushes.values[brush_id]
+        cached = self._flat_brushes.get(brush_id)
+        if cached is None or cached[0] is not brush:
+            cached = self._flat_brushes[brush_id] = (brush, _flat_brush(brush))
+        return cached[1]
+
+    # 序列化
+    def pen_state(self, pen_id):
+        """获取画笔的序列化数据 (字节串, 名称)
+
+        同一条目总是返回同一个字节串对象，pickle 会对其去重，
+        因此共享同一样式的大量图形在文件中只保存一份样式数据。
+        """
+        return self._pens.keys[pen_id], self._pens.name_of(pen_id)
+
+    def brush_state(self, brush_id):
+        """获取画刷的序列化数据 (字节串, 名称)"""
+        return self._brushes.keys[brush_id], self._brushes.name_of(brush_id)
+
+    def pen_from_state(self, key, name=None):
+        """由序列化数据恢复画笔编号"""
+        return self._pens.from_state(key, name)
+
+    def brush_from_state(self, key, name=None):
+        """由序列化数据恢复画刷编号"""
+        return self._brushes.from_state(key, name)
+
+    def stats(self):
+        """获取样式表中的条目数量"""
+        return {'pens': len(self._pens.values), 'brushes': len(self._brushes.values)}
+
+
+def _flat_brush(brush):
+    """将渐变画刷转换为平均色的纯色画刷，其他画刷原样返回"""
+    gradient = brush.gradient()
+    if gradient is None:
+        return brush
+    colors = [color for _, color in gradient.stops()] or [QColor(Qt.black)]
+    return QBrush(QColor(sum(color.red() for color in colors) // len(colors),
+                         sum(color.green() for color in colors) // len(colors),
+                         sum(color.blue() for color in colors) // len(colors),
+                         sum(color.alpha() for color in colors) // len(colors)))
+
+
+# 全局共享样式表
+_table = StyleTable()
+
+
+def style_table():
+    """获取全局共享样式表"""
+    return _table
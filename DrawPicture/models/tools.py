@@ -1,12 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from PyQt5.QtCore import Qt, QRectF, QPointF, QPoint, QTime
+from PyQt5.QtCore import Qt, QRectF, QPointF, QPoint
 from PyQt5.QtGui import (QPen, QBrush, QColor, QCursor, QPixmap, QPainterPath, QPainter,
-                       QLinearGradient, QRadialGradient, QGradient, QTransform)
+                       QLinearGradient, QRadialGradient, QGradient, QTransform, QPolygonF)
 from PyQt5.QtWidgets import QApplication
 import math
 
+import numpy as np
+
 from DrawPicture.models.shapes import (Line, Rectangle, Circle, ArchimedeanSpiral, 
                                      SineCurve, Freehand, MandelbrotSet, JuliaSet, 
                                      SuperEllipse, ParametricCurve, Gear, Leaf, Cloud,
@@ -30,6 +32,7 @@ class ToolType:
     LEAF = "树叶"
     CLOUD = "云朵"
     PEN = "钢笔"
+    LASSO = "套索"
 
 class DrawingTool:
     """绘图工具基类"""
@@ -41,6 +44,11 @@ class DrawingTool:
         self.cursor = QCursor(Qt.ArrowCursor)
         self.name = "工具"
         self.color_tool = None  # 添加颜色工具引用
+        self.selection_outline = None  # 框选/套索的轮廓（场景坐标的QRectF或QPolygonF）
+        self.selection_preview = None  # 预览中将被选中的图形在变换存储中的行号
+        self.selection_crossing = False  # 是否选择与轮廓相交的图形（否则只选择完全包含的图形）
+        self.snapper = None  # 吸附服务（由画布设置）
+        self.snapping = False  # 画布是否对传给该工具的鼠标位置应用吸附
         
     def set_color_tool(self, color_tool):
         """设置颜色工具"""
@@ -61,7 +69,33 @@ class DrawingTool:
     def get_cursor(self):
         """获取工具的光标"""
         return self.cursor
-        
+
+    def damage_rect(self):
+        """获取工具临时绘制的内容（正在创建的图形、框选轮廓和预览）在场景中覆盖的区域
+
+        画布在处理鼠标事件前后各取一次，只重绘这两个区域。
+        """
+        rect = QRectF()
+        if self.current_shape is not None:
+            rect = rect.united(self.current_shape.scene_bounds())
+        if self.selection_outline is not None:
+            rect = rect.united(self.selection_outline.boundingRect()
+                               if isinstance(self.selection_outline, QPolygonF)
+                               else self.selection_outline.normalized())
+        if self.selection_preview is not None and len(self.selection_preview):
+            rect = rect.united(self.document.transforms.union_bounds(self.selection_preview))
+        return rect
+
+    def gesture_shapes(self):
+        """获取正在进行的拖动或绘制手势中会变化的文档图形
+
+        返回 None 表示当前没有手势。手势期间画布将其余图形冻结为缓存的位图，
+        每帧只在位图上绘制这些图形和工具的临时内容。
+        """
+        if self.is_drawing and self.current_shape is not None and self.current_shape._store is None:
+            return []
+        return None
+
     def apply_current_style(self, shape):
         """应用当前样式到图形"""
         if self.color_tool:
@@ -72,6 +106,24 @@ class DrawingTool:
             shape.set_brush(brush)
 
 
+# 多选时合并选择框相对图形边界的外扩距离
+SELECTION_BOX_MARGIN = 10
+
+
+def selection_handle_positions(rect):
+    """获取选择框8个控制点的位置，顺序为从左上角开始顺时针"""
+    return [
+        QPointF(rect.left(), rect.top()),                # 0 左上
+        QPointF(rect.center().x(), rect.top()),          # 1 上中
+        QPointF(rect.right(), rect.top()),               # 2 右上
+        QPointF(rect.right(), rect.center().y()),        # 3 右中
+        QPointF(rect.right(), rect.bottom()),            # 4 右下
+        QPointF(rect.center().x(), rect.bottom()),       # 5 下中
+        QPointF(rect.left(), rect.bottom()),             # 6 左下
+        QPointF(rect.left(), rect.center().y()),         # 7 左中
+    ]
+
+
 class SelectionTool(DrawingTool):
     """选择工具"""
     def __init__(self, document):
@@ -91,13 +143,28 @@ class SelectionTool(DrawingTool):
         self.transform_center = None  # 变换中心点
         self.initial_angle = None  # 初始旋转角度
         
+        # 多选合并选择框的变换状态
+        self.group_handle = None  # 拖动的控制点的初始位置
+        self.group_angle = 0.0  # 本次拖动已应用的旋转角度
+        self.group_scale = (1.0, 1.0)  # 本次拖动已应用的缩放因子
+        self.group_grab = QPointF(0, 0)  # 按下位置相对所拖动控制点（不含外扩）的偏移
+        self.group_uniform = False  # 选中了旋转过的图形时只能等比缩放
+        
+        # 移动时的吸附状态
+        self.move_bounds = None  # 开始移动时选区的边界
+        self.move_rows = None  # 被移动图形的行号，吸附时排除
+        self.applied_delta = QPointF(0, 0)  # 已应用的总位移
+        
+        # 框选：从左向右拖动只选择完全位于框内的图形，从右向左拖动选择与框相交的图形
+        self.marquee_start = None  # 框选起点
+        
     def get_handle_at_point(self, point):
         """获取指定点的手柄类型和索引"""
         if not self.document.selected_shapes:
             return None, -1
             
-        if len(self.document.selected_shapes) != 1:
-            return None, -1
+        if len(self.document.selected_shapes) > 1:
+            return self._get_group_handle_at_point(point)
             
         shape = self.document.selected_shapes[0]
         rect = shape._get_global_bounds()
@@ -176,6 +243,32 @@ class SelectionTool(DrawingTool):
         self.cursor = QCursor(Qt.ArrowCursor)
         return None, -1
         
+    def _get_group_handle_at_point(self, point):
+        """获取多选合并选择框上指定点的手柄类型和索引"""
+        rect = self.document.selection_bounds(SELECTION_BOX_MARGIN)
+        half_handle = 4
+        
+        # 旋转手柄位于选择框顶部中心上方
+        rotation_handle = QPointF(rect.center().x(), rect.top() - 20)
+        if QRectF(rotation_handle.x() - 6, rotation_handle.y() - 6, 12, 12).contains(point):
+            self.cursor = QCursor(Qt.CrossCursor)
+            return 'rotate', -1
+            
+        cursor_types = [Qt.SizeFDiagCursor, Qt.SizeVerCursor, Qt.SizeBDiagCursor, Qt.SizeHorCursor,
+                        Qt.SizeFDiagCursor, Qt.SizeVerCursor, Qt.SizeBDiagCursor, Qt.SizeHorCursor]
+        for i, pos in enumerate(selection_handle_positions(rect)):
+            handle_rect = QRectF(pos.x() - half_handle, pos.y() - half_handle, 8, 8)
+            if handle_rect.contains(point):
+                self.cursor = QCursor(cursor_types[i])
+                return 'scale', i
+                
+        if rect.contains(point):
+            self.cursor = QCursor(Qt.SizeAllCursor)
+            return 'move', -1
+            
+        self.cursor = QCursor(Qt.ArrowCursor)
+        return None, -1
+        
     def _get_rotated_cursor(self, cursor_shape, angle):
         """根据旋转角度获取适当的光标形状"""
         # 光标基本形状列表（按45度角递增排列）
@@ -221,6 +314,14 @@ class SelectionTool(DrawingTool):
         
         return cursor_shapes[cursor_idx]
         
+    def gesture_shapes(self):
+        """框选时图形不变，移动、旋转、缩放时选中的图形会变化"""
+        if self.handle_type == 'marquee':
+            return []
+        if self.handle_type is not None and self.drag_start is not None:
+            return self.document.selected_shapes
+        return None
+        
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
             point = event.pos()
@@ -238,6 +339,9 @@ class SelectionTool(DrawingTool):
                 if handle_type == 'rotate':
                     # 计算初始角度
                     self.initial_angle = self._calculate_angle(point)
+                    
+                if handle_type != 'move' and len(self.document.selected_shapes) > 1:
+                    self._begin_group_transform(handle_type, handle_index, point)
                 return
             
             # 获取点击位置的图形
@@ -253,16 +357,25 @@ class SelectionTool(DrawingTool):
                 multi_select = event.modifiers() & Qt.ShiftModifier
                 if shape:
                     self.document.select_shape(shape, multi_select)
+                    self.handle_type = 'move'
                 else:
-                    self.document.deselect_all()
+                    # 在空白处按下开始框选，按住Shift时添加到已有选择
+                    if not multi_select:
+                        self.document.deselect_all()
+                    self.marquee_start = point
+                    self.handle_type = 'marquee'
                 
                 self.drag_start = point
                 self.drag_shape = shape
-                self.handle_type = 'move'
         
     def mouse_move(self, event):
         current_pos = event.pos()
         
+        if self.handle_type == 'marquee':
+            if event.buttons() & Qt.LeftButton:
+                self._update_marquee(current_pos)
+            return
+            
         if not self.document.selected_shapes:
             return
             
@@ -275,7 +388,13 @@ class SelectionTool(DrawingTool):
             
         # 如果正在拖动
         if self.drag_start is not None:
-            if self.handle_type == 'rotate':
+            if self.group_handle is not None:
+                # 多选时整体旋转或缩放
+                if self.handle_type == 'rotate':
+                    self._handle_group_rotate(current_pos)
+                else:
+                    self._handle_group_scale(current_pos)
+            elif self.handle_type == 'rotate':
                 self._handle_rotate(current_pos)
             elif self.handle_type == 'scale':
                 self._handle_scale(current_pos)
@@ -286,10 +405,10 @@ class SelectionTool(DrawingTool):
                                    (current_pos.y() - self.last_position.y()) ** 2) ** 0.5
                     if move_distance > self.click_threshold:
                         self.moving = True
+                        self._begin_move()
                 
                 if self.moving:
-                    delta = QPointF(current_pos - self.last_position)
-                    self.document.move_selected_shapes(delta)
+                    self._handle_move(current_pos)
                     
             # 更新上一次位置
             self.last_position = current_pos
@@ -503,6 +622,110 @@ class SelectionTool(DrawingTool):
         # 更新起始位置
         self.drag_start = current_pos
         
+    def _begin_move(self):
+        """开始移动选中的图形，记录吸附所需的初始边界"""
+        self.move_bounds = self.document.selection_bounds()
+        self.move_rows = self.document.transforms.rows_of(self.document.selected_shapes)
+        self.applied_delta = QPointF(0, 0)
+        
+    def _handle_move(self, current_pos):
+        """移动选中的图形，选区边界框的角点、边中点和中心会吸附到其他图形上"""
+        offset = QPointF(current_pos - self.drag_start)
+        if self.snapper and not QApplication.keyboardModifiers() & Qt.AltModifier:
+            moved = self.move_bounds.translated(offset)
+            points = selection_handle_positions(moved) + [moved.center()]
+            offset += self.snapper.snap_offset(points, self.move_rows)
+            
+        delta = offset - self.applied_delta
+        if not delta.isNull():
+            self.document.move_selected_shapes(delta)
+            self.applied_delta = offset
+        
+    def _update_marquee(self, current_pos):
+        """更新框选矩形和预览"""
+        rect = QRectF(self.marquee_start, current_pos).normalized()
+        self.selection_crossing = current_pos.x() < self.marquee_start.x()
+        self.selection_outline = rect
+        # 每次移动只做一次空间索引查询，不逐个调用图形的contains
+        self.selection_preview = self.document.rows_in_rect(rect, not self.selection_crossing)
+        
+    def _begin_group_transform(self, handle_type, handle_index, point):
+        """开始对多个选中图形整体旋转或缩放
+        
+        拖动开始时只记录一次撤销状态，之后每次鼠标移动只对列式存储做一次批量变换。
+        旋转以合并选择框中心为中心，缩放以图形合并边界（不含选择框的外扩）上
+        所拖动控制点的对角点为中心，使对边保持不动。
+        
+        图形的缩放沿自身坐标轴，旋转过的图形无法沿场景坐标轴非等比缩放，
+        因此选中了旋转过的图形时只允许等比缩放。
+        """
+        self.document.record_state()
+        
+        if handle_type == 'rotate':
+            self.transform_center = self.document.selection_bounds(SELECTION_BOX_MARGIN).center()
+            self.initial_angle = self._calculate_angle(point)
+            self.group_handle = point
+        else:
+            positions = selection_handle_positions(self.document.selection_bounds())
+            self.transform_center = positions[(handle_index + 4) % 8]
+            self.group_handle = positions[handle_index]
+            self.group_grab = point - self.group_handle
+            rows = self.document.transforms.rows_of(self.document.selected_shapes)
+            self.group_uniform = bool(np.any(self.document.transforms.rotations[rows] % 360))
+        self.group_angle = 0.0
+        self.group_scale = (1.0, 1.0)
+        
+    def _handle_group_rotate(self, current_pos):
+        """整体旋转选中的图形"""
+        angle = self._calculate_angle(current_pos) - self.initial_angle
+        
+        # 如果按住Shift键，将角度吸附到15度的倍数
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            angle = round(angle / 15.0) * 15.0
+            
+        # 只应用相对上一次的增量，角度差规范到[-180, 180)
+        delta = (angle - self.group_angle + 180) % 360 - 180
+        if delta:
+            self.document.rotate_selected_shapes(delta, self.transform_center)
+        self.group_angle = angle
+        
+    def _handle_group_scale(self, current_pos):
+        """整体缩放选中的图形"""
+        anchor = self.transform_center
+        handle_index = self.handle_index
+        current_pos = current_pos - self.group_grab
+        
+        # 根据控制点相对对角点的位置变化计算总缩放因子，中点手柄只缩放一个方向
+        scale_x = scale_y = 1.0
+        width = self.group_handle.x() - anchor.x()
+        height = self.group_handle.y() - anchor.y()
+        if handle_index not in (1, 5) and width:
+            scale_x = (current_pos.x() - anchor.x()) / width
+        if handle_index not in (3, 7) and height:
+            scale_y = (current_pos.y() - anchor.y()) / height
+            
+        # 如果按下Shift键，角落手柄保持宽高比
+        if handle_index in (0, 2, 4, 6) and QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            max_scale = max(abs(scale_x), abs(scale_y))
+            scale_x = math.copysign(max_scale, scale_x)
+            scale_y = math.copysign(max_scale, scale_y)
+            
+        # 包含旋转过的图形时取变化较大的方向等比缩放（中点手柄也同时缩放两个方向）
+        if self.group_uniform:
+            scale_x = scale_y = scale_x if abs(scale_x - 1) >= abs(scale_y - 1) else scale_y
+            
+        # 防止缩放为零
+        if abs(scale_x) < 0.05:
+            scale_x = math.copysign(0.05, scale_x)
+        if abs(scale_y) < 0.05:
+            scale_y = math.copysign(0.05, scale_y)
+            
+        # 只应用相对上一次的增量
+        applied_x, applied_y = self.group_scale
+        if (scale_x, scale_y) != (applied_x, applied_y):
+            self.document.scale_selected_shapes(scale_x / applied_x, anchor, scale_y / applied_y)
+        self.group_scale = (scale_x, scale_y)
+        
     def _calculate_angle(self, point):
         """计算点相对于变换中心的角度"""
         if not self.transform_center:
@@ -536,7 +759,11 @@ class SelectionTool(DrawingTool):
     def mouse_release(self, event):
         if event.button() == Qt.LeftButton:
             # 如果进行了变换操作，记录状态
-            if self.handle_type in ['scale', 'rotate'] and self.original_shape_data:
+            if self.handle_type == 'marquee':
+                if self.selection_preview is not None:
+                    shapes = self.document.transforms.shapes
+                    self.document.select_shapes([shapes[row] for row in self.selection_preview], True)
+            elif self.handle_type in ['scale', 'rotate'] and self.original_shape_data:
                 # 记录状态已经在操作过程中完成，这里无需重复
                 pass
             elif self.moving:
@@ -553,17 +780,64 @@ class SelectionTool(DrawingTool):
             self.original_shape_data = None
             self.transform_center = None
             self.initial_angle = None
+            self.group_handle = None
+            self.marquee_start = None
+            self.selection_outline = None
+            self.selection_preview = None
             
             # 强制更新视图，确保选择框与图形匹配
             self.document.document_changed.emit()
 
 
+class LassoTool(DrawingTool):
+    """套索选择工具，选择完全位于手绘区域内的图形"""
+    def __init__(self, document):
+        super().__init__(document)
+        self.name = "套索"
+        self.cursor = QCursor(Qt.CrossCursor)
+        self.lasso_points = []  # 套索轮廓上的点（场景坐标）
+        self.min_distance = 2  # 相邻轮廓点的最小距离，过密的点只会增加计算量
+        
+    def mouse_press(self, event):
+        if event.button() == Qt.LeftButton:
+            # 按住Shift时添加到已有选择
+            if not event.modifiers() & Qt.ShiftModifier:
+                self.document.deselect_all()
+            self.lasso_points = [event.pos()]
+            self.selection_outline = QPolygonF(self.lasso_points)
+            
+    def gesture_shapes(self):
+        """绘制套索时图形不变"""
+        return [] if self.lasso_points else None
+        
+    def mouse_move(self, event):
+        if not self.lasso_points or not event.buttons() & Qt.LeftButton:
+            return
+        point = event.pos()
+        last = self.lasso_points[-1]
+        if math.hypot(point.x() - last.x(), point.y() - last.y()) >= self.min_distance:
+            self.lasso_points.append(point)
+            self.selection_outline.append(point)
+            
+    def mouse_release(self, event):
+        if event.button() == Qt.LeftButton and self.lasso_points:
+            if len(self.lasso_points) >= 3:
+                polygon = np.array([(point.x(), point.y()) for point in self.lasso_points])
+                rows = self.document.rows_in_polygon(polygon)
+                shapes = self.document.transforms.shapes
+                self.document.select_shapes([shapes[row] for row in rows], True)
+            self.lasso_points = []
+            self.selection_outline = None
+            self.document.document_changed.emit()
+
+
 class LineTool(DrawingTool):
     """直线工具"""
     def __init__(self, document):
         super().__init__(document)
         self.name = "直线"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -598,6 +872,7 @@ class RectangleTool(DrawingTool):
         super().__init__(document)
         self.name = "矩形"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -635,6 +910,7 @@ class CircleTool(DrawingTool):
         super().__init__(document)
         self.name = "圆形"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -697,6 +973,7 @@ class SpiralTool(DrawingTool):
         super().__init__(document)
         self.name = "螺线"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -733,6 +1010,7 @@ class SineCurveTool(DrawingTool):
         super().__init__(document)
         self.name = "正弦曲线"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -1222,6 +1500,7 @@ class SuperEllipseTool(DrawingTool):
         super().__init__(document)
         self.name = "超椭圆"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -1258,6 +1537,7 @@ class ParametricCurveTool(DrawingTool):
             "butterfly": "蝴蝶线"
         }[curve_type]
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -1289,6 +1569,7 @@ class GearTool(DrawingTool):
         super().__init__(document)
         self.name = "齿轮"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -1325,6 +1606,7 @@ class LeafTool(DrawingTool):
         super().__init__(document)
         self.name = "树叶"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -1360,6 +1642,7 @@ class CloudTool(DrawingTool):
         super().__init__(document)
         self.name = "云朵"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
@@ -1404,16 +1687,24 @@ class PenTool(DrawingTool):
         super().__init__(document)
         self.name = "钢笔"
         self.cursor = QCursor(Qt.CrossCursor)
+        self.snapping = True
         self.current_path = None
         self.last_point = None
         self.preview_line = None  # 用于预览下一条线段
         self.last_click_time = 0  # 记录上次点击时间
         self.double_click_interval = 400  # 双击时间间隔（毫秒）
         
+    def gesture_shapes(self):
+        """绘制路径期间只有当前路径会变化"""
+        if self.is_drawing and self.current_path is not None:
+            return [self.current_path]
+        return None
+        
     def mouse_press(self, event):
         if event.button() == Qt.LeftButton:
             current_pos = event.pos()
-            current_time = QTime.currentTime().msecsSinceStartOfDay()
+            # 使用事件的时间戳，回放录制的输入时双击判断与录制时一致
+            current_time = event.timestamp()
             
             # 检查是否是双击（与上次点击时间间隔小于阈值）
             if self.current_path and (current_time - self.last_click_time < self.double_click_interval):
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""图形变换的列式存储和空间索引
+
+文档中每个图形占用存储中的一行：位置、旋转、缩放分别保存在numpy数组中，
+图形的 position/rotation/scale_x/scale_y 属性直接读写对应的行。
+对整个选区的移动、旋转、缩放因此只是一次数组运算，不需要逐个图形修改属性。
+
+每行还保存本地边界和世界坐标下的轴对齐边界（AABB），变换或几何变化后
+只做标记，查询前批量刷新，作为区域查询、点选和裁剪使用的空间索引。
+开启损坏跟踪后，被修改的行会记录修改前的边界，画布据此只重绘变化的区域。
+"""
+
+import itertools
+
+from PyQt5.QtCore import QPointF, QRectF
+import numpy as np
+
+# 全局递增的版本号，图形据此判断缓存的变换和边界是否过期
+_version_counter = itertools.count(1)
+
+
+def next_version():
+    """获取新的版本号"""
+    return next(_version_counter)
+
+
+class TransformStore:
+    """图形变换的列式存储"""
+
+    # 列定义：(属性名, 每行元素数, 初始值, 类型)，元素数为 0 表示一维
+    _COLUMNS = (
+        ('positions', 2, 0.0, np.float64),
+        ('rotations', 0, 0.0, np.float64),
+        ('scales', 2, 1.0, np.float64),
+        ('versions', 0, 0, np.int64),
+        ('geometry_versions', 0, 0, np.int64),
+        # 本地边界和世界边界，每行为 [left, top, right, bottom]
+        ('local_bounds', 4, 0.0, np.float64),
+        ('world_bounds', 4, 0.0, np.float64),
+        ('alive', 0, False, bool),
+        ('local_dirty', 0, False, bool),
+        ('world_dirty', 0, False, bool),
+    )
+
+    def __init__(self, capacity=64):
+        self.count = 0  # 已使用的最大行数
+        self._free_rows = []  # 可复用的空闲行
+        self.shapes = []  # 行 -> 图形（空闲行为 None）
+        self.revision = 0  # 任意一行的变换、几何或绑定变化时递增，供增量索引快速判断是否需要同步
+        self.binding_revision = 0  # 绑定或解绑图形时递增
+        self._damage_old = None  # 损坏跟踪期间被修改的行在修改前的边界数组列表，None 表示未跟踪
+        self._damage_rows = None  # 损坏跟踪期间被修改的行号数组列表
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """分配或扩展各列数组，保留已有数据"""
+        for name, width, fill, dtype in self._COLUMNS:
+            shape = (capacity, width) if width else (capacity,)
+            column = np.full(shape, fill, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                column[:len(old)] = old
+            setattr(self, name, column)
+        self.shapes.extend([None] * (capacity - len(self.shapes)))
+
+    # 绑定
+    def bind(self, shape):
+        """为图形分配一行，并将其变换迁移到存储中"""
+        if shape._store is self:
+            return shape._row
+        if shape._store is not None:
+            shape._store.unbind(shape)
+
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            if self.count == len(self.shapes):
+                self._allocate(len(self.shapes) * 2)
+            row = self.count
+            self.count += 1
+
+        position = shape.position
+        self.positions[row] = (position.x(), position.y())
+        self.rotations[row] = shape.rotation
+        self.scales[row] = (shape.scale_x, shape.scale_y)
+        # 沿用图形当前的版本号，变换未变，已有缓存仍然有效
+        self.versions[row] = shape._transform_version
+        # 行可能被复用，几何版本总是取新值，使增量索引能发现行中的图形已更换
+        self.geometry_versions[row] = next_version()
+        self.alive[row] = True
+        self.local_dirty[row] = True
+        self.world_dirty[row] = True
+        self.shapes[row] = shape
+        self.revision += 1
+        self.binding_revision += 1
+        self._record_damage(row)
+
+        shape.__dict__['_store'] = self
+        shape.__dict__['_row'] = row
+        return row
+
+    def unbind(self, shape):
+        """释放图形的行，变换写回图形自身"""
+        if shape._store is not self:
+            return
+        row = shape._row
+        self._record_damage(row)
+        shape.__dict__.update({
+            '_store': None,
+            '_row': -1,
+            '_position': self.position(row),
+            '_rotation': float(self.rotations[row]),
+            '_scale_x': float(self.scales[row, 0]),
+            '_scale_y': float(self.scales[row, 1]),
+            '_transform_version': int(self.versions[row]),
+        })
+        self.alive[row] = False
+        self.shapes[row] = None
+        self._free_rows.append(row)
+        self.revision += 1
+        self.binding_revision += 1
+
+    def rebuild(self, shapes):
+        """重新绑定图形列表（加载、撤销等整体替换图形列表后调用）"""
+        for row in np.nonzero(self.alive[:self.count])[0]:
+            self.unbind(self.shapes[row])
+        self.count = 0
+        self._free_rows.clear()
+        for shape in shapes:
+            self.bind(shape)
+
+    def rows_of(self, shapes):
+        """获取图形对应的行号数组，未绑定的图形会先绑定"""
+        return np.fromiter((shape._row if shape._store is self else self.bind(shape)
+                            for shape in shapes), dtype=np.intp, count=len(shapes))
+
+    # 单个图形的读写
+    def position(self, row):
+        x, y = self.positions[row]
+        return QPointF(x, y)
+
+    def touch(self, rows):
+        """标记行的变换已修改"""
+        self._record_damage(rows)
+        self.versions[rows] = next_version()
+        self.world_dirty[rows] = True
+        self.revision += 1
+
+    def set_position(self, row, x, y):
+        self.positions[row] = (x, y)
+        self.touch(row)
+
+    def set_rotation(self, row, rotation):
+        self.rotations[row] = rotation
+        self.touch(row)
+
+    def set_scale(self, row, axis, value):
+        self.scales[row, axis] = value
+        self.touch(row)
+
+    def mark_geometry_dirty(self, row):
+        """图形本地几何变化后标记其边界需要刷新"""
+        self._record_damage(row)
+        self.geometry_versions[row] = next_version()
+        self.local_dirty[row] = True
+        self.world_dirty[row] = True
+        self.revision += 1
+
+    # 批量变换
+    def translate(self, rows, dx, dy):
+        """平移多行"""
+        self.positions[rows] += (dx, dy)
+        self.touch(rows)
+
+    def rotate(self, rows, angle, pivot=None):
+        """旋转多行（角度，与QTransform.rotate方向一致）
+
+        pivot 为 None 时各图形绕自身原点旋转，否则整体绕 pivot 旋转。
+        """
+        self.rotations[rows] += angle
+        if pivot is not None:
+            radians = np.radians(angle)
+            c, s = np.cos(radians), np.sin(radians)
+            offset = self.positions[rows] - (pivot.x(), pivot.y())
+            self.positions[rows] = np.column_stack((
+                pivot.x() + offset[:, 0] * c - offset[:, 1] * s,
+                pivot.y() + offset[:, 0] * s + offset[:, 1] * c))
+        self.touch(rows)
+
+    def scale(self, rows, factor_x, factor_y=None, pivot=None):
+        """缩放多行
+
+        pivot 为 None 时各图形以自身原点缩放，否则整体以 pivot 缩放。
+        缩放因子作用于图形自身的坐标轴，以 pivot 非等比缩放旋转过的图形会使其变形，
+        调用方需要对这种情况改用等比缩放（见 SelectionTool 的合并选择框缩放）。
+        """
+        if factor_y is None:
+            factor_y = factor_x
+        self.scales[rows] *= (factor_x, factor_y)
+        if pivot is not None:
+            pivot_xy = np.array((pivot.x(), pivot.y()))
+            self.positions[rows] = pivot_xy + (self.positions[rows] - pivot_xy) * (factor_x, factor_y)
+        self.touch(rows)
+
+    def map_points(self, rows, points):
+        """将本地坐标点批量变换到场景坐标
+
+        参数:
+            rows: 每个点所属图形的行号数组
+            points: (N, 2) 本地坐标数组
+        """
+        radians = np.radians(self.rotations[rows])
+        c, s = np.cos(radians), np.sin(radians)
+        x = points[:, 0] * self.scales[rows, 0]
+        y = points[:, 1] * self.scales[rows, 1]
+        return np.column_stack((c * x - s * y + self.positions[rows, 0],
+                                s * x + c * y + self.positions[rows, 1]))
+
+    # 空间索引
+    def refresh_bounds(self):
+        """批量刷新已标记行的世界边界"""
+        count = self.count
+        local_rows = np.nonzero(self.local_dirty[:count] & self.alive[:count])[0]
+        for row in local_rows:
+            rect = self.shapes[row].visual_rect()
+            self.local_bounds[row] = (rect.left(), rect.top(), rect.right(), rect.bottom())
+        self.local_dirty[local_rows] = False
+
+        rows = np.nonzero(self.world_dirty[:count] & self.alive[:count])[0]
+        if not len(rows):
+            return
+        local = self.local_bounds[rows]
+        center = np.column_stack(((local[:, 0] + local[:, 2]) / 2, (local[:, 1] + local[:, 3]) / 2))
+        half = np.column_stack(((local[:, 2] - local[:, 0]) / 2, (local[:, 3] - local[:, 1]) / 2))
+
+        # 世界变换矩阵 M = R(rotation) * S(scale_x, scale_y)
+        radians = np.radians(self.rotations[rows])
+        c, s = np.cos(radians), np.sin(radians)
+        sx, sy = self.scales[rows, 0], self.scales[rows, 1]
+        m11, m12 = c * sx, -s * sy
+        m21, m22 = s * sx, c * sy
+
+        # 仿射变换后矩形的AABB：中心为 M*c + t，半宽高为 |M| * h
+        world_cx = m11 * center[:, 0] + m12 * center[:, 1] + self.positions[rows, 0]
+        world_cy = m21 * center[:, 0] + m22 * center[:, 1] + self.positions[rows, 1]
+        half_w = np.abs(m11) * half[:, 0] + np.abs(m12) * half[:, 1]
+        half_h = np.abs(m21) * half[:, 0] + np.abs(m22) * half[:, 1]
+        self.world_bounds[rows] = np.column_stack((world_cx - half_w, world_cy - half_h,
+                                                   world_cx + half_w, world_cy + half_h))
+        self.world_dirty[rows] = False
+
+    def bounds_of(self, rows):
+        """获取指定行的世界边界数组"""
+        self.refresh_bounds()
+        return self.world_bounds[rows]
+
+    def union_bounds(self, rows):
+        """获取多行世界边界的并集，rows 为空时返回空矩形"""
+        if not len(rows):
+            return QRectF()
+        bounds = self.bounds_of(rows)
+        left, top = bounds[:, 0].min(), bounds[:, 1].min()
+        right, bottom = bounds[:, 2].max(), bounds[:, 3].max()
+        return QRectF(left, top, right - left, bottom - top)
+
+    def query_rect(self, rect, contained=False):
+        """查询边界与矩形相交（contained 为 True 时完全包含于矩形内）的图形"""
+        return [self.shapes[row] for row in self.query_rect_rows(rect, contained)]
+
+    def query_rect_rows(self, rect, contained=False):
+        """同 query_rect，返回行号数组"""
+        self.refresh_bounds()
+        count = self.count
+        bounds = self.world_bounds[:count]
+        if contained:
+            mask = ((bounds[:, 0] >= rect.left()) & (bounds[:, 2] <= rect.right()) &
+                    (bounds[:, 1] >= rect.top()) & (bounds[:, 3] <= rect.bottom()))
+        else:
+            mask = ((bounds[:, 0] <= rect.right()) & (bounds[:, 2] >= rect.left()) &
+                    (bounds[:, 1] <= rect.bottom()) & (bounds[:, 3] >= rect.top()))
+        return np.nonzero(mask & self.alive[:count])[0]
+
+    def query_point(self, point, tolerance=0.0):
+        """查询边界包含某点的图形"""
+        return self.query_rect(QRectF(point.x() - tolerance, point.y() - tolerance,
+                                      2 * tolerance, 2 * tolerance))
+
+    # 损坏跟踪
+    def begin_damage(self):
+        """开始记录被修改的行"""
+        self.refresh_bounds()
+        self._damage_old = []
+        self._damage_rows = []
+
+    def _record_damage(self, rows):
+        """记录将被修改的行，边界仍有效的行保存修改前的边界"""
+        if self._damage_rows is None:
+            return
+        rows = np.atleast_1d(rows)
+        fresh = rows[self.alive[rows] & ~self.local_dirty[rows] & ~self.world_dirty[rows]]
+        if len(fresh):
+            self._damage_old.append(self.world_bounds[fresh])
+        self._damage_rows.append(rows)
+
+    def take_damage(self):
+        """结束记录，返回期间被修改的图形在修改前后覆盖的场景区域，没有修改时返回空矩形"""
+        if self._damage_rows is None:
+            return QRectF()
+        parts, rows = self._damage_old, self._damage_rows
+        self._damage_old = self._damage_rows = None
+        if rows:
+            rows = np.concatenate(rows)
+            rows = rows[self.alive[rows]]
+            if len(rows):
+                parts.append(self.bounds_of(rows))
+        if not parts:
+            return QRectF()
+        bounds = np.concatenate(parts)
+        left, top = bounds[:, 0].min(), bounds[:, 1].min()
+        right, bottom = bounds[:, 2].max(), bounds[:, 3].max()
+        return QRectF(left, top, right - left, bottom - top)
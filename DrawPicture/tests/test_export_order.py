@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""矢量导出与位图导出的层叠顺序一致：都按文档中的绘制顺序，不按图层列表"""
+
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QColor, QImage, QPainter
+from PyQt5.QtSvg import QSvgRenderer
+
+from DrawPicture.models.document import Document
+from DrawPicture.models.export import RasterExporter, VectorExporter
+from DrawPicture.models.shapes import Rectangle
+
+RED = QColor(255, 0, 0)
+BLUE = QColor(0, 0, 255)
+
+
+def _document():
+    """红色矩形在后添加的图层 L2 上先绘制，蓝色矩形在默认图层上后绘制，两者重叠"""
+    document = Document()
+    document.add_layer("L2")
+    document.add_shape(Rectangle(QRectF(0, 0, 100, 100), RED, RED, layer="L2"))
+    document.add_shape(Rectangle(QRectF(50, 50, 100, 100), BLUE, BLUE, layer="默认图层"))
+    return document
+
+
+def _render_svg(path, width, height):
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(QColor(255, 255, 255))
+    painter = QPainter(image)
+    QSvgRenderer(path).render(painter, QRectF(0, 0, width, height))
+    painter.end()
+    return image
+
+
+def test_svg_stacking_matches_png(qapp, tmp_path):
+    document = _document()
+    png_path = str(tmp_path / "z.png")
+    svg_path = str(tmp_path / "z.svg")
+    width, height = RasterExporter(document).export_png(png_path)
+    svg_size = VectorExporter(document).export_svg(svg_path)
+    assert svg_size == (width, height)
+
+    png = QImage(png_path)
+    svg = _render_svg(svg_path, width, height)
+    # 边距 10，重叠区域为文档坐标 (50, 50)-(100, 100)
+    for x, y in ((85, 85), (70, 100), (100, 70)):
+        assert png.pixelColor(x, y).rgb() == BLUE.rgb()
+        assert svg.pixelColor(x, y).rgb() == png.pixelColor(x, y).rgb()
+    # 不重叠的部分两种导出也相同
+    for x, y in ((30, 30), (140, 140)):
+        assert svg.pixelColor(x, y).rgb() == png.pixelColor(x, y).rgb()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""输入录制的往返测试：在主窗口中录制操作，保存、读取后回放，比较回放结束时的文档"""
+
+import pytest
+from PyQt5.QtCore import Qt, QEvent, QPoint, QPointF
+from PyQt5.QtGui import QMouseEvent, QKeyEvent
+from PyQt5.QtTest import QTest
+from PyQt5.QtWidgets import QApplication
+
+from DrawPicture.benchmarks.replay import Replayer
+from DrawPicture.diagnostics.input_record import InputRecording, COMMAND
+from DrawPicture.views.main_window import MainWindow
+
+
+def _document_state(document):
+    """用于比较的文档内容：图形类型和场景边界"""
+    result = []
+    for shape in document.shapes:
+        bounds = shape.scene_bounds()
+        result.append((type(shape).__name__, round(bounds.left(), 3), round(bounds.top(), 3),
+                       round(bounds.width(), 3), round(bounds.height(), 3)))
+    return result
+
+
+@pytest.fixture
+def window(qapp, monkeypatch):
+    monkeypatch.setattr(MainWindow, '_show_welcome_dialog', lambda self: None)
+    window = MainWindow()
+    window.resize(1200, 800)
+    window.show()
+    window.activateWindow()
+    QTest.qWaitForWindowExposed(window)
+    yield window
+    window.memory_monitor.stop()
+    window.close()
+
+
+def _mouse(canvas, event_type, pos, buttons):
+    button = Qt.NoButton if event_type == QEvent.MouseMove else Qt.LeftButton
+    QApplication.sendEvent(canvas, QMouseEvent(event_type, QPointF(pos), button, buttons, Qt.NoModifier))
+
+
+def _drag(canvas, start, end):
+    """按住左键拖动（QTest.mouseMove 不带按下的按键）"""
+    _mouse(canvas, QEvent.MouseButtonPress, start, Qt.LeftButton)
+    for i in range(1, 6):
+        _mouse(canvas, QEvent.MouseMove, start + (end - start) * i / 5, Qt.LeftButton)
+    _mouse(canvas, QEvent.MouseButtonRelease, end, Qt.NoButton)
+
+
+def test_round_trip_with_shortcuts(window, tmp_path):
+    canvas = window.canvas
+    window.on_tool_selected("rectangle")
+    window.input_recorder.start()
+
+    for i in range(3):
+        _drag(canvas, QPoint(50 + 120 * i, 60), QPoint(140 + 120 * i, 150))
+    # Ctrl+Z、Ctrl+Y、Delete 是主窗口的快捷键，按键不会到达画布
+    QTest.keyClick(canvas, Qt.Key_Z, Qt.ControlModifier)
+    QTest.keyClick(canvas, Qt.Key_Z, Qt.ControlModifier)
+    QTest.keyClick(canvas, Qt.Key_Y, Qt.ControlModifier)
+    window.on_tool_selected("selection")
+    _mouse(canvas, QEvent.MouseButtonPress, QPoint(95, 60), Qt.LeftButton)
+    _mouse(canvas, QEvent.MouseButtonRelease, QPoint(95, 60), Qt.NoButton)
+    QTest.keyClick(canvas, Qt.Key_Delete)
+
+    recording = window.input_recorder.stop()
+    expected = _document_state(window.document)
+    assert len(expected) == 1
+
+    path = tmp_path / "session.dpinput"
+    recording.save(str(path))
+    loaded = InputRecording.load(str(path))
+    commands = [event[2] for event in loaded.events if event[0] == COMMAND]
+    assert commands == ['undo', 'undo', 'redo', 'delete_selected_shapes']
+
+    replayer = Replayer(loaded)
+    result = replayer.replay()
+    assert result['shapes'] == len(expected)
+    assert _document_state(replayer.document) == expected
+    # 再次回放得到相同的结果
+    replayer.replay()
+    assert _document_state(replayer.document) == expected
+
+
+def test_commands_inside_handlers_are_not_recorded_twice(window):
+    canvas = window.canvas
+    window.on_tool_selected("rectangle")
+    _drag(canvas, QPoint(50, 50), QPoint(150, 150))
+    window.input_recorder.start()
+    # 画布自身处理的按键引起的命令随按键回放，不再单独记录
+    canvas.keyPressEvent(QKeyEvent(QEvent.KeyPress, Qt.Key_Z, Qt.ControlModifier))
+    recording = window.input_recorder.stop()
+    assert not [event for event in recording.events if event[0] == COMMAND]
+    # 停止录制后恢复文档原来的方法
+    assert 'undo' not in window.document.__dict__
+
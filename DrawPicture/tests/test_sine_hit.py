@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""正弦曲线解析点选与密集采样暴力求解的比较，包括振幅与频率乘积很大的陡峭曲线"""
+
+import math
+
+import numpy as np
+import pytest
+from PyQt5.QtCore import QPointF
+
+from DrawPicture.models.shapes import SineCurve
+
+# 暴力求解的采样点数
+SAMPLES = 200000
+
+# (振幅, 频率, 长度)
+CASES = [
+    (50.0, 0.05, 400),
+    (10.0, 0.1, 300),
+    (96.0, 1.0, 60),     # 波峰处曲率半径约 0.01，一格内可能有多个法向垂足
+    (-40.0, 0.3, 200),   # 振幅为负
+    (30.0, -0.07, 400),  # 频率为负
+    (0.0, 0.05, 200),    # 退化为线段
+]
+
+
+def _brute_force(sine, points):
+    x = np.linspace(0.0, sine.length, SAMPLES)
+    curve = np.column_stack((x + sine.start.x(), sine.amplitude * np.sin(sine.frequency * x) + sine.start.y()))
+    # 相邻采样点的最大间距，暴力求解的误差不超过其一半
+    spacing = np.hypot(*np.diff(curve, axis=0).T).max()
+    result = np.empty(len(points))
+    for i in range(0, len(points), 50):
+        chunk = points[i:i + 50]
+        d = np.hypot(chunk[:, None, 0] - curve[None, :, 0], chunk[:, None, 1] - curve[None, :, 1])
+        result[i:i + 50] = d.min(axis=1)
+    return result, spacing
+
+
+def _query_points(sine, rng):
+    """曲线附近的点（用于点选）和边界范围内的随机点"""
+    x = rng.uniform(0, sine.length, 250)
+    near = np.column_stack((x, sine.amplitude * np.sin(sine.frequency * x))) + rng.uniform(-8, 8, (250, 2))
+    extent = abs(sine.amplitude) + 10
+    spread = np.column_stack((rng.uniform(-10, sine.length + 10, 100), rng.uniform(-extent, extent, 100)))
+    return np.vstack((near, spread)) + (sine.start.x(), sine.start.y())
+
+
+@pytest.mark.parametrize("amplitude, frequency, length", CASES)
+def test_distance_matches_brute_force(amplitude, frequency, length):
+    sine = SineCurve(QPointF(30, -10), amplitude, frequency, length)
+    points = _query_points(sine, np.random.default_rng(7))
+    expected, spacing = _brute_force(sine, points)
+    for (x, y), brute in zip(points, expected):
+        distance = sine.distance_to_curve(QPointF(x, y))
+        # 解析结果是真实最短距离，暴力求解只会偏大，且偏大不超过采样间距的一半
+        assert distance <= brute + 1e-6
+        assert brute - distance <= spacing / 2 + 1e-6
+
+
+@pytest.mark.parametrize("amplitude, frequency, length", CASES)
+def test_limited_distance_is_exact_within_limit(amplitude, frequency, length):
+    sine = SineCurve(QPointF(30, -10), amplitude, frequency, length)
+    rng = np.random.default_rng(13)
+    points = _query_points(sine, rng)
+    expected, spacing = _brute_force(sine, points)
+    for (x, y), brute, limit in zip(points, expected, rng.uniform(0.5, 20, len(points))):
+        distance = sine.distance_to_curve(QPointF(x, y), limit)
+        if distance <= limit:
+            # 不超过 limit 的返回值必须是精确的最短距离
+            assert distance <= brute + 1e-6
+            assert brute - distance <= spacing / 2 + 1e-6
+        else:
+            assert brute >= limit - 1e-6
+
+
+@pytest.mark.parametrize("amplitude, frequency, length", CASES)
+def test_hit_test_matches_brute_force(amplitude, frequency, length):
+    sine = SineCurve(QPointF(30, -10), amplitude, frequency, length)
+    tolerance = 5.0
+    points = _query_points(sine, np.random.default_rng(11))
+    expected, spacing = _brute_force(sine, points)
+    for (x, y), brute in zip(points, expected):
+        if abs(brute - tolerance) <= spacing:
+            continue  # 暴力求解在容差边界上不可靠
+        hit = sine.distance_to_curve(QPointF(x, y), tolerance) <= tolerance
+        assert hit == (brute <= tolerance)
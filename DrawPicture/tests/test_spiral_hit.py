@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""螺线解析点选与密集采样暴力求解的比较，包括参数为负（半径变号）的螺线"""
+
+import math
+
+import numpy as np
+import pytest
+from PyQt5.QtCore import QPointF
+
+from DrawPicture.models.shapes import ArchimedeanSpiral
+
+# 暴力求解的采样点数
+SAMPLES = 200000
+
+# (a, b, 圈数)
+CASES = [
+    (0.25, 0.25, 3),
+    (20.0, 4.0, 2.5),
+    (5.0, -2.0, 3),      # b < 0：半径很快变负
+    (-20.0, 3.0, 2),     # a < 0：中心附近半径为负
+    (-3.0, -1.5, 2.5),   # 半径始终为负
+    (60.0, -8.0, 2),     # 半径由正变负，经过中心
+]
+
+
+def _brute_force(spiral, points):
+    theta = np.linspace(0.0, 2 * math.pi * spiral.turns, SAMPLES)
+    r = spiral.a + spiral.b * theta
+    curve = np.column_stack((r * np.cos(theta) + spiral.center.x(), r * np.sin(theta) + spiral.center.y()))
+    # 相邻采样点的最大间距，暴力求解的误差不超过其一半
+    spacing = np.hypot(*np.diff(curve, axis=0).T).max()
+    result = np.empty(len(points))
+    for i in range(0, len(points), 50):
+        chunk = points[i:i + 50]
+        d = np.hypot(chunk[:, None, 0] - curve[None, :, 0], chunk[:, None, 1] - curve[None, :, 1])
+        result[i:i + 50] = d.min(axis=1)
+    return result, spacing
+
+
+def _query_points(spiral, rng):
+    """曲线附近的点（用于点选）和边界范围内的随机点"""
+    theta = rng.uniform(0, 2 * math.pi * spiral.turns, 250)
+    r = spiral.a + spiral.b * theta
+    near = np.column_stack((r * np.cos(theta), r * np.sin(theta))) + rng.uniform(-8, 8, (250, 2))
+    extent = max(abs(spiral.a), abs(spiral.a + spiral.b * 2 * math.pi * spiral.turns)) + 10
+    spread = rng.uniform(-extent, extent, (100, 2))
+    return np.vstack((near, spread)) + (spiral.center.x(), spiral.center.y())
+
+
+@pytest.mark.parametrize("a, b, turns", CASES)
+def test_distance_matches_brute_force(a, b, turns):
+    spiral = ArchimedeanSpiral(QPointF(30, -10), a, b, turns)
+    points = _query_points(spiral, np.random.default_rng(7))
+    expected, spacing = _brute_force(spiral, points)
+    for (x, y), brute in zip(points, expected):
+        distance = spiral.distance_to_curve(QPointF(x, y))
+        # 解析结果是真实最短距离，暴力求解只会偏大，且偏大不超过采样间距的一半
+        assert distance <= brute + 1e-6
+        assert brute - distance <= spacing / 2 + 1e-6
+
+
+@pytest.mark.parametrize("a, b, turns", CASES)
+def test_hit_test_matches_brute_force(a, b, turns):
+    spiral = ArchimedeanSpiral(QPointF(30, -10), a, b, turns)
+    tolerance = 5.0
+    points = _query_points(spiral, np.random.default_rng(11))
+    expected, spacing = _brute_force(spiral, points)
+    for (x, y), brute in zip(points, expected):
+        if abs(brute - tolerance) <= spacing:
+            continue  # 暴力求解在容差边界上不可靠
+        hit = spiral.distance_to_curve(QPointF(x, y), tolerance) <= tolerance
+        assert hit == (brute <= tolerance)
+
+
+@pytest.mark.parametrize("a, b, turns", CASES)
+def test_bounding_rect_contains_curve(a, b, turns):
+    spiral = ArchimedeanSpiral(QPointF(30, -10), a, b, turns)
+    rect = spiral.bounding_rect()
+    theta = np.linspace(0.0, 2 * math.pi * turns, 2000)
+    r = a + b * theta
+    x, y = r * np.cos(theta) + 30, r * np.sin(theta) - 10
+    assert rect.width() >= 0 and rect.height() >= 0
+    assert x.min() >= rect.left() - 1e-6 and x.max() <= rect.right() + 1e-6
+    assert y.min() >= rect.top() - 1e-6 and y.max() <= rect.bottom() + 1e-6
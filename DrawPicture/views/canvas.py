@@ -1,9 +1,24 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from PyQt5.QtWidgets import QWidget, QMenu, QAction, QInputDialog, QMessageBox
-from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QPainterPath, QCursor, QTransform
-from PyQt5.QtCore import Qt, QPoint, QPointF, QRectF, pyqtSignal, QTime, QTimer
+from contextlib import contextmanager
+import math
+import time
+
+from PyQt5.QtWidgets import QWidget, QMenu, QAction, QInputDialog, QMessageBox, QPinchGesture
+from PyQt5.QtGui import (QPainter, QPen, QBrush, QColor, QPainterPath, QCursor, QTransform, QPolygonF,
+                         QRegion, QPixmap, QMouseEvent)
+from PyQt5.QtCore import Qt, QEvent, QPoint, QPointF, QRect, QRectF, pyqtSignal, QTime, QTimer
+
+from DrawPicture.diagnostics.perf import perf
+from DrawPicture.models import rendering
+from DrawPicture.models.snapping import (Snapper, SNAP_ENDPOINT, SNAP_MIDPOINT, SNAP_CENTER,
+                                         SNAP_GRID)
+from DrawPicture.models.tools import SELECTION_BOX_MARGIN, selection_handle_positions
+from DrawPicture.views.grid_pattern import GridPattern
+from DrawPicture.views.perf_hud import PerfHud
+from DrawPicture.views.tile_cache import TileCache
+import numpy as np
 
 class Canvas(QWidget):
     """绘图画布"""
@@ -12,6 +27,32 @@ class Canvas(QWidget):
     status_message = pyqtSignal(str)  # 状态消息信号
     zoom_changed = pyqtSignal(float)  # 添加缩放变化信号
     
+    # 框选预览中最多绘制边界框的图形数量，其余图形只绘制中心点
+    MAX_PREVIEW_RECTS = 2000
+    
+    # 吸附距离（像素）
+    SNAP_DISTANCE = 8
+    
+    # 局部重绘区域向外扩展的像素数，覆盖抗锯齿和固定宽度画笔的边缘
+    DAMAGE_PADDING = 4
+    
+    # 空闲时预取瓦片的间隔（毫秒）和每次预取的瓦片数
+    PREFETCH_INTERVAL = 30
+    PREFETCH_BATCH = 2
+    
+    # 缩放停止多久（毫秒）后重新绘制清晰的画面
+    ZOOM_SETTLE_INTERVAL = 150
+    # 滚轮每转过1/8度的缩放倍数，滚动一格（120）约为1.2倍
+    WHEEL_ZOOM_BASE = 1.0015
+    
+    # 渲染质量策略：自动模式下交互时使用草稿质量，停止交互后重新绘制高质量画面
+    QUALITY_AUTO = "auto"
+    # 停止平移、缩放或拖动多久（毫秒）后恢复高质量
+    QUALITY_IDLE_INTERVAL = 300
+    
+    # 网格线的最小间距（像素），更密时隐藏部分网格线
+    MIN_GRID_SPACING = 6
+    
     def __init__(self, document, parent=None):
         """初始化画布"""
         super().__init__(parent)
@@ -27,6 +68,7 @@ class Canvas(QWidget):
         
         # 设置画布属性
         self.current_tool = None  # 当前工具
+        self.input_recorder = None  # 输入事件录制器（录制时不为 None）
         self.zoom_factor = 1.0  # 缩放因子
         self.pan_offset = QPoint(0, 0)  # 平移偏移量
         self.is_panning = False  # 是否正在平移
@@ -36,6 +78,10 @@ class Canvas(QWidget):
         self.grid_visible = False  # 默认不显示网格
         self.grid_size = 20  # 网格大小
         self.grid_color = QColor(220, 220, 220)  # 网格颜色
+        self.grid_pattern = GridPattern()  # 按间距缓存的网格图案
+        
+        # 吸附服务，所有工具共用
+        self.snapper = Snapper(self.document)
         
         # 设置画布背景色
         self.background_color = Qt.white
@@ -49,8 +95,43 @@ class Canvas(QWidget):
         self.zoom_step = 0.1
         
         # 绑定文档信号
-        self.document.document_changed.connect(self.update)
-        self.document.selection_changed.connect(self.update)
+        self.document.document_changed.connect(self._on_document_changed)
+        self.document.selection_changed.connect(self._on_selection_changed)
+        self._tracking_damage = False  # 是否正在记录鼠标事件引起的局部变化
+        self._frozen_scene = None  # 手势期间缓存的 (键, 位图, 是否为草稿)，位图中是背景、网格和不变的图形
+        self._selection_changed = False  # 记录局部变化期间选择是否改变
+        
+        # 场景瓦片缓存，平移时只需贴图；平移后在空闲时预取移动方向上的瓦片
+        self.tile_cache = TileCache(self._render_tile)
+        self._last_pan = QPoint(self.pan_offset)
+        self._prefetch_direction = (0, 0)
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(self.PREFETCH_INTERVAL)
+        self._prefetch_timer.timeout.connect(self._prefetch_tiles)
+        
+        # 平滑缩放：缩放过程中缩放开始时的画面，停止后才按新的缩放因子重新绘制
+        self._zoom_preview = None  # (开始时的缩放因子, 开始时的平移偏移量, 画面位图)
+        self._zoom_anchor = None  # 连续缩放时固定的 (窗口锚点, 对应的场景坐标)
+        self._zoom_settle_timer = QTimer(self)
+        self._zoom_settle_timer.setSingleShot(True)
+        self._zoom_settle_timer.setInterval(self.ZOOM_SETTLE_INTERVAL)
+        self._zoom_settle_timer.timeout.connect(self._finish_zoom)
+        self.grabGesture(Qt.PinchGesture)
+        
+        # 渲染质量
+        self.render_quality = self.QUALITY_AUTO
+        self._final_options = rendering.quality_options(rendering.QUALITY_FINAL)
+        self._draft_options = rendering.quality_options(rendering.QUALITY_DRAFT)
+        self._interacting = False  # 是否正在平移、缩放或拖动
+        self._draft_drawn = False  # 交互期间是否有画面以草稿质量绘制
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(self.QUALITY_IDLE_INTERVAL)
+        self._idle_timer.timeout.connect(self._on_interaction_idle)
+        
+        # 性能信息面板，显示时才创建
+        self.perf_hud = None
         
         # 设置画布属性
         self.setAttribute(Qt.WA_StaticContents)
@@ -69,6 +150,10 @@ class Canvas(QWidget):
     def set_tool(self, tool):
         """设置当前工具"""
         self.current_tool = tool
+        tool.snapper = self.snapper
+        if self.input_recorder is not None:
+            self.input_recorder.tool(tool)
+        self.snapper.last_result = None
         # 更新鼠标光标
         self.setCursor(tool.get_cursor())
         
@@ -161,42 +246,69 @@ class Canvas(QWidget):
         menu.exec_(event.globalPos())
         
     def paintEvent(self, event):
-        """绘制事件处理"""
+        """绘制事件处理，只绘制与需要重绘的区域相交的图形
+        
+        拖动或绘制手势期间，不变的图形取自冻结的位图，只重新绘制手势中变化的图形（位于其他图形之上）。
+        """
+        options = self.render_options()
+        self._draft_drawn = self._draft_drawn or options is self._draft_options
+        hud = self.perf_hud
+        # 只重绘性能信息面板的刷新不计为一帧
+        measure = perf.enabled and not (hud is not None and hud.rect().contains(event.rect()))
+        if measure:
+            perf.begin_frame()
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        
-        # 设置背景色
-        painter.fillRect(self.rect(), self.background_color)
-        
-        # 先绘制网格（在坐标变换之前，确保网格覆盖整个可见区域）
-        if self.grid_visible:
-            self.draw_grid(painter)
-        
-        # 应用缩放和平移
-        painter.translate(self.pan_offset)
-        painter.scale(self.zoom_factor, self.zoom_factor)
-        
-        # 绘制所有图形
-        for shape in self.document.shapes:
-            # 跳过不可见图层中的图形
-            if self.document.is_layer_visible(shape.layer):
-                # 保存画家状态
-                painter.save()
-                
-                # 绘制图形
-                shape.paint(painter)
+        painter.setRenderHint(QPainter.Antialiasing, options.antialiasing)
+        with rendering.use_options(options):
+            self._paint_view(painter, event)
+        if measure:
+            perf.end_frame()
+        if hud is not None:
+            painter.resetTransform()
+            hud.draw(painter)
+            
+    def _paint_view(self, painter, event):
+        """绘制场景和界面元素"""
+        scene_rects = [self._widget_to_scene_rect(rect) for rect in event.region().rects()]
+        
+        gesture_rows = self._gesture_rows()
+        if self._zoom_preview is not None:
+            # 缩放过程中只缩放贴图，场景中的图形不重新绘制
+            self.draw_zoom_preview(painter, event.rect())
+            painter.translate(self.pan_offset)
+            painter.scale(self.zoom_factor, self.zoom_factor)
+        elif gesture_rows is not None and len(gesture_rows):
+            painter.drawPixmap(0, 0, self._frozen_pixmap(gesture_rows))
+            painter.translate(self.pan_offset)
+            painter.scale(self.zoom_factor, self.zoom_factor)
+            self.draw_shapes(painter, scene_rects, include=gesture_rows)
+        else:
+            # 没有手势或手势中没有变化的文档图形时，场景直接取自瓦片
+            if gesture_rows is None:
+                self._frozen_scene = None
+            self.draw_tiles(painter, event.region())
+            painter.translate(self.pan_offset)
+            painter.scale(self.zoom_factor, self.zoom_factor)
                 
-                # 恢复画家状态
-                painter.restore()
+        # 绘制选择框，多选时绘制一个包含所有选中图形的合并选择框
+        if len(self.document.selected_shapes) > 1:
+            painter.save()
+            self.draw_group_selection_handles(painter)
+            painter.restore()
+        else:
+            for shape in self.document.selected_shapes:
+                if self.document.is_layer_visible(shape.layer):
+                    # 打印调试信息
+                    print(f"绘制选择框，图形旋转角度: {shape.rotation}")
+                    painter.save()
+                    self.draw_selection_handles(painter, shape)
+                    painter.restore()
                 
-        # 绘制选择框
-        for shape in self.document.selected_shapes:
-            if self.document.is_layer_visible(shape.layer):
-                # 打印调试信息
-                print(f"绘制选择框，图形旋转角度: {shape.rotation}")
-                painter.save()
-                self.draw_selection_handles(painter, shape)
-                painter.restore()
+        # 绘制框选/套索的轮廓和预览
+        if self.current_tool and self.current_tool.selection_outline is not None:
+            painter.save()
+            self.draw_selection_preview(painter)
+            painter.restore()
                 
         # 绘制临时形状（如预览线）
         for shape in self.document.temp_shapes:
@@ -208,45 +320,245 @@ class Canvas(QWidget):
         if self.current_tool and self.current_tool.current_shape:
             self.current_tool.current_shape.paint(painter)
             
-    def draw_grid(self, painter):
-        """绘制网格 - 在视图坐标系中绘制，不受平移和缩放影响"""
-        pen = QPen(self.grid_color)
-        pen.setStyle(Qt.DotLine)
-        painter.setPen(pen)
+        # 绘制吸附指示器
+        if self.snapper.last_result is not None:
+            self.draw_snap_indicator(painter, self.snapper.last_result)
+            
+    def draw_scene(self, painter, rect, scene_rects, exclude=None):
+        """绘制背景、网格和图形，结束时 painter 处于场景坐标系
+        
+        参数:
+            rect: 需要绘制的窗口区域
+            scene_rects: 需要绘制的场景区域列表
+            exclude: 不绘制的图形的行号数组
+        """
+        # 设置背景色
+        painter.fillRect(rect, self.background_color)
         
-        # 计算可见区域
-        width = self.width()
-        height = self.height()
+        # 先绘制网格（在坐标变换之前，确保网格覆盖整个可见区域）
+        if self.grid_visible:
+            self.draw_grid(painter)
         
-        # 计算网格线的间距（考虑缩放）
-        grid_spacing = self.grid_size * self.zoom_factor
+        # 应用缩放和平移
+        painter.translate(self.pan_offset)
+        painter.scale(self.zoom_factor, self.zoom_factor)
         
-        # 计算起始位置（考虑偏移）
-        offset_x = self.pan_offset.x()
-        offset_y = self.pan_offset.y()
+        self.draw_shapes(painter, scene_rects, exclude=exclude)
         
-        # 计算第一条网格线的位置
-        start_x = offset_x % grid_spacing
-        if start_x < 0:
-            start_x += grid_spacing
+    def draw_shapes(self, painter, scene_rects, include=None, exclude=None):
+        """按绘制顺序绘制与区域相交的可见图形，include/exclude 见 Document.shapes_to_draw"""
+        shapes = self.document.shapes_to_draw(scene_rects, include, exclude)
+        if perf.enabled:
+            self._draw_shapes_measured(painter, shapes, include, exclude)
+            return
+        for shape in shapes:
+            # 保存画家状态
+            painter.save()
+            
+            # 绘制图形
+            shape.paint(painter)
+            
+            # 恢复画家状态
+            painter.restore()
+            
+    def _draw_shapes_measured(self, painter, shapes, include, exclude):
+        """绘制图形，同时记录绘制和被裁剪的图形数以及各图层的绘制时间"""
+        if include is not None:
+            candidates = len(include)
+        else:
+            candidates = len(self.document.shapes) - (len(exclude) if exclude is not None else 0)
+        perf.count_shapes(len(shapes), max(0, candidates - len(shapes)))
+        clock = time.perf_counter
+        for shape in shapes:
+            start = clock()
+            painter.save()
+            shape.paint(painter)
+            painter.restore()
+            perf.add_layer_time(shape.layer, clock() - start)
+            
+    def cache_memory(self):
+        """画布各缓存占用的字节数，返回 {缓存名称: 字节数}"""
+        def pixmap_bytes(pixmap):
+            return pixmap.width() * pixmap.height() * 4
+        return {
+            "瓦片": self.tile_cache.memory(),
+            "网格图案": self.grid_pattern.memory(),
+            "冻结画面": pixmap_bytes(self._frozen_scene[1]) if self._frozen_scene is not None else 0,
+            "缩放预览": pixmap_bytes(self._zoom_preview[2]) if self._zoom_preview is not None else 0,
+        }
+        
+    def set_perf_hud_visible(self, visible):
+        """显示或隐藏性能信息面板"""
+        if visible and self.perf_hud is None:
+            self.perf_hud = PerfHud(self)
+            self.perf_hud.start()
+        elif not visible and self.perf_hud is not None:
+            self.perf_hud.stop()
+            self.perf_hud.deleteLater()
+            self.perf_hud = None
+            
+    def draw_tiles(self, painter, region):
+        """将覆盖窗口区域的场景瓦片贴到画布上，缺少的瓦片立即绘制"""
+        size = TileCache.TILE_SIZE
+        ox, oy = self.pan_offset.x(), self.pan_offset.y()
+        # 至少保留两屏的瓦片
+        self.tile_cache.min_tiles = 2 * (self.width() // size + 2) * (self.height() // size + 2)
+        
+        tiles = set()
+        for rect in region.rects():
+            tx0, ty0, tx1, ty1 = self.tile_cache.tile_range(
+                QRectF(rect.left() - ox, rect.top() - oy, rect.width(), rect.height()))
+            tiles.update((tx, ty) for tx in range(tx0, tx1 + 1) for ty in range(ty0, ty1 + 1))
+        ratio = self.devicePixelRatioF()
+        draft = self.current_quality() == rendering.QUALITY_DRAFT
+        for tx, ty in tiles:
+            painter.drawPixmap(tx * size + ox, ty * size + oy,
+                               self.tile_cache.tile(self.zoom_factor, tx, ty, ratio, draft))
+                               
+        # 平移后在空闲时预取移动方向上的瓦片
+        if self.pan_offset != self._last_pan:
+            delta = self._last_pan - self.pan_offset
+            self._prefetch_direction = ((delta.x() > 0) - (delta.x() < 0), (delta.y() > 0) - (delta.y() < 0))
+            self._last_pan = QPoint(self.pan_offset)
+            self._prefetch_timer.start()
+            
+    def draw_zoom_preview(self, painter, rect):
+        """将缩放开始时的画面按当前缩放因子缩放后绘制，画面之外的区域只填充背景"""
+        zoom, pan, pixmap = self._zoom_preview
+        painter.fillRect(rect, self.background_color)
+        painter.save()
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        # 窗口坐标 w 对应的场景坐标为 (w - pan) / zoom，在当前视图中的位置为 场景坐标 * zoom' + pan'
+        scale = self.zoom_factor / zoom
+        painter.translate(self.pan_offset)
+        painter.scale(scale, scale)
+        painter.translate(-pan)
+        painter.drawPixmap(0, 0, pixmap)
+        painter.restore()
         
-        start_y = offset_y % grid_spacing
-        if start_y < 0:
-            start_y += grid_spacing
+    def _render_tile(self, painter, zoom, rect):
+        """绘制一个瓦片：背景、网格和与瓦片相交的图形
         
-        # 绘制垂直线
-        x = start_x
-        while x < width:
-            x_int = int(x)
-            painter.drawLine(QPoint(x_int, 0), QPoint(x_int, height))
-            x += grid_spacing
+        参数:
+            rect: 瓦片覆盖的缩放后场景像素区域
+        """
+        options = self.render_options()
+        painter.setRenderHint(QPainter.Antialiasing, options.antialiasing)
+        painter.fillRect(QRectF(0, 0, rect.width(), rect.height()), self.background_color)
+        if self.grid_visible:
+            self.draw_grid(painter, rect.topLeft(), rect.size(), zoom)
+        painter.translate(-rect.left(), -rect.top())
+        painter.scale(zoom, zoom)
+        # 多取1像素，包含只有抗锯齿边缘落在瓦片内的图形
+        scene_rect = QRectF((rect.left() - 1) / zoom, (rect.top() - 1) / zoom,
+                            (rect.width() + 2) / zoom, (rect.height() + 2) / zoom)
+        with rendering.use_options(options):
+            self.draw_shapes(painter, [scene_rect])
+        
+    def _prefetch_tiles(self):
+        """预取可见区域外、平移方向上一圈的瓦片，每次只绘制少量瓦片以免阻塞界面
+        
+        交互期间不预取，停止交互后再以当前质量预取。
+        """
+        if self._interacting:
+            return
+        dx, dy = self._prefetch_direction
+        ox, oy = self.pan_offset.x(), self.pan_offset.y()
+        tx0, ty0, tx1, ty1 = self.tile_cache.tile_range(QRectF(-ox, -oy, self.width(), self.height()))
+        tx0, tx1 = tx0 + min(dx, 0), tx1 + max(dx, 0)
+        ty0, ty1 = ty0 + min(dy, 0), ty1 + max(dy, 0)
+        draft = self.current_quality() == rendering.QUALITY_DRAFT
+        missing = [(tx, ty) for tx in range(tx0, tx1 + 1) for ty in range(ty0, ty1 + 1)
+                   if not self.tile_cache.contains(self.zoom_factor, tx, ty, draft)]
+        ratio = self.devicePixelRatioF()
+        for tx, ty in missing[:self.PREFETCH_BATCH]:
+            self.tile_cache.tile(self.zoom_factor, tx, ty, ratio, draft)
+        if len(missing) > self.PREFETCH_BATCH:
+            self._prefetch_timer.start()
             
-        # 绘制水平线
-        y = start_y
-        while y < height:
-            y_int = int(y)
-            painter.drawLine(QPoint(0, y_int), QPoint(width, y_int))
-            y += grid_spacing
+    def set_render_quality(self, quality):
+        """设置渲染质量：QUALITY_AUTO、rendering.QUALITY_FINAL 或 rendering.QUALITY_DRAFT"""
+        self.render_quality = quality
+        self._frozen_scene = None
+        self.update()
+        
+    def current_quality(self):
+        """当前绘制使用的质量，自动模式下交互期间为草稿"""
+        if self.render_quality == self.QUALITY_AUTO:
+            return rendering.QUALITY_DRAFT if self._interacting else rendering.QUALITY_FINAL
+        return self.render_quality
+        
+    def render_options(self):
+        """当前绘制使用的渲染选项"""
+        if self.current_quality() == rendering.QUALITY_DRAFT:
+            return self._draft_options
+        return self._final_options
+        
+    def _note_interaction(self):
+        """记录一次交互，停止交互 QUALITY_IDLE_INTERVAL 毫秒后恢复高质量"""
+        self._interacting = True
+        self._idle_timer.start()
+        
+    def _on_interaction_idle(self):
+        """停止交互后以高质量重绘交互期间以草稿质量绘制的画面"""
+        self._interacting = False
+        if self._draft_drawn:
+            self._draft_drawn = False
+            self.update()
+        self._prefetch_timer.start()
+        
+    def _gesture_rows(self):
+        """获取当前手势中会变化的图形的行号数组，没有手势时返回 None"""
+        shapes = self.current_tool.gesture_shapes() if self.current_tool else None
+        if shapes is None:
+            return None
+        store = self.document.transforms
+        # 撤销等操作会替换图形，只保留仍在文档中的图形
+        return store.rows_of([shape for shape in shapes if shape._store is store])
+        
+    def _frozen_pixmap(self, gesture_rows):
+        """获取冻结的场景位图，视图或手势中变化的图形改变时重新生成
+        
+        草稿质量的位图在需要高质量时也重新生成，高质量的位图在草稿期间继续使用。
+        """
+        key = (self.zoom_factor, self.pan_offset.x(), self.pan_offset.y(), self.width(), self.height(),
+               self.grid_visible, self.grid_size, gesture_rows.tobytes())
+        draft = self.current_quality() == rendering.QUALITY_DRAFT
+        if (self._frozen_scene is None or self._frozen_scene[0] != key or
+                (self._frozen_scene[2] and not draft)):
+            ratio = self.devicePixelRatioF()
+            pixmap = QPixmap(self.size() * ratio)
+            pixmap.setDevicePixelRatio(ratio)
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing, rendering.current_options().antialiasing)
+            self.draw_scene(painter, self.rect(), [self._widget_to_scene_rect(self.rect())],
+                            exclude=gesture_rows)
+            painter.end()
+            self._frozen_scene = (key, pixmap, draft)
+        return self._frozen_scene[1]
+        
+    def draw_grid(self, painter, origin=None, size=None, zoom=None):
+        """绘制网格 - 在视图坐标系中绘制，线宽不受缩放影响
+        
+        网格线位置和虚线的相位都以缩放后的场景像素为基准，画布和瓦片上绘制的网格可以无缝拼接。
+        网格用缓存的图案一次填充；线间距小于 MIN_GRID_SPACING 像素时只绘制每隔 2^k 条的线。
+        
+        参数:
+            origin: painter 原点对应的缩放后场景像素坐标，默认为画布左上角
+            size: 绘制区域大小，默认为画布大小
+            zoom: 缩放因子，默认为当前缩放因子
+        """
+        zoom = self.zoom_factor if zoom is None else zoom
+        if origin is None:
+            origin = QPointF(-self.pan_offset.x(), -self.pan_offset.y())
+        width, height = (size.width(), size.height()) if size is not None else (self.width(), self.height())
+        
+        # 计算网格线的间距（考虑缩放），过密时成倍加大
+        grid_spacing = self.grid_size * zoom
+        if grid_spacing < self.MIN_GRID_SPACING:
+            grid_spacing *= 2 ** math.ceil(math.log2(self.MIN_GRID_SPACING / grid_spacing))
+        self.grid_pattern.draw(painter, QRectF(origin.x(), origin.y(), width, height),
+                               grid_spacing, self.grid_color)
         
     def draw_selection_handles(self, painter, shape):
         """绘制选择手柄"""
@@ -312,6 +624,196 @@ class Canvas(QWidget):
         # 恢复画家状态
         painter.restore()
             
+    def draw_group_selection_handles(self, painter):
+        """绘制多选时的合并选择框和手柄"""
+        rect = self.document.selection_bounds(SELECTION_BOX_MARGIN)
+        if rect.isNull():
+            return
+        half_handle = 4
+        
+        # 合并选择框
+        painter.setPen(QPen(Qt.blue, 1, Qt.DashLine))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRect(rect)
+        
+        # 旋转手柄（顶部中心上方）
+        rotation_handle = QPointF(rect.center().x(), rect.top() - 20)
+        painter.setPen(QPen(Qt.blue, 2))
+        painter.setBrush(Qt.white)
+        painter.drawEllipse(rotation_handle, 6, 6)
+        
+        # 8个缩放手柄
+        painter.setPen(QPen(Qt.blue, 1))
+        for pos in selection_handle_positions(rect):
+            painter.drawRect(QRectF(pos.x() - half_handle, pos.y() - half_handle, 8, 8))
+            
+    def draw_selection_preview(self, painter):
+        """绘制框选/套索轮廓，并高亮将被选中的图形
+        
+        屏幕上足够大的图形绘制边界框（最多 MAX_PREVIEW_RECTS 个），
+        其余的只在中心绘制一个点，通过一次drawPoints完成，图形数量很大时也能逐帧更新。
+        """
+        tool = self.current_tool
+        rows = tool.selection_preview
+        if rows is not None and len(rows):
+            view_rect = QRectF(self.mapToScene(QPoint(0, 0)),
+                               self.mapToScene(QPoint(self.width(), self.height())))
+            bounds = self.document.transforms.bounds_of(rows)
+            bounds = bounds[rendering.intersecting(bounds, view_rect)]
+            
+            size = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]) * self.zoom_factor
+            large = size >= 4
+            large[np.cumsum(large) > self.MAX_PREVIEW_RECTS] = False
+            
+            pen = QPen(QColor(0, 120, 215), 1)
+            pen.setCosmetic(True)
+            painter.setPen(pen)
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRects([QRectF(left, top, right - left, bottom - top)
+                               for left, top, right, bottom in bounds[large].tolist()])
+            
+            small = bounds[~large]
+            if len(small):
+                pen.setWidth(3)
+                painter.setPen(pen)
+                centers = np.column_stack(((small[:, 0] + small[:, 2]) / 2, (small[:, 1] + small[:, 3]) / 2))
+                painter.drawPoints(rendering.points_to_polygon(centers))
+                
+        # 轮廓：完全包含模式为实线，相交模式为虚线
+        outline = tool.selection_outline
+        pen = QPen(QColor(0, 120, 215), 1, Qt.DashLine if tool.selection_crossing else Qt.SolidLine)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        painter.setBrush(QColor(0, 120, 215, 40))
+        if isinstance(outline, QRectF):
+            painter.drawRect(outline)
+        else:
+            painter.drawPolygon(outline)
+            
+    def draw_snap_indicator(self, painter, result):
+        """绘制吸附点指示器：端点为方框，中点为三角形，中心为圆，网格为十字，边界框为菱形"""
+        size = 5 / self.zoom_factor
+        point = result.point
+        x, y = point.x(), point.y()
+        pen = QPen(QColor(255, 120, 0), 1.5)
+        pen.setCosmetic(True)
+        painter.save()
+        painter.setPen(pen)
+        painter.setBrush(Qt.NoBrush)
+        if result.kind == SNAP_ENDPOINT:
+            painter.drawRect(QRectF(x - size, y - size, 2 * size, 2 * size))
+        elif result.kind == SNAP_MIDPOINT:
+            painter.drawPolygon(QPolygonF([QPointF(x, y - size), QPointF(x + size, y + size),
+                                           QPointF(x - size, y + size)]))
+        elif result.kind == SNAP_CENTER:
+            painter.drawEllipse(point, size, size)
+        elif result.kind == SNAP_GRID:
+            painter.drawLine(QPointF(x - size, y), QPointF(x + size, y))
+            painter.drawLine(QPointF(x, y - size), QPointF(x, y + size))
+        else:
+            painter.drawPolygon(QPolygonF([QPointF(x, y - size), QPointF(x + size, y),
+                                           QPointF(x, y + size), QPointF(x - size, y)]))
+        painter.restore()
+        
+    def _snap_position(self, scene_pos, event):
+        """对需要吸附的工具应用吸附，按住Alt键时临时关闭吸附"""
+        self.snapper.tolerance = self.SNAP_DISTANCE / self.zoom_factor
+        self.snapper.grid_size = self.grid_size if self.grid_visible else None
+        self.snapper.last_result = None
+        if not self.current_tool.snapping or event.modifiers() & Qt.AltModifier:
+            return scene_pos
+        return self.snapper.snap_point(scene_pos)
+        
+    def _on_document_changed(self):
+        """文档或选择变化时重绘，鼠标事件引起的变化由 _damage_tracking 局部重绘"""
+        if not self._tracking_damage:
+            self._frozen_scene = None
+            self.tile_cache.clear()
+            self.update()
+            
+    def _on_selection_changed(self):
+        """选择变化时重绘（图形自身可能绘制选中状态）"""
+        if self._tracking_damage:
+            self._selection_changed = True
+        else:
+            self._on_document_changed()
+            
+    def _scene_to_widget_rect(self, rect):
+        """将场景矩形映射为窗口中的整数矩形，并向外扩展 DAMAGE_PADDING"""
+        if rect.isNull():
+            return QRect()
+        mapped = QRectF(rect.left() * self.zoom_factor + self.pan_offset.x(),
+                        rect.top() * self.zoom_factor + self.pan_offset.y(),
+                        rect.width() * self.zoom_factor, rect.height() * self.zoom_factor)
+        padding = self.DAMAGE_PADDING
+        return mapped.toAlignedRect().adjusted(-padding, -padding, padding, padding)
+        
+    def _widget_to_scene_rect(self, rect):
+        """将窗口矩形映射为场景矩形"""
+        return QRectF(self.mapToScene(rect.topLeft()), self.mapToScene(rect.bottomRight() + QPoint(1, 1)))
+        
+    def _selection_damage_rect(self):
+        """获取选择框和手柄在场景中覆盖的区域"""
+        selected = self.document.selected_shapes
+        if len(selected) > 1:
+            # 合并选择框，顶部20像素外还有半径6的旋转手柄
+            return self.document.selection_bounds(SELECTION_BOX_MARGIN).adjusted(-6, -30, 6, 6)
+        rect = QRectF()
+        for shape in selected:
+            # 单选时选择框绕中心旋转，取能覆盖任意角度和旋转手柄的正方形
+            bounds = shape._get_global_bounds()
+            radius = math.hypot(bounds.width(), bounds.height()) / 2 + 30
+            center = bounds.center()
+            rect = rect.united(QRectF(center.x() - radius, center.y() - radius, 2 * radius, 2 * radius))
+        return rect
+        
+    def _overlay_region(self):
+        """获取选择框、工具临时内容、临时图形和吸附指示器当前在窗口中覆盖的区域"""
+        rect = self._selection_damage_rect()
+        if self.current_tool:
+            rect = rect.united(self.current_tool.damage_rect())
+        for shape in self.document.temp_shapes:
+            rect = rect.united(shape.scene_bounds())
+        region = QRegion(self._scene_to_widget_rect(rect))
+        
+        result = self.snapper.last_result
+        if result is not None:
+            x = int(result.point.x() * self.zoom_factor + self.pan_offset.x())
+            y = int(result.point.y() * self.zoom_factor + self.pan_offset.y())
+            size = 5 + self.DAMAGE_PADDING
+            region += QRect(x - size, y - size, 2 * size + 1, 2 * size + 1)
+        return region
+        
+    @contextmanager
+    def _damage_tracking(self):
+        """记录上下文中的变化，结束后只重绘变化前后的区域
+        
+        包括被移动、修改、添加或删除的图形（由变换存储记录），以及选择框、工具临时内容和吸附指示器。
+        """
+        region = self._overlay_region()
+        selection_rect = self._selection_damage_rect()
+        self.document.begin_damage()
+        self._tracking_damage = True
+        self._selection_changed = False
+        try:
+            yield
+        finally:
+            self._tracking_damage = False
+            damage = self.document.take_damage()
+            self.tile_cache.invalidate(damage)
+            if self._selection_changed:
+                # 选中状态由图形自身绘制的部分在瓦片中
+                self.tile_cache.invalidate(selection_rect)
+                self.tile_cache.invalidate(self._selection_damage_rect())
+            region += self._scene_to_widget_rect(damage)
+            region += self._overlay_region()
+            if self._frozen_scene is not None and self._gesture_rows() is None:
+                # 手势结束，手势中变化的图形回到原来的绘制顺序，整体重绘一次
+                self._frozen_scene = None
+                self.update()
+            elif not region.isEmpty():
+                self.update(region)
+        
     def mapToScene(self, point):
         """将窗口坐标映射到场景坐标"""
         return QPointF(
@@ -319,16 +821,49 @@ class Canvas(QWidget):
             (point.y() - self.pan_offset.y()) / self.zoom_factor
         )
         
+    # 鼠标事件类型 -> 工具的处理方法
+    MOUSE_HANDLERS = {
+        QEvent.MouseButtonPress: 'mouse_press',
+        QEvent.MouseMove: 'mouse_move',
+        QEvent.MouseButtonRelease: 'mouse_release',
+        QEvent.MouseButtonDblClick: 'mouse_double_click',
+    }
+    
+    def _dispatch_mouse(self, event_type, scene_pos, button, buttons, modifiers, timestamp):
+        """创建具有场景坐标的鼠标事件并交给当前工具处理，正在录制时先记录该事件"""
+        handler = getattr(self.current_tool, self.MOUSE_HANDLERS[event_type], None)
+        if handler is None:
+            return
+        scene_event = QMouseEvent(event_type, scene_pos, button, buttons, modifiers)
+        scene_event.setTimestamp(timestamp)
+        if self.input_recorder is None:
+            handler(scene_event)
+            return
+        # 工具处理期间调用的文档命令随鼠标事件一起回放，不单独录制
+        with self.input_recorder.mouse(scene_event):
+            handler(scene_event)
+        
+    def send_scene_mouse(self, event_type, scene_pos, button, buttons, modifiers, timestamp=0):
+        """把场景坐标（不再吸附）的鼠标事件交给当前工具，与窗口鼠标事件一样局部重绘
+        
+        用于回放录制的输入事件。
+        
+        参数:
+            timestamp: 事件时间戳（毫秒），钢笔工具据此判断双击
+        """
+        if event_type == QEvent.MouseMove and buttons:
+            self._note_interaction()
+        with self._damage_tracking():
+            self._dispatch_mouse(event_type, scene_pos, button, buttons, modifiers, timestamp)
+            
     def mousePressEvent(self, event):
         """鼠标按下事件"""
         if self.current_tool:
-            # 将窗口坐标转换为场景坐标
-            scene_pos = self.mapToScene(event.pos())
-            # 创建具有场景坐标的新事件
-            scene_event = type(event)(event.type(), scene_pos, event.button(),
-                                   event.buttons(), event.modifiers())
-            self.current_tool.mouse_press(scene_event)
-            self.update()
+            with self._damage_tracking():
+                # 将窗口坐标转换为场景坐标
+                scene_pos = self._snap_position(self.mapToScene(event.pos()), event)
+                self._dispatch_mouse(event.type(), scene_pos, event.button(), event.buttons(),
+                                     event.modifiers(), event.timestamp())
             
     def mouseMoveEvent(self, event):
         """鼠标移动事件"""
@@ -337,48 +872,66 @@ class Canvas(QWidget):
         # 发送状态栏消息
         self.status_message.emit(f"坐标: ({int(scene_pos.x())}, {int(scene_pos.y())})")
         
+        # 按住鼠标拖动（平移、移动图形、绘制）期间使用草稿质量
+        if event.buttons():
+            self._note_interaction()
+            
         if self.current_tool:
-            # 创建具有场景坐标的新事件
-            scene_event = type(event)(event.type(), scene_pos, event.button(),
-                                   event.buttons(), event.modifiers())
-            self.current_tool.mouse_move(scene_event)
-            # 强制重绘画布，确保选择框随图形移动
-            self.update()
+            # 只重绘图形、选择框和预览变化的区域，悬停时通常只有吸附指示器
+            with self._damage_tracking():
+                scene_pos = self._snap_position(scene_pos, event)
+                self._dispatch_mouse(event.type(), scene_pos, event.button(), event.buttons(),
+                                     event.modifiers(), event.timestamp())
             
     def mouseReleaseEvent(self, event):
         """鼠标释放事件"""
         if self.current_tool:
-            scene_pos = self.mapToScene(event.pos())
-            scene_event = type(event)(event.type(), scene_pos, event.button(),
-                                   event.buttons(), event.modifiers())
-            self.current_tool.mouse_release(scene_event)
-            # 强制重绘画布，确保选择框位置更新
-            self.update()
+            with self._damage_tracking():
+                scene_pos = self._snap_position(self.mapToScene(event.pos()), event)
+                self._dispatch_mouse(event.type(), scene_pos, event.button(), event.buttons(),
+                                     event.modifiers(), event.timestamp())
+                self.snapper.last_result = None
             
     def mouseDoubleClickEvent(self, event):
         """鼠标双击事件"""
         if self.current_tool and hasattr(self.current_tool, 'mouse_double_click'):
-            scene_pos = self.mapToScene(event.pos())
-            scene_event = type(event)(event.type(), scene_pos, event.button(),
-                                   event.buttons(), event.modifiers())
-            self.current_tool.mouse_double_click(scene_event)
-            self.update()
+            with self._damage_tracking():
+                self._dispatch_mouse(event.type(), self.mapToScene(event.pos()), event.button(),
+                                     event.buttons(), event.modifiers(), event.timestamp())
             
     def wheelEvent(self, event):
-        """鼠标滚轮事件 - 用于缩放"""
+        """鼠标滚轮事件 - 按住Ctrl时以光标为中心连续缩放"""
         if event.modifiers() & Qt.ControlModifier:
-            # 放大或缩小
-            if event.angleDelta().y() > 0:
-                self.zoom_in()
-            else:
-                self.zoom_out()
+            self.zoom_at(self.WHEEL_ZOOM_BASE ** event.angleDelta().y(), event.pos())
             event.accept()
         else:
             # 默认滚动行为
             super().wheelEvent(event)
             
+    def event(self, event):
+        """处理触控板和触摸屏的捏合缩放手势"""
+        if event.type() == QEvent.NativeGesture and event.gestureType() == Qt.ZoomNativeGesture:
+            self.zoom_at(1 + event.value(), event.pos())
+            return True
+        if event.type() == QEvent.Gesture:
+            pinch = event.gesture(Qt.PinchGesture)
+            if pinch is not None:
+                if pinch.changeFlags() & QPinchGesture.ScaleFactorChanged:
+                    self.zoom_at(pinch.scaleFactor(), self.mapFromGlobal(pinch.centerPoint().toPoint()))
+                event.accept()
+                return True
+        return super().event(event)
+            
     def keyPressEvent(self, event):
-        """键盘事件处理"""
+        """键盘事件处理，正在录制时记录按键（按键引起的文档命令随按键一起回放）"""
+        if self.input_recorder is None:
+            self._handle_key(event)
+        else:
+            with self.input_recorder.key(event):
+                self._handle_key(event)
+                
+    def _handle_key(self, event):
+        """处理画布的快捷键"""
         # 删除选中图形
         if event.key() == Qt.Key_Delete:
             self.document.delete_selected_shapes()
@@ -405,6 +958,7 @@ class Canvas(QWidget):
     def toggle_grid(self):
         """切换网格显示状态"""
         self.grid_visible = not self.grid_visible
+        self.tile_cache.clear()
         self.update()
         return self.grid_visible
         
@@ -412,26 +966,64 @@ class Canvas(QWidget):
         """设置网格大小"""
         self.grid_size = size
         if self.grid_visible:
+            self.tile_cache.clear()
             self.update()
             
     def zoom_in(self):
-        """放大"""
-        if self.zoom_factor < self.max_zoom:
-            self.zoom_factor = min(self.zoom_factor + self.zoom_step, self.max_zoom)
-            self.zoom_changed.emit(self.zoom_factor)
-        self.update()
-        self.status_message.emit(f"缩放: {int(self.zoom_factor * 100)}%")
+        """放大（以画布中心为基准）"""
+        self.zoom_to(self.zoom_factor + self.zoom_step)
         
     def zoom_out(self):
-        """缩小"""
-        if self.zoom_factor > self.min_zoom:
-            self.zoom_factor = max(self.zoom_factor - self.zoom_step, self.min_zoom)
+        """缩小（以画布中心为基准）"""
+        self.zoom_to(self.zoom_factor - self.zoom_step)
+        
+    def zoom_at(self, factor, anchor):
+        """以窗口中的 anchor 点为中心按倍数缩放"""
+        self.zoom_to(self.zoom_factor * factor, anchor)
+        
+    def zoom_to(self, zoom, anchor=None):
+        """缩放到指定缩放因子，anchor 点（默认为画布中心）下的场景内容保持不动
+        
+        缩放过程中只缩放缩放开始时的画面，停止缩放 ZOOM_SETTLE_INTERVAL 毫秒后才重新绘制清晰的画面。
+        """
+        zoom = min(max(zoom, self.min_zoom), self.max_zoom)
+        if anchor is None:
+            anchor = QPointF(self.width() / 2, self.height() / 2)
+        if zoom != self.zoom_factor:
+            if self._zoom_preview is None:
+                self._begin_zoom_preview()
+            # 锚点不变时沿用第一次的场景坐标，避免平移偏移量取整的误差累积
+            if self._zoom_anchor is None or (self._zoom_anchor[0] - QPointF(anchor)).manhattanLength() > 1:
+                self._zoom_anchor = (QPointF(anchor), self.mapToScene(anchor))
+            scene = self._zoom_anchor[1]
+            self.zoom_factor = zoom
+            self.pan_offset = QPoint(round(anchor.x() - scene.x() * zoom), round(anchor.y() - scene.y() * zoom))
             self.zoom_changed.emit(self.zoom_factor)
-        self.update()
+            self._zoom_settle_timer.start()
+            self.update()
         self.status_message.emit(f"缩放: {int(self.zoom_factor * 100)}%")
         
+    def _begin_zoom_preview(self):
+        """保存当前画面（不含选择框等界面元素），供缩放过程中缩放显示"""
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(self.size() * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        painter = QPainter(pixmap)
+        self.draw_tiles(painter, QRegion(self.rect()))
+        painter.end()
+        self._zoom_preview = (self.zoom_factor, QPoint(self.pan_offset), pixmap)
+        
+    def _finish_zoom(self):
+        """缩放停止后按新的缩放因子重新绘制"""
+        self._zoom_preview = None
+        self._zoom_anchor = None
+        self.update()
+        
     def zoom_reset(self):
         """重置缩放"""
+        self._zoom_settle_timer.stop()
+        self._zoom_preview = None
+        self._zoom_anchor = None
         self.zoom_factor = 1.0
         self.pan_offset = QPoint(0, 0)
         self.zoom_changed.emit(self.zoom_factor)
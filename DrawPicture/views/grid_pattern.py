@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""网格图案缓存
+
+网格线按间距（缩放后的场景像素）预先绘制到可平铺的图案位图中，绘制网格时用纹理画刷
+一次填充整个区域，代替逐条绘制虚线。竖线和横线各用一条图案：竖线图案横向包含若干个
+网格单元，纵向是虚线的若干个周期；横线图案与之对称。
+
+网格间距一般不是整数像素，图案取 n 个单元，使 n 个单元的宽度最接近整数像素（即图案周期），
+每个周期的误差累积到半个像素之前重新对齐一次，线的位置与逐条绘制时相差不超过1像素。
+图案在缩放后的场景坐标中对齐，画布和瓦片上的网格可以无缝拼接。
+"""
+
+from collections import OrderedDict
+import math
+
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from PyQt5.QtGui import QPainter, QPen, QPixmap, QBrush, QColor
+
+from DrawPicture.diagnostics.perf import perf
+
+
+class GridPattern:
+    """按网格间距缓存的网格图案"""
+
+    MAX_PERIOD = 1024  # 图案周期的最大像素数
+    DASH_PERIOD = 48   # 虚线方向的图案长度，是点线周期（3像素）的整数倍
+    MAX_ENTRIES = 16   # 缓存的图案数
+
+    def __init__(self):
+        self._patterns = OrderedDict()  # (间距, 颜色, 抗锯齿) -> (单元数, 周期, 对齐块的周期数, 竖线画刷, 横线画刷)
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def memory(self):
+        """缓存的图案位图占用的字节数"""
+        return sum(brush.texture().width() * brush.texture().height() * 4
+                   for entry in self._patterns.values() for brush in entry[3:])
+
+    @classmethod
+    def period(cls, spacing):
+        """选择图案包含的网格单元数 n，使 n * spacing 最接近整数像素
+
+        返回:
+            (n, 周期像素数, 每个周期的误差)
+        """
+        best_n, best_error = 1, 1.0
+        for n in range(1, max(1, int(cls.MAX_PERIOD // spacing)) + 1):
+            error = abs(n * spacing - round(n * spacing))
+            if error < best_error - 1e-9:
+                best_n, best_error = n, error
+                if error < 1e-6:
+                    break
+        return best_n, max(1, round(best_n * spacing)), best_error
+
+    def draw(self, painter, rect, spacing, color):
+        """用网格图案填充区域
+
+        参数:
+            rect: 填充的缩放后场景像素区域，painter 原点对应 rect 左上角
+            spacing: 网格间距（缩放后的场景像素）
+            color: 网格线颜色
+        """
+        antialias = bool(painter.renderHints() & QPainter.Antialiasing)
+        n, period, block, vertical, horizontal = self._pattern(spacing, color, antialias)
+        left, top = rect.left(), rect.top()
+        # 从左上角所在对齐块的起点开始平铺，起点位于第 n * block 的整数倍条网格线上
+        cells = n * block
+        x0 = (math.floor(math.floor(left / (cells * spacing)) * cells * spacing) - left) % period
+        y0 = (math.floor(math.floor(top / (cells * spacing)) * cells * spacing) - top) % period
+        area = QRectF(0, 0, rect.width(), rect.height())
+        painter.save()
+        painter.setPen(Qt.NoPen)
+        # 虚线的相位按缩放后场景坐标对齐
+        painter.setBrushOrigin(QPointF(x0, -top % self.DASH_PERIOD))
+        painter.fillRect(area, vertical)
+        painter.setBrushOrigin(QPointF(-left % self.DASH_PERIOD, y0))
+        painter.fillRect(area, horizontal)
+        painter.restore()
+
+    def clear(self):
+        """清空缓存"""
+        self._patterns.clear()
+
+    def _pattern(self, spacing, color, antialias):
+        key = (round(spacing, 6), QColor(color).rgba(), antialias)
+        entry = self._patterns.get(key)
+        if perf.enabled:
+            perf.cache('grid', entry is not None)
+        if entry is None:
+            n, period, error = self.period(spacing)
+            # 零头累积到半个像素之前的周期数，整除时全局对齐
+            block = max(1, int(0.5 / error)) if error > 1e-6 else 1 << 30
+            lines = [math.floor(j * spacing) for j in range(n)] + [period]
+            entry = (n, period, block,
+                     QBrush(self._render(period, self.DASH_PERIOD, lines, color, antialias, True)),
+                     QBrush(self._render(self.DASH_PERIOD, period, lines, color, antialias, False)))
+            self._patterns[key] = entry
+            while len(self._patterns) > self.MAX_ENTRIES:
+                self._patterns.popitem(last=False)
+        else:
+            self._patterns.move_to_end(key)
+        return entry
+
+    @staticmethod
+    def _render(width, height, lines, color, antialias, vertical):
+        """绘制一条图案：在 lines 给出的位置绘制竖线或横线
+
+        最后一条线位于图案末端（即下一个图案的第一条线），抗锯齿时它落在图案内的一半与第一条线衔接。
+        """
+        pixmap = QPixmap(width, height)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing, antialias)
+        pen = QPen(color)
+        pen.setStyle(Qt.DotLine)
+        painter.setPen(pen)
+        for position in lines:
+            if vertical:
+                painter.drawLine(QPointF(position, 0), QPointF(position, height))
+            else:
+                painter.drawLine(QPointF(0, position), QPointF(width, position))
+        painter.end()
+        return pixmap
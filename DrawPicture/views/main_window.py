@@ -1,17 +1,27 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
+
 from PyQt5.QtWidgets import (QMainWindow, QDockWidget, QAction, QFileDialog,
-                         QMessageBox, QToolBar, QHBoxLayout, QWidget, QLabel, QVBoxLayout)
+                         QMessageBox, QToolBar, QHBoxLayout, QWidget, QLabel, QVBoxLayout,
+                         QInputDialog, QActionGroup)
 from PyQt5.QtGui import QPainter, QPen, QPixmap, QIcon, QBrush, QColor, QImage
 from PyQt5.QtCore import Qt, QSize, QPoint, QRect, QPointF
 
+from DrawPicture.diagnostics.input_record import InputRecorder
+from DrawPicture.diagnostics.memory import MemoryMonitor
+from DrawPicture.diagnostics.trace import tracer
 from DrawPicture.models.document import Document
-from DrawPicture.models.tools import (SelectionTool, LineTool, RectangleTool, CircleTool,
+from DrawPicture.models import rendering
+from DrawPicture.models.export import export_document, is_vector_format
+from DrawPicture.models.document_file import read_header, THUMBNAIL_SIZE
+from DrawPicture.models.tools import (SelectionTool, LassoTool, LineTool, RectangleTool, CircleTool,
                          FreehandTool, SpiralTool, SineCurveTool, ColorTool, PanTool, EraserTool,
                          SuperEllipseTool, ParametricCurveTool, GearTool, LeafTool, CloudTool,
                          PenTool)
 from DrawPicture.views.canvas import Canvas
+from DrawPicture.views.memory_dialog import MemoryDialog
 from DrawPicture.views.panels import ToolPanel, ColorPanel, LayerPanel, ShapeLibraryPanel
 
 class MainWindow(QMainWindow):
@@ -31,6 +41,15 @@ class MainWindow(QMainWindow):
         # 初始化UI
         self._setup_ui()
         
+        # 定期采样内存使用，设置环境变量 DRAWPICTURE_MEMORY_LOG=文件路径 时同时写入趋势日志
+        self.memory_monitor = MemoryMonitor(self.document, self.canvas,
+                                            log_path=os.environ.get("DRAWPICTURE_MEMORY_LOG"), parent=self)
+        self.memory_monitor.start()
+        self.memory_dialog = None
+        
+        # 输入事件录制（用于回放测试工具性能）
+        self.input_recorder = InputRecorder(self.canvas)
+        
         # 设置窗口属性
         self.setWindowTitle("DrawPicture - 专业绘图工具")
         
@@ -268,6 +287,7 @@ class MainWindow(QMainWindow):
         """初始化工具"""
         self.tools = {
             "selection": SelectionTool(self.document),
+            "lasso": LassoTool(self.document),
             "pan": PanTool(self.document),
             "line": LineTool(self.document),
             "rectangle": RectangleTool(self.document),
@@ -555,6 +575,59 @@ class MainWindow(QMainWindow):
         self.grid_action.triggered.connect(self.on_toggle_grid)
         view_menu.addAction(self.grid_action)
         
+        # 吸附设置
+        snap_menu = view_menu.addMenu("吸附(&S)")
+        snap_enabled_action = QAction("启用吸附", self)
+        snap_enabled_action.setCheckable(True)
+        snap_enabled_action.setChecked(self.canvas.snapper.enabled)
+        snap_enabled_action.toggled.connect(self.on_toggle_snapping)
+        snap_menu.addAction(snap_enabled_action)
+        snap_menu.addSeparator()
+        for mode, text in (("grid", "网格"), ("endpoint", "端点"), ("midpoint", "中点"),
+                           ("center", "中心"), ("bounds", "边界框")):
+            action = QAction(text, self)
+            action.setCheckable(True)
+            action.setChecked(mode in self.canvas.snapper.modes)
+            action.toggled.connect(lambda checked, mode=mode: self.canvas.snapper.set_mode(mode, checked))
+            snap_menu.addAction(action)
+            
+        # 渲染质量
+        quality_menu = view_menu.addMenu("渲染质量(&Q)")
+        quality_group = QActionGroup(self)
+        for quality, text in ((Canvas.QUALITY_AUTO, "自动（交互时草稿）"),
+                              (rendering.QUALITY_FINAL, "始终高质量"),
+                              (rendering.QUALITY_DRAFT, "始终草稿")):
+            action = QAction(text, self)
+            action.setCheckable(True)
+            action.setChecked(quality == self.canvas.render_quality)
+            action.triggered.connect(lambda checked, quality=quality: self.canvas.set_render_quality(quality))
+            quality_group.addAction(action)
+            quality_menu.addAction(action)
+            
+        # 性能信息面板
+        perf_hud_action = QAction("性能信息(&P)", self)
+        perf_hud_action.setShortcut("F12")
+        perf_hud_action.setCheckable(True)
+        perf_hud_action.toggled.connect(self.canvas.set_perf_hud_visible)
+        view_menu.addAction(perf_hud_action)
+        
+        # 性能跟踪（Chrome 跟踪格式）
+        self.trace_action = QAction("记录性能跟踪(&T)", self)
+        self.trace_action.setCheckable(True)
+        self.trace_action.setChecked(tracer.active)
+        self.trace_action.toggled.connect(self.on_toggle_trace)
+        view_menu.addAction(self.trace_action)
+        
+        # 录制输入事件，可用 python -m DrawPicture.benchmarks.replay 回放
+        self.record_input_action = QAction("录制输入(&I)", self)
+        self.record_input_action.setCheckable(True)
+        self.record_input_action.toggled.connect(self.on_toggle_input_recording)
+        view_menu.addAction(self.record_input_action)
+        
+        memory_action = QAction("内存使用(&M)...", self)
+        memory_action.triggered.connect(self.on_show_memory)
+        view_menu.addAction(memory_action)
+        
         # 帮助菜单
         help_menu = self.menuBar().addMenu("帮助(&H)")
         
@@ -713,11 +786,40 @@ class MainWindow(QMainWindow):
         
     def on_open(self):
         """打开文档"""
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "打开文件", "", "绘图文件 (*.draw);;所有文件 (*)"
-        )
-        if file_path:
-            self.document.load(file_path)
+        dialog = QFileDialog(self, "打开文件", "", "绘图文件 (*.draw);;所有文件 (*)")
+        dialog.setFileMode(QFileDialog.ExistingFile)
+        # 使用Qt自带的对话框以便在右侧显示文件预览
+        dialog.setOption(QFileDialog.DontUseNativeDialog)
+        
+        preview = QWidget()
+        preview_layout = QVBoxLayout(preview)
+        thumbnail_label = QLabel()
+        thumbnail_label.setAlignment(Qt.AlignCenter)
+        thumbnail_label.setMinimumSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        info_label = QLabel()
+        info_label.setWordWrap(True)
+        preview_layout.addWidget(thumbnail_label)
+        preview_layout.addWidget(info_label)
+        preview_layout.addStretch()
+        dialog.layout().addWidget(preview, 0, dialog.layout().columnCount(), -1, 1)
+        dialog.currentChanged.connect(
+            lambda path: self._update_file_preview(thumbnail_label, info_label, path))
+        
+        if dialog.exec_() and dialog.selectedFiles():
+            self.document.load(dialog.selectedFiles()[0])
+            
+    def _update_file_preview(self, thumbnail_label, info_label, file_path):
+        """显示绘图文件的缩略图和摘要（只读取文件头）"""
+        header = read_header(file_path)
+        thumbnail_label.clear()
+        info_label.clear()
+        if header is None:
+            return
+        
+        if not header['thumbnail'].isNull():
+            thumbnail_label.setPixmap(QPixmap.fromImage(header['thumbnail']))
+        info_label.setText(f"图形数量: {header['shape_count']}\n"
+                           f"图层: {', '.join(header['layers'])}")
             
     def on_save(self):
         """保存文档"""
@@ -816,7 +918,7 @@ class MainWindow(QMainWindow):
         if file_path is None:
             file_path, filter_type = QFileDialog.getSaveFileName(
                 self, "导出图片", "", 
-                "PNG图片 (*.png);;JPEG图片 (*.jpg *.jpeg);;BMP图片 (*.bmp);;TIFF图片 (*.tiff);;WebP图片 (*.webp);;SVG图片 (*.svg);;ICO图标 (*.ico);;所有文件 (*)"
+                "PNG图片 (*.png);;JPEG图片 (*.jpg *.jpeg);;BMP图片 (*.bmp);;TIFF图片 (*.tiff);;WebP图片 (*.webp);;SVG图片 (*.svg);;PDF文档 (*.pdf);;Deep Zoom图块 (*.dzi);;ICO图标 (*.ico);;所有文件 (*)"
             )
             
             if file_path:
@@ -833,50 +935,28 @@ class MainWindow(QMainWindow):
                     file_path += ".webp"
                 elif "SVG" in filter_type and not file_path.lower().endswith('.svg'):
                     file_path += ".svg"
+                elif "PDF" in filter_type and not file_path.lower().endswith('.pdf'):
+                    file_path += ".pdf"
+                elif "Deep Zoom" in filter_type and not file_path.lower().endswith('.dzi'):
+                    file_path += ".dzi"
                 elif "ICO" in filter_type and not file_path.lower().endswith('.ico'):
                     file_path += ".ico"
         
         if file_path:
-            try:
-                # 创建高分辨率图像
-                canvas_size = self.canvas.size()
-                scale_factor = 2  # 使用整数倍数
-                width = int(canvas_size.width() * scale_factor)
-                height = int(canvas_size.height() * scale_factor)
-                image = QImage(width, height, QImage.Format_ARGB32)
-                image.fill(QColor(255, 255, 255))
-                
-                # 使用高质量渲染
-                painter = QPainter(image)
-                painter.setRenderHint(QPainter.Antialiasing)
-                painter.setRenderHint(QPainter.SmoothPixmapTransform)
-                painter.setRenderHint(QPainter.TextAntialiasing)
+            # 位图格式需要选择导出分辨率，SVG/PDF直接输出矢量
+            dpi = 96
+            if not is_vector_format(file_path):
+                dpi, ok = QInputDialog.getInt(self, "导出分辨率", "分辨率 (DPI):", 192, 24, 2400)
+                if not ok:
+                    return False
                 
-                # 应用缩放以提高分辨率
-                painter.scale(scale_factor, scale_factor)
-                self.canvas.render(painter)
-                painter.end()
-                
-                # 根据文件类型设置保存选项
-                save_options = {}
-                if file_path.lower().endswith(('.jpg', '.jpeg')):
-                    save_options['quality'] = 95  # JPEG质量设置（0-100）
-                elif file_path.lower().endswith('.png'):
-                    save_options['quality'] = 100  # PNG质量设置（0-100）
-                    save_options['compression'] = 1  # PNG压缩级别（0-9）
-                elif file_path.lower().endswith('.webp'):
-                    save_options['quality'] = 95  # WebP质量设置（0-100）
-                elif file_path.lower().endswith('.tiff'):
-                    save_options['compression'] = 'lzw'  # TIFF压缩方式
-                
-                # 保存图片
-                if image.save(file_path, quality=save_options.get('quality', -1)):
-                    QMessageBox.information(self, "导出成功", 
-                                         f"图片已导出到: {file_path}\n分辨率: {image.width()}x{image.height()}")
-                    self.set_status_message(f"图片已导出到: {file_path}")
-                    return True
-                else:
-                    QMessageBox.warning(self, "导出失败", "无法导出图片。")
+            try:
+                # 基于文档边界导出，与画布窗口大小无关
+                width, height = export_document(self.document, file_path, dpi)
+                QMessageBox.information(self, "导出成功", 
+                                     f"图片已导出到: {file_path}\n分辨率: {width}x{height}")
+                self.set_status_message(f"图片已导出到: {file_path}")
+                return True
             except Exception as e:
                 QMessageBox.warning(self, "导出失败", f"导出图片时发生错误：{str(e)}")
         return False
@@ -1022,6 +1102,61 @@ class MainWindow(QMainWindow):
             self.grid_action.setText("显示网格(&G)")
             self.set_status_message("网格已隐藏")
 
+    def on_show_memory(self):
+        """显示内存使用对话框，打开时立即采样一次"""
+        if self.memory_dialog is None:
+            self.memory_dialog = MemoryDialog(self.memory_monitor, self)
+        self.memory_monitor.sample()
+        self.memory_dialog.show()
+        self.memory_dialog.raise_()
+        
+    def on_toggle_trace(self, enabled):
+        """开始或停止记录性能跟踪，停止时保存为 Chrome 跟踪文件"""
+        if enabled:
+            tracer.start()
+            self.set_status_message("正在记录性能跟踪，再次选择菜单项停止并保存")
+            return
+        tracer.stop()
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "保存性能跟踪", "trace.json", "Chrome跟踪文件 (*.json);;所有文件 (*)"
+        )
+        if not file_path:
+            self.set_status_message("已停止性能跟踪（未保存）")
+            return
+        try:
+            tracer.save(file_path)
+            self.set_status_message(f"性能跟踪已保存: {file_path}（{len(tracer.events)} 个区间，"
+                                    "可在 chrome://tracing 或 ui.perfetto.dev 中打开）")
+        except OSError as e:
+            QMessageBox.warning(self, "保存失败", f"保存性能跟踪时发生错误：{str(e)}")
+            
+    def on_toggle_input_recording(self, enabled):
+        """开始或停止录制输入事件，停止时保存录制文件"""
+        if enabled:
+            self.input_recorder.start()
+            self.set_status_message("正在录制输入，再次选择菜单项停止并保存")
+            return
+        recording = self.input_recorder.stop()
+        if recording is None:
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "保存输入录制", "input.dpinput", "输入录制文件 (*.dpinput);;所有文件 (*)"
+        )
+        if not file_path:
+            self.set_status_message("已停止录制输入（未保存）")
+            return
+        try:
+            recording.save(file_path)
+            self.set_status_message(f"输入录制已保存: {file_path}（{len(recording.events)} 个事件，"
+                                    f"{recording.duration:.1f} 秒）")
+        except OSError as e:
+            QMessageBox.warning(self, "保存失败", f"保存输入录制时发生错误：{str(e)}")
+            
+    def on_toggle_snapping(self, enabled):
+        """切换吸附"""
+        self.canvas.snapper.enabled = enabled
+        self.set_status_message("吸附已启用（按住Alt键临时关闭）" if enabled else "吸附已关闭")
+            
     def _update_zoom_indicator(self, zoom_factor):
         """更新缩放指示器"""
         if hasattr(self, 'zoom_indicator'):
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""内存使用对话框
+
+显示内存监视器最近一次采样的报告：按图形类型、图层、撤销历史条目和缓存分类的估算字节数，
+以及定期采样的趋势记录。
+"""
+
+import time
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTabWidget,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog, QMessageBox)
+
+from DrawPicture.diagnostics.memory import format_bytes
+
+
+class MemoryDialog(QDialog):
+    """内存使用对话框（非模态）"""
+
+    def __init__(self, monitor, parent=None):
+        super().__init__(parent)
+        self.monitor = monitor
+        self.setWindowTitle("内存使用")
+        self.resize(560, 460)
+
+        layout = QVBoxLayout(self)
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.tabs = QTabWidget()
+        self.type_table = self._add_table("图形类型", ["类型", "数量", "估算内存"])
+        self.layer_table = self._add_table("图层", ["图层", "数量", "估算内存"])
+        self.history_table = self._add_table("撤销历史", ["栈", "序号", "图形数", "估算内存"])
+        self.cache_table = self._add_table("缓存与共享数据", ["名称", "分类", "估算内存"])
+        self.trend_table = self._add_table("趋势", ["时间", "总计", "图形", "撤销历史", "缓存", "采样耗时"])
+        layout.addWidget(self.tabs)
+
+        buttons = QHBoxLayout()
+        refresh_button = QPushButton("刷新")
+        refresh_button.clicked.connect(self.monitor.sample)
+        save_button = QPushButton("保存趋势日志...")
+        save_button.clicked.connect(self.on_save_trend)
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.close)
+        buttons.addWidget(refresh_button)
+        buttons.addWidget(save_button)
+        buttons.addStretch()
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+        self.monitor.sampled.connect(self.update_report)
+        if self.monitor.last_report is not None:
+            self.update_report(self.monitor.last_report)
+
+    def _add_table(self, title, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.tabs.addTab(table, title)
+        return table
+
+    @staticmethod
+    def _fill(table, rows):
+        """用行数据填充表格，数值列右对齐"""
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, item)
+
+    def update_report(self, report):
+        """显示一次采样的报告"""
+        growth = self.monitor.growth_rate()
+        growth_text = f"，增长 {format_bytes(growth)}/分钟" if growth is not None else ""
+        self.summary_label.setText(
+            f"估算总计 {format_bytes(report['total'])}（{report['shape_count']} 个图形，"
+            f"撤销历史 {format_bytes(report['history_bytes'])}）{growth_text}")
+
+        by_size = lambda item: -item[1]['bytes']
+        self._fill(self.type_table, [(name, entry['count'], format_bytes(entry['bytes']))
+                                     for name, entry in sorted(report['shape_types'].items(), key=by_size)])
+        self._fill(self.layer_table, [(name, entry['count'], format_bytes(entry['bytes']))
+                                      for name, entry in sorted(report['layers'].items(), key=by_size)])
+        self._fill(self.history_table, [("撤销" if item['stack'] == 'undo' else "重做", item['index'] + 1,
+                                         item['shapes'], format_bytes(item['bytes']))
+                                        for item in report['history']])
+        rows = [(name, "缓存", format_bytes(size)) for name, size in
+                sorted(report['caches'].items(), key=lambda item: -item[1])]
+        rows += [(name, "共享数据", format_bytes(size)) for name, size in report['shared'].items()]
+        self._fill(self.cache_table, rows)
+        self._fill(self.trend_table, [
+            (time.strftime("%H:%M:%S", time.localtime(sample['time'])), format_bytes(sample['total']),
+             format_bytes(sample['shapes']), format_bytes(sample['history']), format_bytes(sample['caches']),
+             f"{sample['cost'] * 1000:.1f} ms")
+            for sample in reversed(self.monitor.trend)])
+
+    def on_save_trend(self):
+        """保存趋势记录"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "保存内存趋势日志", "memory_trend.jsonl", "JSON行文件 (*.jsonl);;所有文件 (*)"
+        )
+        if not file_path:
+            return
+        try:
+            self.monitor.save_trend(file_path)
+        except OSError as e:
+            QMessageBox.warning(self, "保存失败", f"保存内存趋势日志时发生错误：{str(e)}")
@@ -46,6 +46,7 @@ class ToolPanel(QWidget):
         
         # 创建工具按钮并添加图标
         self.selection_btn = self._create_tool_button("选择", "selection", "⬚")
+        self.lasso_btn = self._create_tool_button("套索", "lasso", "➰")
         self.pan_btn = self._create_tool_button("平移", "pan", "✋")
         self.line_btn = self._create_tool_button("直线", "line", "╱")
         self.rectangle_btn = self._create_tool_button("矩形", "rectangle", "□")
@@ -109,6 +110,7 @@ class ToolPanel(QWidget):
         
         # 将按钮添加到布局
         tools_layout.addWidget(self.selection_btn)
+        tools_layout.addWidget(self.lasso_btn)
         tools_layout.addWidget(self.pan_btn)
         tools_layout.addWidget(self.line_btn)
         tools_layout.addWidget(self.rectangle_btn)
@@ -178,7 +180,7 @@ class ToolPanel(QWidget):
     def _on_tool_clicked(self, tool_name):
         """工具按钮点击处理"""
         # 清除所有按钮的选中状态
-        for btn in [self.selection_btn, self.pan_btn, self.line_btn, self.rectangle_btn, 
+        for btn in [self.selection_btn, self.lasso_btn, self.pan_btn, self.line_btn, self.rectangle_btn, 
                   self.circle_btn, self.freehand_btn, self.pen_btn, self.spiral_btn, self.sine_btn,
                   self.eraser_btn]:
             btn.setChecked(False)
@@ -189,6 +191,8 @@ class ToolPanel(QWidget):
         # 设置当前按钮选中
         if tool_name == "selection":
             self.selection_btn.setChecked(True)
+        elif tool_name == "lasso":
+            self.lasso_btn.setChecked(True)
         elif tool_name == "pan":
             self.pan_btn.setChecked(True)
         elif tool_name == "line":
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""性能信息面板
+
+在画布左上角显示帧时间、帧率、绘制与裁剪的图形数、各图层绘制时间、缓存命中率、
+撤销栈内存和 document_changed 信号频率。面板显示时打开全局性能计数器，
+每隔 REFRESH_INTERVAL 毫秒取一次统计并只重绘面板所在的区域。
+"""
+
+from PyQt5.QtCore import Qt, QObject, QRect, QTimer
+from PyQt5.QtGui import QColor, QFont, QFontMetrics
+
+from DrawPicture.diagnostics.memory import estimate_size, format_bytes
+from DrawPicture.diagnostics.perf import perf
+
+
+class PerfHud(QObject):
+    """画布上的性能信息面板"""
+
+    REFRESH_INTERVAL = 500  # 刷新间隔（毫秒）
+    MARGIN = 8              # 面板与画布边缘、文字与面板边缘的距离
+    MAX_LAYERS = 6          # 最多列出的图层数（按绘制时间排序）
+
+    # 显示的缓存名称
+    CACHE_NAMES = {
+        'tiles': "瓦片",
+        'transforms': "变换",
+        'bounds': "边界",
+        'curves': "曲线",
+        'grid': "网格",
+    }
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.lines = []
+        self._rect = QRect()
+        self._font = QFont("Monospace", 9)
+        self._font.setStyleHint(QFont.TypeWriter)
+        self._undo_key = None  # 撤销栈内存估算对应的栈状态
+        self._undo_bytes = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_INTERVAL)
+        self._timer.timeout.connect(self.refresh)
+
+    def rect(self):
+        """面板在画布上的区域"""
+        return QRect(self._rect)
+
+    def start(self):
+        """打开性能计数器并开始刷新"""
+        perf.reset()
+        perf.enabled = True
+        self.canvas.document.document_changed.connect(self._on_document_changed)
+        self._timer.start()
+        self.refresh()
+
+    def stop(self):
+        """关闭性能计数器并擦除面板"""
+        perf.enabled = False
+        self._timer.stop()
+        self.canvas.document.document_changed.disconnect(self._on_document_changed)
+        self.canvas.update(self._rect)
+        self._rect = QRect()
+
+    def _on_document_changed(self):
+        perf.signal('document_changed')
+
+    def refresh(self):
+        """取最近一个刷新间隔的统计，更新面板内容"""
+        stats = perf.snapshot()
+        lines = [
+            f"帧时间  {stats['frame_time'] * 1000:6.2f} ms  (最大 {stats['max_frame_time'] * 1000:.2f})",
+            f"帧率    {stats['fps']:6.1f} FPS",
+            f"图形    绘制 {stats['shapes_painted']:.0f} / 裁剪 {stats['shapes_culled']:.0f}",
+        ]
+        layer_times = sorted(stats['layer_times'].items(), key=lambda item: -item[1])
+        for layer, seconds in layer_times[:self.MAX_LAYERS]:
+            lines.append(f"  {layer}: {seconds * 1000:.2f} ms")
+        rates = []
+        for name, label in self.CACHE_NAMES.items():
+            hits, lookups = stats['caches'].get(name, (0, 0))
+            if lookups:
+                rates.append(f"{label} {hits * 100 / lookups:.0f}%")
+        lines.append("缓存    " + ("  ".join(rates) if rates else "-"))
+        lines.append(f"撤销栈  {format_bytes(self._undo_stack_bytes())}")
+        lines.append(f"文档变化 {stats['signal_rates'].get('document_changed', 0.0):.1f} 次/秒")
+        self.lines = lines
+
+        metrics = QFontMetrics(self._font)
+        width = max(metrics.horizontalAdvance(line) for line in lines) + 2 * self.MARGIN
+        height = metrics.lineSpacing() * len(lines) + 2 * self.MARGIN
+        old = self._rect
+        self._rect = QRect(self.MARGIN, self.MARGIN, width, height)
+        self.canvas.update(old.united(self._rect))
+
+    def _undo_stack_bytes(self):
+        """估算撤销和重做栈占用的内存，栈不变时沿用上次的结果"""
+        document = self.canvas.document
+        undo, redo = document.undo_stack, document.redo_stack
+        key = (len(undo), len(redo), id(undo[-1]) if undo else None, id(redo[-1]) if redo else None)
+        if key != self._undo_key:
+            seen = set()
+            self._undo_bytes = estimate_size(undo, seen) + estimate_size(redo, seen)
+            self._undo_key = key
+        return self._undo_bytes
+
+    def draw(self, painter):
+        """在窗口坐标系中绘制面板"""
+        if not self.lines:
+            return
+        painter.save()
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(0, 0, 0, 170))
+        painter.drawRoundedRect(self._rect, 4, 4)
+        painter.setFont(self._font)
+        painter.setPen(QColor(230, 255, 230))
+        metrics = QFontMetrics(self._font)
+        x = self._rect.left() + self.MARGIN
+        y = self._rect.top() + self.MARGIN + metrics.ascent()
+        for line in self.lines:
+            painter.drawText(x, y, line)
+            y += metrics.lineSpacing()
+        painter.restore()
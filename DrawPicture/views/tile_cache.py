@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""场景瓦片缓存
+
+将缩放后的场景划分为固定大小的瓦片，每个缩放级别的瓦片单独缓存为位图。
+瓦片坐标以缩放后的场景像素为单位（场景坐标 × 缩放因子），与平移无关，
+平移画布时只需把已有瓦片贴到新的位置。图形变化时只使相交的瓦片失效。
+缓存按最近使用顺序淘汰，总内存不超过预算。
+交互过程中绘制的草稿瓦片只在请求草稿时使用，请求高质量瓦片时会重新绘制。
+"""
+
+from collections import OrderedDict
+import math
+
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QPainter, QPixmap
+
+from DrawPicture.diagnostics.perf import perf
+
+
+class TileCache:
+    """按缩放级别划分的LRU瓦片缓存"""
+
+    TILE_SIZE = 256  # 瓦片边长（逻辑像素）
+
+    def __init__(self, render_tile, budget=64 * 1024 * 1024):
+        """
+        参数:
+            render_tile: 绘制瓦片的函数 render_tile(painter, zoom, rect)，
+                rect 为瓦片覆盖的缩放后场景像素区域，painter 原点位于瓦片左上角
+            budget: 缓存位图的内存预算（字节）
+        """
+        self._render_tile = render_tile
+        self.budget = budget
+        self.min_tiles = 0  # 超出预算时也至少保留的瓦片数，避免一帧内可见的瓦片互相淘汰
+        self._tiles = OrderedDict()  # (缩放因子, tx, ty) -> (QPixmap, 是否为草稿)，最近使用的在末尾
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def memory(self):
+        """缓存的位图占用的字节数"""
+        return self._bytes
+
+    @staticmethod
+    def zoom_key(zoom):
+        """缩放因子的缓存键，消除累加步长产生的浮点误差"""
+        return round(zoom, 6)
+
+    def tile_range(self, rect):
+        """获取覆盖缩放后场景像素区域的瓦片下标范围 (tx0, ty0, tx1, ty1)，包含两端"""
+        size = self.TILE_SIZE
+        return (math.floor(rect.left() / size), math.floor(rect.top() / size),
+                math.floor((rect.right() - 1e-9) / size), math.floor((rect.bottom() - 1e-9) / size))
+
+    def contains(self, zoom, tx, ty, draft=False):
+        """是否已缓存可用的瓦片，draft 的含义与 tile 相同"""
+        entry = self._tiles.get((self.zoom_key(zoom), tx, ty))
+        return entry is not None and (draft or not entry[1])
+
+    def tile(self, zoom, tx, ty, ratio=1.0, draft=False):
+        """获取瓦片位图，不存在时立即绘制
+
+        参数:
+            draft: 是否接受草稿瓦片，为 True 时缓存中的任意版本都直接使用，
+                新绘制的瓦片记为草稿；为 False 时草稿瓦片会被重新绘制
+        """
+        key = (self.zoom_key(zoom), tx, ty)
+        entry = self._tiles.get(key)
+        hit = entry is not None and (draft or not entry[1])
+        if perf.enabled:
+            perf.cache('tiles', hit)
+        if hit:
+            self._tiles.move_to_end(key)
+            return entry[0]
+        if entry is not None:
+            self._bytes -= self._pixmap_bytes(self._tiles.pop(key)[0])
+
+        size = self.TILE_SIZE
+        pixmap = QPixmap(int(size * ratio), int(size * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        painter = QPainter(pixmap)
+        self._render_tile(painter, zoom, QRectF(tx * size, ty * size, size, size))
+        painter.end()
+
+        self._tiles[key] = (pixmap, draft)
+        self._bytes += self._pixmap_bytes(pixmap)
+        self._evict()
+        return pixmap
+
+    def invalidate(self, scene_rect, margin=1.0):
+        """使与场景区域相交的所有缩放级别的瓦片失效
+
+        参数:
+            margin: 额外扩展的缩放后像素数，覆盖抗锯齿边缘
+        """
+        if scene_rect.isNull():
+            return
+        size = self.TILE_SIZE
+        for key in [key for key in self._tiles
+                    if self._intersects(key, scene_rect, margin, size)]:
+            self._bytes -= self._pixmap_bytes(self._tiles.pop(key)[0])
+
+    def clear(self):
+        """清空缓存"""
+        self._tiles.clear()
+        self._bytes = 0
+
+    @staticmethod
+    def _intersects(key, scene_rect, margin, size):
+        zoom, tx, ty = key
+        return (scene_rect.left() * zoom - margin < (tx + 1) * size and
+                scene_rect.right() * zoom + margin > tx * size and
+                scene_rect.top() * zoom - margin < (ty + 1) * size and
+                scene_rect.bottom() * zoom + margin > ty * size)
+
+    @staticmethod
+    def _pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * 4
+
+    def _evict(self):
+        """淘汰最久未使用的瓦片，直到内存不超过预算"""
+        while self._bytes > self.budget and len(self._tiles) > max(1, self.min_tiles):
+            _, (pixmap, _) = self._tiles.popitem(last=False)
+            self._bytes -= self._pixmap_bytes(pixmap)